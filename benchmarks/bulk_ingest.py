@@ -0,0 +1,88 @@
+"""
+Rows per second of bulk transaction ingestion against one create_transaction
+call per row.
+
+    python -m benchmarks.bulk_ingest --rows 10000 100000
+    python -m benchmarks.bulk_ingest --rows 100000 --per-row 0
+
+Feeds a generated CSV upload through the same parse -> validate -> COPY ->
+set-based apply path as POST /financial/transactions/bulk. Runs against the
+configured database inside a transaction that is rolled back.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import random
+from datetime import datetime, timedelta, timezone
+from benchmarks.harness import get_or_create_category, rollback_session, seed_inventory_sales, timed
+from crud import financial, rollups
+from models.financial import TransactionType
+from models.inventory import InventoryItem
+from schemas.financial import TransactionCreate
+from utils.ingest import iter_lines, parse_records
+
+COLUMNS = [
+    "amount", "transaction_type", "description", "category", "transaction_date",
+    "region", "inventory_item_id", "quantity", "account_category_id"
+]
+
+
+def generate_csv(n_rows: int, item_ids: list, category_id: int, seed: int = 42) -> bytes:
+    rng = random.Random(seed)
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for _ in range(n_rows):
+        quantity = rng.randint(1, 5)
+        writer.writerow([
+            f"{quantity * 10}.00", "INCOME", "pos sale", "sales",
+            (start + timedelta(seconds=rng.uniform(0, 30 * 86400))).isoformat(),
+            rng.choice(["Jakarta", "Bandung", "Surabaya"]), rng.choice(item_ids), quantity, category_id
+        ])
+    return buffer.getvalue().encode()
+
+
+def chunked(data: bytes, size: int = 64 * 1024):
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--per-row", type=int, default=500, help="rows to time through create_transaction (0 skips)")
+    parser.add_argument("--batch-size", type=int, default=financial.INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'path':>10} {'seconds':>9} {'rows/s':>10} {'errors':>7}")
+    for n_rows in args.rows:
+        with rollback_session() as db:
+            seed_inventory_sales(db, 50, months=1, sales_per_month=1)
+            item_ids = [item_id for (item_id,) in db.query(InventoryItem.id)]
+            category_id = get_or_create_category(db, "BENCH-4000", "Benchmark Sales", TransactionType.INCOME)
+            rollups.rebuild_rollups(db)
+            body = generate_csv(n_rows, item_ids, category_id)
+
+            with timed() as timing:
+                records = parse_records(iter_lines(chunked(body)), "csv")
+                result = financial.bulk_create_transactions(db, records, batch_size=args.batch_size)
+            print(f"{n_rows:>8} {'bulk':>10} {timing['seconds']:>9.2f} {result['inserted'] / timing['seconds']:>10.0f} "
+                  f"{result['error_count']:>7}")
+
+            mismatched = rollups.verify_rollups(db)
+            if mismatched:
+                print(f"  rollups disagree with transactions for {len(mismatched)} keys")
+
+            if args.per_row:
+                rows = [record for _, record in parse_records(iter_lines(chunked(body)), "csv")][:args.per_row]
+                # create_transaction prints each payload; keep that out of the table
+                with timed() as timing, contextlib.redirect_stdout(io.StringIO()):
+                    for row in rows:
+                        financial.create_transaction(db, TransactionCreate(**row))
+                print(f"{len(rows):>8} {'per-row':>10} {timing['seconds']:>9.2f} {len(rows) / timing['seconds']:>10.0f} {0:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Rows per second and peak RSS of the Excel report export as the chart of
+accounts grows, for the write-only engine against the previous in-memory
+workbook approach.
+
+    python -m benchmarks.excel_export --accounts 10000 100000
+
+Every measurement runs in a fresh interpreter so peak RSS is not inherited
+from an earlier run; "export MB" is the peak growth while writing, past the
+report data itself. "in-memory" reproduces the old generate_excel_report:
+a full Workbook, new Font / Alignment objects per cell and a BytesIO save.
+No database is needed.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+MODES = ("write-only", "in-memory")
+
+
+def synthetic_pnl(n_accounts: int) -> dict:
+    """
+    Profit-loss report data with n_accounts accounts, ten children per parent
+    """
+    def tree(prefix: str, count: int) -> list:
+        accounts = [{"code": f"{prefix}-{i}", "category": f"Account {prefix}-{i}", "amount": Decimal("1234.56"),
+                     "children": []} for i in range(count)]
+        for i, account in enumerate(accounts[1:], 1):
+            accounts[(i - 1) // 10]["children"].append(account)
+        return [accounts[0]] if accounts else []
+
+    half = n_accounts // 2
+    return {
+        "period_start": "2024-01-01T00:00:00", "period_end": "2024-12-31T23:59:59",
+        "revenue": tree("4", half), "expenses": tree("5", n_accounts - half),
+        "total_revenue": Decimal("1"), "total_expenses": Decimal("1"), "net_profit": Decimal("0")
+    }
+
+
+def write_in_memory(data: dict) -> bytes:
+    from io import BytesIO
+    import openpyxl
+    from openpyxl.styles import Alignment, Font
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    row = 1
+
+    def add(items, level=0):
+        nonlocal row
+        for item in items:
+            ws[f"A{row}"] = f"{'    ' * level}{item['code']} - {item['category']}"
+            ws[f"B{row}"] = item['amount']
+            ws[f"B{row}"].number_format = '#,##0.00'
+            ws[f"A{row}"].font = Font(name='Arial', size=10)
+            ws[f"B{row}"].font = Font(name='Arial', size=10)
+            ws[f"A{row}"].alignment = Alignment(horizontal='left')
+            ws[f"B{row}"].alignment = Alignment(horizontal='right')
+            row += 1
+            add(item['children'], level + 1)
+
+    add(data["revenue"])
+    add(data["expenses"])
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def measure(mode: str, n_accounts: int) -> dict:
+    from crud import reports
+
+    sys.setrecursionlimit(10000)
+    data = synthetic_pnl(n_accounts)
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    if mode == "write-only":
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        try:
+            reports.write_excel_report("profit-loss-ifrs", data, path)
+            size = os.path.getsize(path)
+        finally:
+            os.unlink(path)
+    else:
+        size = len(write_in_memory(data))
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds": elapsed,
+        "rows_per_second": n_accounts / elapsed,
+        "bytes": size,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "rss_before_mb": rss_before
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--accounts", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "ACCOUNTS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        mode, n_accounts = args.measure
+        print(json.dumps(measure(mode, int(n_accounts))))
+        return
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{'accounts':>9} {'mode':>11} {'seconds':>8} {'rows/s':>9} {'MB file':>8} {'peak RSS MB':>12} {'export MB':>10}")
+    for n_accounts in args.accounts:
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.excel_export", "--measure", mode, str(n_accounts)],
+                capture_output=True, text=True, check=True, cwd=root
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{n_accounts:>9} {mode:>11} {result['seconds']:>8.2f} {result['rows_per_second']:>9.0f} "
+                  f"{result['bytes'] / 2**20:>8.1f} {result['peak_rss_mb']:>12.0f} "
+                  f"{result['peak_rss_mb'] - result['rss_before_mb']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
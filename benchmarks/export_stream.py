@@ -0,0 +1,48 @@
+"""
+Time to first byte, throughput and peak Python memory of the streaming
+transaction export as the ledger grows.
+
+    python -m benchmarks.export_stream --transactions 100000 500000
+
+Drives the same stream_transactions -> encode_rows pipeline as
+GET /financial/transactions/export. Peak memory (tracemalloc) should stay
+flat as the row count grows. Runs against the configured database inside a
+transaction that is rolled back.
+"""
+import argparse
+import time
+import tracemalloc
+from benchmarks.harness import rollback_session, seed_ledger
+from crud import financial
+from utils.export import EXPORT_FORMATS, encode_rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transactions", type=int, nargs="+", default=[100000, 500000])
+    args = parser.parse_args()
+
+    columns = [column.key for column in financial.EXPORT_COLUMNS]
+    print(f"{'transactions':>12} {'format':>7} {'first byte ms':>14} {'seconds':>8} {'rows/s':>9} {'MB':>7} {'peak MB':>8}")
+    for n_transactions in args.transactions:
+        with rollback_session() as db:
+            seed_ledger(db, n_transactions)
+            db.expunge_all()
+            for format in EXPORT_FORMATS:
+                tracemalloc.start()
+                started = time.perf_counter()
+                first_byte = None
+                size = 0
+                for chunk in encode_rows(financial.stream_transactions(db), columns, format):
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - started
+                    size += len(chunk)
+                elapsed = time.perf_counter() - started
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(f"{n_transactions:>12} {format:>7} {first_byte * 1000:>14.1f} {elapsed:>8.2f} "
+                      f"{n_transactions / elapsed:>9.0f} {size / 2**20:>7.1f} {peak / 2**20:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Accuracy and latency of the vectorized forecaster against the per-item
+RandomForest path, on synthetic trend + seasonal series with the last month
+held out.
+
+    python -m benchmarks.forecasting --items 100 1000
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from benchmarks.harness import timed
+from utils import forecasting
+from utils.executor import cpu_executor
+
+
+def synthetic_monthly(n_items: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    rows, actual = [], {}
+    for item_id in range(1, n_items + 1):
+        length = int(rng.integers(6, 37))
+        start = pd.Timestamp("2022-01-01") + pd.DateOffset(months=int(rng.integers(0, 12)))
+        level, trend, season = rng.uniform(20, 200), rng.uniform(-1, 3), rng.uniform(0, 30)
+        months = [start + pd.DateOffset(months=i) for i in range(length + 1)]
+        values = [
+            max(0.0, level + trend * i + season * np.sin(2 * np.pi * m.month / 12) + rng.normal(0, 5))
+            for i, m in enumerate(months)
+        ]
+        rows.extend((item_id, m, v) for m, v in zip(months[:-1], values[:-1]))
+        actual[item_id] = values[-1]
+    return pd.DataFrame(rows, columns=["item_id", "month", "quantity"]), actual
+
+
+def run(item_counts):
+    print(f"{'items':>8} {'mode':>8} {'seconds':>10} {'MAE':>10} {'MAPE':>8}")
+    for n_items in item_counts:
+        monthly, actual = synthetic_monthly(n_items)
+        for mode in forecasting.FORECAST_MODES:
+            with timed() as timing:
+                predictions = forecasting.forecast_item_sales(monthly, mode)
+            errors = np.array([predictions[i]["predicted_monthly_sales"] - actual[i] for i in actual])
+            truth = np.array(list(actual.values()))
+            mape = np.mean(np.abs(errors) / np.maximum(truth, 1))
+            print(f"{n_items:>8} {mode:>8} {timing['seconds']:>10.3f} {np.mean(np.abs(errors)):>10.2f} {mape:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000])
+    args = parser.parse_args()
+
+    # Forest fits fan out over the shared process pool, as they do in the app
+    cpu_executor.start()
+    try:
+        # Spawn the workers and load sklearn in them before timing
+        warmup, _ = synthetic_monthly(10)
+        for mode in forecasting.FORECAST_MODES:
+            forecasting.forecast_item_sales(warmup, mode)
+        run(args.items)
+    finally:
+        cpu_executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
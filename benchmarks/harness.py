@@ -0,0 +1,130 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import random
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import Session
+import database
+from models.financial import Transaction, TransactionType, AccountCategory
+from models.inventory import InventoryItem
+
+
+class QueryCounter:
+    """
+    Count the statements an engine sends to the database while active
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+@contextmanager
+def rollback_session():
+    """
+    Session bound to an outer transaction that is always rolled back, so
+    benchmarks can seed and commit freely without touching real data
+    """
+    connection = database.init_engine().connect()
+    outer = connection.begin()
+    db = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield db
+    finally:
+        db.close()
+        outer.rollback()
+        connection.close()
+
+
+@contextmanager
+def timed():
+    result = {}
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - started
+
+
+def get_or_create_category(db: Session, code: str, name: str, type: TransactionType) -> int:
+    category_id = db.execute(select(AccountCategory.id).where(AccountCategory.code == code)).scalar()
+    if category_id is None:
+        category_id = db.execute(
+            insert(AccountCategory).values(name=name, code=code, type=type).returning(AccountCategory.id)
+        ).scalar()
+    return category_id
+
+
+def seed_inventory_sales(db: Session, n_items: int, months: int = 12, sales_per_month: int = 3, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    category_id = get_or_create_category(db, "BENCH-4000", "Benchmark Sales", TransactionType.INCOME)
+
+    item_ids = db.execute(
+        insert(InventoryItem).returning(InventoryItem.id),
+        [{"name": f"bench-item-{i}", "description": "benchmark", "price": Decimal("10.00"), "quantity": rng.randint(0, 200)}
+         for i in range(n_items)]
+    ).scalars().all()
+
+    start = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0) - timedelta(days=31 * months)
+    rows = []
+    for item_id in item_ids:
+        for month in range(months):
+            for _ in range(sales_per_month):
+                quantity = rng.randint(1, 20)
+                rows.append({
+                    "amount": Decimal(quantity * 10),
+                    "transaction_type": TransactionType.INCOME,
+                    "description": "benchmark sale",
+                    "category": "sales",
+                    "transaction_date": start + timedelta(days=31 * month + rng.randint(0, 27)),
+                    "region": rng.choice(["Jakarta", "Bandung", "Surabaya", "Medan", "Bali"]),
+                    "inventory_item_id": item_id,
+                    "quantity": quantity,
+                    "account_category_id": category_id,
+                })
+    db.execute(insert(Transaction), rows)
+    db.flush()
+
+
+def seed_ledger(db: Session, n_transactions: int, months: int = 24, seed: int = 42) -> None:
+    """
+    Income and expense transactions spread over the last N months, with the
+    monthly rollups rebuilt to match
+    """
+    from crud import rollups
+
+    rng = random.Random(seed)
+    income_id = get_or_create_category(db, "BENCH-4000", "Benchmark Sales", TransactionType.INCOME)
+    expense_id = get_or_create_category(db, "BENCH-5000", "Benchmark Expenses", TransactionType.EXPENSE)
+
+    end = datetime.now(timezone.utc)
+    span = timedelta(days=31 * months).total_seconds()
+    batch = []
+    for i in range(n_transactions):
+        is_income = rng.random() < 0.6
+        batch.append({
+            "amount": Decimal(rng.randint(100, 500000)) / 100,
+            "transaction_type": TransactionType.INCOME if is_income else TransactionType.EXPENSE,
+            "description": "benchmark",
+            "category": "sales" if is_income else "operations",
+            "transaction_date": end - timedelta(seconds=rng.uniform(0, span)),
+            "region": rng.choice(["Jakarta", "Bandung", "Surabaya", "Medan", "Bali"]),
+            "account_category_id": income_id if is_income else expense_id,
+        })
+        if len(batch) == 10000:
+            db.execute(insert(Transaction), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Transaction), batch)
+    rollups.rebuild_rollups(db)
@@ -0,0 +1,32 @@
+"""
+Query count and wall time of analyze_inventory_sales as the catalogue grows.
+
+    python -m benchmarks.inventory_analysis --items 10 100 1000
+
+Runs against the configured database inside a transaction that is rolled back.
+"""
+import argparse
+import database
+from benchmarks.harness import QueryCounter, rollback_session, seed_inventory_sales, timed
+from crud import inventory
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--months", type=int, default=12)
+    args = parser.parse_args()
+
+    print(f"{'items':>8} {'queries':>8} {'load_s':>10} {'total_s':>10}")
+    for n_items in args.items:
+        with rollback_session() as db:
+            seed_inventory_sales(db, n_items, months=args.months)
+            with timed() as load:
+                inventory.get_inventory_sales_frames(db)
+            with QueryCounter(database.init_engine()) as counter, timed() as total:
+                inventory.analyze_inventory_sales(db)
+        print(f"{n_items:>8} {counter.count:>8} {load['seconds']:>10.3f} {total['seconds']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
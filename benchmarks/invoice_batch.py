@@ -0,0 +1,82 @@
+"""
+Invoices per second of a batch billing run through bulk_create_invoices
+against one create_invoice call (and commit) per invoice.
+
+    python -m benchmarks.invoice_batch --invoices 1000 5000
+    python -m benchmarks.invoice_batch --invoices 5000 --per-invoice 0
+
+Every fifth invoice is built from transaction_ids, the rest have 1-10
+lines referencing inventory items. Drives the same path as
+POST /invoice/invoices/batch. Runs against the configured database inside a
+transaction that is rolled back.
+"""
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+from benchmarks.harness import rollback_session, seed_inventory_sales, timed
+from crud import invoice
+from models.financial import Transaction
+from models.inventory import InventoryItem
+from schemas.invoice import InvoiceCreate
+
+
+def billing_run(n_invoices: int, item_ids: list, transaction_ids: list, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    due_date = (datetime.now(timezone.utc) + timedelta(days=30)).isoformat()
+    payloads = []
+    for i in range(n_invoices):
+        payload = {
+            "client_name": f"Client {i % 200}",
+            "client_email": f"billing{i % 200}@example.com",
+            "client_address": "Jl. Sudirman 1, Jakarta",
+            "payment_terms": "NET_30",
+            "currency": "IDR",
+            "tax_rate": "11",
+            "due_date": due_date,
+            "items": []
+        }
+        if i % 5 == 0:
+            payload["transaction_ids"] = rng.sample(transaction_ids, 3)
+        else:
+            for _ in range(rng.randint(1, 10)):
+                quantity = rng.randint(1, 20)
+                payload["items"].append({
+                    "description": "monthly service",
+                    "quantity": str(quantity),
+                    "unit_price": "125000.00",
+                    "amount": f"{quantity * 125000}.00",
+                    "inventory_item_id": rng.choice(item_ids)
+                })
+        payloads.append(payload)
+    return payloads
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--per-invoice", type=int, default=200, help="invoices to time through create_invoice (0 skips)")
+    args = parser.parse_args()
+
+    print(f"{'invoices':>9} {'path':>12} {'seconds':>9} {'invoices/s':>11} {'errors':>7}")
+    for n_invoices in args.invoices:
+        with rollback_session() as db:
+            seed_inventory_sales(db, 50, months=1, sales_per_month=2)
+            item_ids = [item_id for (item_id,) in db.query(InventoryItem.id).order_by(InventoryItem.id.desc()).limit(50)]
+            transaction_ids = [row_id for (row_id,) in db.query(Transaction.id).order_by(Transaction.id.desc()).limit(100)]
+            payloads = billing_run(n_invoices, item_ids, transaction_ids)
+
+            with timed() as timing:
+                result = invoice.bulk_create_invoices(db, payloads)
+            print(f"{n_invoices:>9} {'batch':>12} {timing['seconds']:>9.2f} {result['created'] / timing['seconds']:>11.0f} "
+                  f"{result['error_count']:>7}")
+
+            if args.per_invoice:
+                sample = payloads[:args.per_invoice]
+                with timed() as timing:
+                    for payload in sample:
+                        invoice.create_invoice(db, InvoiceCreate(**payload))
+                print(f"{len(sample):>9} {'per-invoice':>12} {timing['seconds']:>9.2f} {len(sample) / timing['seconds']:>11.0f} {0:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Round trips and latency of create_invoice as the number of invoice lines
+grows, against the previous one-lookup-per-line implementation.
+
+    python -m benchmarks.invoice_create --lines 1 50 500
+
+Every line references an inventory item and a transaction, the worst case
+for reference lookups. "per-line" reproduces the old create_invoice: a
+get_inventory_item and a Query.get per line and one ORM add per line.
+Runs against the configured database inside a transaction that is rolled
+back.
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import database
+from benchmarks.harness import QueryCounter, rollback_session, seed_inventory_sales, timed
+from crud import inventory, invoice
+from models.financial import Transaction
+from models.inventory import InventoryItem
+from models.invoice import Invoice, InvoiceItem
+from schemas.invoice import InvoiceCreate
+
+MODES = ("batched", "per-line")
+
+
+def create_invoice_per_line(db, invoice_data: InvoiceCreate) -> Invoice:
+    subtotal = sum(item.quantity * item.unit_price for item in invoice_data.items)
+    tax_amount = subtotal * (invoice_data.tax_rate / 100)
+    db_invoice = Invoice(**invoice_data.dict(exclude={'items', 'transaction_ids'}), subtotal=subtotal,
+                         tax_amount=tax_amount, total=subtotal + tax_amount)
+    db.add(db_invoice)
+    db.flush()
+    for item in invoice_data.items:
+        db_item = InvoiceItem(invoice_id=db_invoice.id, **item.dict(exclude={'inventory_item_id', 'transaction_id'}))
+        if item.inventory_item_id and inventory.get_inventory_item(db, item.inventory_item_id):
+            db_item.inventory_item_id = item.inventory_item_id
+        if item.transaction_id and db.query(Transaction).get(item.transaction_id):
+            db_item.transaction_id = item.transaction_id
+        db.add(db_item)
+    db.commit()
+    db.refresh(db_invoice)
+    return db_invoice
+
+
+def invoice_payload(n_lines: int, item_ids: list, transaction_ids: list) -> InvoiceCreate:
+    return InvoiceCreate(
+        client_name="Benchmark Client",
+        client_email="bench@example.com",
+        client_address="Jl. Benchmark 1",
+        payment_terms="NET_30",
+        currency="IDR",
+        tax_rate=Decimal("11"),
+        due_date=datetime.now(timezone.utc) + timedelta(days=30),
+        items=[
+            {
+                "description": f"line {i}",
+                "quantity": Decimal("2"),
+                "unit_price": Decimal("10.00"),
+                "amount": Decimal("20.00"),
+                "inventory_item_id": item_ids[i % len(item_ids)],
+                "transaction_id": transaction_ids[i % len(transaction_ids)]
+            }
+            for i in range(n_lines)
+        ]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    create = {"batched": invoice.create_invoice, "per-line": create_invoice_per_line}
+    print(f"{'lines':>6} {'mode':>9} {'queries':>8} {'ms':>9}")
+    with rollback_session() as db:
+        seed_inventory_sales(db, max(args.lines), months=1, sales_per_month=1)
+        item_ids = [item_id for (item_id,) in db.query(InventoryItem.id).order_by(InventoryItem.id.desc()).limit(max(args.lines))]
+        transaction_ids = [row_id for (row_id,) in db.query(Transaction.id).order_by(Transaction.id.desc()).limit(max(args.lines))]
+        for n_lines in args.lines:
+            payload = invoice_payload(n_lines, item_ids, transaction_ids)
+            for mode in MODES:
+                with QueryCounter(database.init_engine()) as counter, timed() as timing:
+                    for _ in range(args.repeat):
+                        create[mode](db, payload)
+                per_call = timing["seconds"] / args.repeat * 1000
+                print(f"{n_lines:>6} {mode:>9} {counter.count // args.repeat:>8} {per_call:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Requests per second and latency of the read endpoints under concurrency.
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --concurrency 64 --duration 20 --path /api/v1/invoice/invoices/?limit=20
+    python -m benchmarks.load_test --url http://localhost:8000
+
+Starts a single uvicorn worker for the app in this checkout (unless --url is
+given) and drives it with a pool of client threads. Run it on two checkouts
+to compare them; use the same database and settings for both.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+DEFAULT_PATHS = [
+    "/api/v1/financial/transactions/?limit=50",
+    "/api/v1/invoice/invoices/?limit=20",
+    "/api/v1/inventory/?limit=50",
+]
+
+
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up within {timeout:.0f}s")
+
+
+def run_load(url: str, paths: list, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset: int):
+        nonlocal errors
+        i = offset
+        local, failed = [], 0
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url + paths[i % len(paths)], timeout=30) as response:
+                    response.read()
+                local.append(time.perf_counter() - started)
+            except Exception:
+                failed += 1
+            i += 1
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", action="append", help="endpoint to request (repeatable)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    paths = args.path or DEFAULT_PATHS
+    server = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+    try:
+        wait_until_up(url)
+        run_load(url, paths, 4, 2.0)  # warm up pools and caches
+
+        print(f"{'concurrency':>11} {'requests':>9} {'errors':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for concurrency in args.concurrency:
+            result = run_load(url, paths, concurrency, args.duration)
+            print(f"{concurrency:>11} {result['requests']:>9} {result['errors']:>7} {result['rps']:>8.1f} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
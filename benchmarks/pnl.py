@@ -0,0 +1,38 @@
+"""
+Round trips and latency of generate_pnl as the ledger grows.
+
+    python -m benchmarks.pnl --transactions 10000 100000
+
+Runs against the configured database inside a transaction that is rolled back.
+"""
+import argparse
+from datetime import datetime, timedelta
+import database
+from benchmarks.harness import QueryCounter, rollback_session, seed_ledger, timed
+from crud import reports
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transactions", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Mid-month start so both the rollup path and the raw edge months are exercised
+    end_date = datetime.now()
+    start_date = (end_date - timedelta(days=365)).replace(day=15)
+
+    print(f"{'transactions':>12} {'breakdown':>10} {'queries':>8} {'ms':>10}")
+    for n_transactions in args.transactions:
+        with rollback_session() as db:
+            seed_ledger(db, n_transactions)
+            for breakdown in reports.PNL_BREAKDOWNS:
+                with QueryCounter(database.init_engine()) as counter, timed() as timing:
+                    for _ in range(args.repeat):
+                        reports.generate_pnl(db, start_date, end_date, breakdown)
+                per_call = timing["seconds"] / args.repeat * 1000
+                print(f"{n_transactions:>12} {breakdown:>10} {counter.count // args.repeat:>8} {per_call:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Seconds to reconcile a bank statement against the open invoices, split into
+reading the CSV, matching, and recording the payments.
+
+    python -m benchmarks.reconciliation --invoices 100000 --lines 50000
+
+The statement mixes every match rule: payments quoting the invoice number
+in their memo (some partial), exact balances quoted by client, lump sums
+covering several of a client's invoices, and lines that match nothing. After applying, each
+touched invoice's amount_paid is checked against its payment_history. Runs
+against the configured database inside a transaction that is rolled back.
+"""
+import argparse
+import csv
+import io
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from sqlalchemy import func, insert, select
+from benchmarks.harness import rollback_session, timed
+from crud import reconciliation
+from models.invoice import Currency, Invoice, InvoiceStatus, PaymentHistory, PaymentTerms
+
+
+def seed_open_invoices(db, n_invoices: int, seed: int = 42) -> list:
+    """
+    (id, invoice number, client, balance in cents) of n_invoices open
+    invoices, five per client
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(n_invoices):
+        total = Decimal(rng.randint(10000, 5000000)).scaleb(-2)
+        rows.append({
+            "client_name": f"Bench Client {i // 5}",
+            "client_email": None,
+            "client_address": None,
+            "due_date": now - timedelta(days=rng.randint(-30, 90)),
+            "status": InvoiceStatus.SENT,
+            "payment_terms": PaymentTerms.NET_30,
+            "currency": Currency.IDR,
+            "subtotal": total,
+            "tax_rate": Decimal("0"),
+            "tax_amount": Decimal("0"),
+            "total": total,
+        })
+    created = db.execute(
+        insert(Invoice).returning(Invoice.id, Invoice.invoice_number, sort_by_parameter_order=True), rows
+    ).all()
+    return [(invoice_id, str(number), row["client_name"], int(row["total"] * 100))
+            for (invoice_id, number), row in zip(created, rows)]
+
+
+def statement_csv(invoices: list, n_lines: int, seed: int = 42) -> bytes:
+    rng = random.Random(seed)
+    pool = invoices[:]
+    rng.shuffle(pool)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["date", "amount", "reference", "client_name", "bank_reference"])
+    date = datetime.now(timezone.utc).date().isoformat()
+    for i in range(n_lines):
+        kind = rng.random()
+        if kind < 0.4 and pool:
+            _, number, client, cents = pool.pop()
+            cents = cents if rng.random() < 0.8 else cents // 2
+            writer.writerow([date, f"{cents / 100:.2f}", f"Payment INV {number.upper()}", client, f"BK{i}"])
+        elif kind < 0.7 and pool:
+            _, _, client, cents = pool.pop()
+            writer.writerow([date, f"{cents / 100:.2f}", "", client.lower(), f"BK{i}"])
+        elif kind < 0.9 and pool:
+            client = pool[-1][2]
+            lump = sum(cents for _, _, name, cents in pool[-3:] if name == client)
+            writer.writerow([date, f"{lump / 100:.2f}", "", client, f"BK{i}"])
+        else:
+            writer.writerow([date, f"{rng.randint(100, 99999)}.00", "transfer", "Unknown Sender", f"BK{i}"])
+    return buffer.getvalue().encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=100000)
+    parser.add_argument("--lines", type=int, default=50000)
+    args = parser.parse_args()
+
+    with rollback_session() as db:
+        invoices = seed_open_invoices(db, args.invoices)
+        db.commit()
+        data = statement_csv(invoices, args.lines)
+
+        with timed() as reading:
+            lines, errors = reconciliation.read_statement(data)
+        with timed() as loading:
+            open_invoices = reconciliation.load_open_invoices(db, Currency.IDR)
+        with timed() as matching:
+            allocations = reconciliation.match_statement(lines, open_invoices)
+        with timed() as applying:
+            result = reconciliation.reconcile_statement(db, data, Currency.IDR)
+
+        print(f"{'invoices':>9} {'lines':>7} {'read s':>7} {'load s':>7} {'match s':>8} {'total s':>8} "
+              f"{'matched':>8} {'payments':>9} {'paid':>7}")
+        print(f"{args.invoices:>9} {args.lines:>7} {reading['seconds']:>7.2f} {loading['seconds']:>7.2f} "
+              f"{matching['seconds']:>8.2f} {applying['seconds']:>8.2f} {result['matched_lines']:>8} "
+              f"{result['payments_created']:>9} {result['invoices_paid']:>7}")
+        print("matches by rule: " + ", ".join(f"{rule} {count}" for rule, count in result["matches_by_rule"].items()))
+
+        first_id = invoices[0][0]
+        recorded = (select(PaymentHistory.invoice_id, func.sum(PaymentHistory.amount_paid).label("paid"))
+                    .where(PaymentHistory.invoice_id >= first_id)
+                    .group_by(PaymentHistory.invoice_id).subquery())
+        mismatched = db.execute(
+            select(func.count()).select_from(Invoice).join(recorded, recorded.c.invoice_id == Invoice.id)
+            .where(Invoice.id >= first_id, (Invoice.amount_paid != recorded.c.paid) | (Invoice.balance_due < 0))
+        ).scalar()
+        if mismatched or len(allocations) != result["payments_created"]:
+            print(f"  {mismatched} invoices disagree with their payments")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Cost of importing the app, as a gunicorn worker pays it on boot.
+
+    python -m benchmarks.startup_importtime
+    python -m benchmarks.startup_importtime --save benchmarks/startup_baseline.json
+    python -m benchmarks.startup_importtime --baseline benchmarks/startup_baseline.json
+
+Runs `python -X importtime -c "import main"` in fresh interpreters and reports
+the median cumulative import time and the heaviest top-level packages. Fails
+when one of the lazily loaded stacks is imported at startup, or when the
+import time regresses past --tolerance against a saved baseline.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+LAZY_MODULES = ("pandas", "sklearn", "reportlab", "openpyxl", "anthropic", "joblib")
+
+
+def measure(module: str) -> dict:
+    """
+    One fresh interpreter: microseconds of cumulative import time per
+    top-level package, plus the total for module
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+
+    packages = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if name == module:
+            total = int(cumulative)
+        top = name.split(".")[0]
+        if depth <= 1 or top not in packages:
+            packages[top] = max(packages.get(top, 0), int(cumulative))
+    return {"total": total, "packages": packages}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--save", help="write the result as a baseline JSON file")
+    parser.add_argument("--baseline", help="compare against a saved baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs the baseline")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(run["total"] for run in runs) / 1000
+    packages = {
+        name: statistics.median(run["packages"].get(name, 0) for run in runs) / 1000
+        for name in set().union(*(run["packages"] for run in runs))
+    }
+
+    print(f"import {args.module}: {total_ms:.0f} ms (median of {args.runs})")
+    for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<24} {ms:>8.0f} ms")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in packages]
+    if eager:
+        print(f"Imported at startup but expected to load lazily: {', '.join(eager)}")
+        failed = True
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline_ms = json.load(f)["total_ms"]
+        change = total_ms / baseline_ms - 1
+        print(f"baseline: {baseline_ms:.0f} ms ({change:+.0%})")
+        if change > args.tolerance:
+            print(f"Startup import time regressed by more than {args.tolerance:.0%}")
+            failed = True
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"module": args.module, "total_ms": round(total_ms, 1), "packages_ms": {
+                name: round(ms, 1) for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]
+            }}, f, indent=2)
+            f.write("\n")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,68 @@
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
-    POSTGRES_USER: str = "postgres"  
-    POSTGRES_PASSWORD: str = ""     
-    POSTGRES_HOST: str = ""          
-    POSTGRES_PORT: str = "6543"      
-    POSTGRES_DB: str = "postgres"    
+    DB_USER: str = "postgres"
+    DB_PASSWORD: str = ""
+    DB_HOST: str = "localhost"
+    DB_PORT: str = "5432"
+    DB_NAME: str = "postgres"
 
+    # Connection pool; a worker holds at most DB_POOL_SIZE + DB_MAX_OVERFLOW connections
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # 0 disables the timeout
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    # Set when DB_HOST is a transaction-mode pgbouncer: the pooler owns
+    # pooling, so the app keeps no connections open and sends session
+    # settings per transaction. Unset, it is on for port 6543 (the Supabase
+    # transaction pooler).
+    DB_PGBOUNCER: Optional[bool] = None
+
+    ANTHROPIC_API_KEY: Optional[str] = None
+    # Language model calls (utils/llm_gateway.py). "fake" answers locally
+    # without an API key, after LLM_FAKE_DELAY seconds.
+    LLM_BACKEND: str = "anthropic"
+    LLM_TIMEOUT: float = 60.0
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_CACHE_DIR: str = ".llm_cache"
+    # Responses kept on disk; 0 disables the cache
+    LLM_CACHE_SIZE: int = 256
+    LLM_FAKE_DELAY: float = 0.0
+
+    # utils.forecasting.FORECAST_MODES; checked when settings load
+    FORECAST_MODE: Literal["linear", "forest"] = "linear"
+    MODEL_STORE_DIR: str = ".model_store"
+    # Rendered artifacts (invoice PDFs), keyed by a hash of their content
+    BLOB_STORE_DIR: str = ".blob_store"
+    # Seconds between runs of the sweeper that marks SENT invoices past
+    # their due date OVERDUE; 0 disables it
+    OVERDUE_SWEEP_INTERVAL: float = 3600
+    DASHBOARD_CACHE_TTL: float = 15
+    DASHBOARD_CACHE_SIZE: int = 32
+
+    # Process pool for PDF / Excel rendering and model fitting. Unset uses
+    # one worker per CPU; 0 runs that work inline in the request thread.
+    # Beyond EXECUTOR_WORKERS running tasks, EXECUTOR_QUEUE_LIMIT more may
+    # wait before requests are turned away with 503.
+    EXECUTOR_WORKERS: Optional[int] = None
+    EXECUTOR_QUEUE_LIMIT: int = 16
+
+    @property
+    def pgbouncer(self) -> bool:
+        if self.DB_PGBOUNCER is None:
+            return self.DB_PORT == "6543"
+        return self.DB_PGBOUNCER
+
+    @property
+    def database_url(self) -> str:
+        return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
     class Config:
         env_file = ".env"
+        extra = "ignore"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -1,43 +1,130 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple, Union
 from datetime import datetime
-from database import get_db
-from schemas.financial import Transaction, TransactionCreate, TransactionUpdate, AccountCategory as AccountCategorySchema, AccountCategoryCreate
-from models.financial import TransactionType, AccountCategory
+from database import SessionLocal, get_async_db, get_db, init_engine, run_sync
+from schemas.pagination import CursorPage
+from schemas.financial import Transaction, TransactionCreate, TransactionUpdate, TransactionIngestResult, AccountCategory as AccountCategorySchema, AccountCategoryCreate
+from models.financial import TransactionType
 from crud import financial, inventory
+from utils.export import EXPORT_FORMATS, encode_rows
+from utils.ingest import iter_lines, iterate_in_thread, parse_records
 
 router = APIRouter()
 
 @router.post("/transactions/", response_model=Transaction)
-def create_transaction(
+async def create_transaction(
     transaction: TransactionCreate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await run_sync(db, financial.create_transaction, transaction, response_model=Transaction)
+
+@router.post("/transactions/bulk", response_model=TransactionIngestResult)
+async def bulk_create_transactions(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Defaults from Content-Type: application/x-ndjson or text/csv"),
+    batch_size: int = Query(financial.INGEST_BATCH_SIZE, ge=1, le=50000),
+    atomic: bool = Query(False, description="Reject the whole upload when any row is invalid"),
     db: Session = Depends(get_db)
 ):
-    return financial.create_transaction(db, transaction)
+    """
+    Import transactions from a CSV (with a header row) or NDJSON request
+    body. The body is read as it streams in and loaded in batches with COPY;
+    rows that fail validation are reported by line number.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "json" in content_type else "csv"
+
+    body = request.stream()
+
+    def ingest():
+        records = parse_records(iter_lines(iterate_in_thread(body)), format)
+        return financial.bulk_create_transactions(db, records, batch_size=batch_size, atomic=atomic)
+
+    try:
+        return await run_in_threadpool(ingest)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/transactions/export")
+def export_transactions(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    transaction_type: Optional[TransactionType] = None,
+    category: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+):
+    """
+    Stream every matching transaction as CSV or NDJSON, oldest first. Rows
+    are written as they are fetched, so the download starts before the
+    query finishes and server memory does not depend on its size.
+    """
+    columns = [column.key for column in financial.EXPORT_COLUMNS]
+
+    def stream():
+        # The request's own session is closed before the body is sent, so
+        # the generator holds a session for as long as it streams
+        init_engine()
+        db = SessionLocal()
+        try:
+            rows = financial.stream_transactions(db, transaction_type, category, start_date, end_date)
+            yield from encode_rows(rows, columns, format)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename=transactions.{format}"}
+    )
 
-@router.get("/transactions/", response_model=List[Transaction])
-def list_transactions(skip: int = 0,
-    limit: int = 100,
+@router.get("/transactions/", response_model=Union[List[Transaction], CursorPage[Transaction]])
+async def list_transactions(skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
     transaction_type: Optional[TransactionType] = None,
     category: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db)):
-    transactions = financial.get_transactions(
-        db, 
+    pagination: str = Query("offset", pattern="^(offset|cursor)$", description="cursor returns {items, next_cursor} pages ordered by a stable key"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; implies pagination=cursor"),
+    db: AsyncSession = Depends(get_async_db)):
+    if pagination == "cursor" or cursor:
+        try:
+            items, next_cursor = await run_sync(
+                db,
+                financial.get_transactions_page,
+                limit=limit,
+                cursor=cursor,
+                transaction_type=transaction_type,
+                category=category,
+                start_date=start_date,
+                end_date=end_date,
+                response_model=Tuple[List[Transaction], Optional[str]]
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return CursorPage[Transaction](items=items, next_cursor=next_cursor)
+
+    transactions = await run_sync(
+        db,
+        financial.get_transactions,
         skip=skip, 
         limit=limit,
         transaction_type=transaction_type,
         category=category,
         start_date=start_date,
-        end_date=end_date
+        end_date=end_date,
+        response_model=List[Transaction]
     )
     return transactions
 
 @router.get("/transactions/{transaction_id}", response_model=Transaction)
-def get_transaction(transaction_id: int, db: Session = Depends(get_db)):
-    db_transaction = financial.get_transaction(db, transaction_id)
+async def get_transaction(transaction_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_transaction = await run_sync(db, financial.get_transaction, transaction_id, response_model=Optional[Transaction])
     if db_transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return db_transaction
@@ -64,82 +151,57 @@ def get_monthly_summary(year: int, month: int, db: Session = Depends(get_db)):
 @router.get("/account-categories/", response_model=List[AccountCategorySchema])
 def list_account_categories(
     type: Optional[TransactionType] = None,
-    parent_id: Optional[int] = None,
+    parent_id: Optional[int] = Query(None, description="Only return categories anywhere beneath this one"),
     db: Session = Depends(get_db)
 ):
-    query = db.query(AccountCategory)
-    if type:
-        query = query.filter(AccountCategory.type == type)
-    
-    # if parent_id is not None:
-    #     query = query.filter(AccountCategory.parent_id == parent_id)
-    # else:
-    #     query = query.filter(AccountCategory.parent_id.is_(None))
-
-    return query.all()
+    return financial.get_account_categories(db, type, ancestor_id=parent_id)
 
 @router.get("/account-categories/{category_id}", response_model=AccountCategorySchema)
 def get_account_category(category_id: int, db: Session = Depends(get_db)):
-    db_category = db.query(AccountCategory).filter(AccountCategory.id == category_id).first()
+    db_category = financial.get_account_category(db, category_id)
     if db_category is None:
         raise HTTPException(status_code=404, detail="Account category not found")
     return db_category
 
+@router.get("/account-categories/{category_id}/balance")
+def get_account_category_balance(
+    category_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    if financial.get_account_category(db, category_id) is None:
+        raise HTTPException(status_code=404, detail="Account category not found")
+    return financial.get_account_category_balance(db, category_id, start_date, end_date)
+
 
 @router.post("/account-categories/", response_model=AccountCategorySchema)
 def create_account_category(
     category: AccountCategoryCreate,
     db: Session = Depends(get_db)
 ):
-    
-    query_exists = db.query(AccountCategory).filter(AccountCategoryCreate.code == category.code).first()
-
-    if query_exists:
-        raise HTTPException(status_code=400, detail="Account category with this code already exists")
-    
-    db_category = AccountCategory(**category.dict())
-    db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
-    return db_category
+    try:
+        return financial.create_account_category(db, category)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/account-categories/{category_id}", response_model=AccountCategorySchema)
 def update_account_category(category_id: int, category_update: AccountCategoryCreate, db: Session = Depends(get_db)):
-    db_category = db.query(AccountCategory).filter(AccountCategory.id == category_id).first()
+    try:
+        db_category = financial.update_account_category(db, category_id, category_update)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if db_category is None:
         raise HTTPException(status_code=404, detail="Account category not found")
-    
-    if category_update.code != db_category.code:
-        query_exists = db.query(AccountCategory).filter(AccountCategory.code == category_update.code).first()
-        if query_exists:
-                    raise HTTPException(status_code=400, detail="Account code already exists")
-        
-    if category_update.parent_id and category_update.parent_id == category_id:
-        raise HTTPException(status_code=400, detail="Category cannot be its own parent")
-    
-    for key, value in category_update.dict().items():
-        setattr(db_category, key, value)
-    
-    db.commit()
-    db.refresh(db_category)
     return db_category
 
 @router.delete("/account-categories/{category_id}")
 def delete_account_category(category_id: int, db: Session = Depends(get_db)):
-    db_category = db.query(AccountCategory).filter(AccountCategory.id == category_id).first()
+    try:
+        success = financial.delete_account_category(db, category_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if not db_category:
+    if not success:
         raise HTTPException(status_code=404, detail="Account category not found")
-    
-    child_count = db.query(AccountCategory).filter(AccountCategory.parent_id == category_id).count()
-    if child_count > 0:
-        raise HTTPException(status_code=400, detail="Cannot delete category with child categories")
-    
-    transaction_count = db.query(Transaction).filter(Transaction.account_category_id == category_id).count()
-    if transaction_count > 0:
-        raise HTTPException(status_code=400, detail="Cannot delete category with transactions")
-    
-    db.delete(db_category)
-    db.commit()
     return {"status": "success"}
-
@@ -1,29 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple, Union
+from database import get_async_db, get_db, run_sync
 from schemas.inventory import InventoryItem, InventoryItemCreate, InventoryItemUpdate
+from schemas.pagination import CursorPage
 from crud import inventory
 
 router = APIRouter()
 
 @router.post("/", response_model=InventoryItem)
-def create_inventory_item(item: InventoryItemCreate, db: Session = Depends(get_db)):
-    return inventory.create_inventory_item(db, item)
+async def create_inventory_item(item: InventoryItemCreate, db: AsyncSession = Depends(get_async_db)):
+    return await run_sync(db, inventory.create_inventory_item, item, response_model=InventoryItem)
 
-@router.get("/", response_model=List[InventoryItem])
-def list_inventory_items(skip: int = 0, limit: int = 100, search: Optional[str] = None, db: Session = Depends(get_db)):
-    return inventory.get_inventory_items(db, skip, limit, search)
+@router.get("/", response_model=Union[List[InventoryItem], CursorPage[InventoryItem]])
+async def list_inventory_items(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    search: Optional[str] = None,
+    pagination: str = Query("offset", pattern="^(offset|cursor)$", description="cursor returns {items, next_cursor} pages ordered by a stable key"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; implies pagination=cursor"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if pagination == "cursor" or cursor:
+        try:
+            items, next_cursor = await run_sync(
+                db, inventory.get_inventory_items_page, limit, cursor, search,
+                response_model=Tuple[List[InventoryItem], Optional[str]]
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return CursorPage[InventoryItem](items=items, next_cursor=next_cursor)
+    return await run_sync(db, inventory.get_inventory_items, skip, limit, search, response_model=List[InventoryItem])
 
 @router.get("/analysis", response_model=dict)
-def get_inventory_analysis(db: Session = Depends(get_db)):
+def get_inventory_analysis(
+    model: Optional[str] = Query(None, pattern="^(linear|forest)$", description="Forecast model; forest fits one RandomForest per item"),
+    db: Session = Depends(get_db)
+):
     print("Analyzing inventory sales...")
 
-    return inventory.analyze_inventory_sales(db)
+    return inventory.analyze_inventory_sales(db, model)
 
 @router.get("/{item_id}", response_model=InventoryItem)
-def get_inventory_item(item_id: int, db: Session = Depends(get_db)):
-    db_item = inventory.get_inventory_item(db, item_id)
+async def get_inventory_item(item_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_item = await run_sync(db, inventory.get_inventory_item, item_id, response_model=Optional[InventoryItem])
     if db_item is None:
         raise HTTPException(status_code=404, detail="Inventory item is not found")
     return db_item
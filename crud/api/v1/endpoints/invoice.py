@@ -1,42 +1,90 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
 from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Tuple, Union
 from datetime import datetime
-from database import get_db
+from database import get_async_db, get_db, run_sync
 from schemas.invoice import (
-    Invoice, InvoiceCreate, InvoiceItem, InvoiceUpdate,
-    PaymentHistoryCreate
+    Invoice, InvoiceBatchResponse, InvoiceCreate, InvoiceItem, InvoiceUpdate,
+    PaymentHistoryCreate, ReceivablesAging
 )
-from models.invoice import InvoiceStatus
+from schemas.pagination import CursorPage
+from models.invoice import Currency, InvoiceStatus
 from crud import invoice
+from config import settings
+from utils.blob_store import blob_store
+from utils.executor import ExecutorBusy, cpu_executor
 import os
-from utils.pdf_generator import PDFGenerator
 
 router = APIRouter()
 
 @router.post("/invoices/", response_model=Invoice)
-def create_invoice(invoice_data: InvoiceCreate, db: Session = Depends(get_db)):
+async def create_invoice(invoice_data: InvoiceCreate, db: AsyncSession = Depends(get_async_db)):
     try:
-        return invoice.create_invoice(db, invoice_data)
+        return await run_sync(db, invoice.create_invoice, invoice_data, response_model=Invoice)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/invoices/", response_model=List[Invoice])
-def list_invoices(
-    skip: int = 0,
-    limit: int = 100,
+@router.post("/invoices/batch", response_model=InvoiceBatchResponse)
+def create_invoices_batch(
+    payloads: List[Dict[str, Any]] = Body(..., description="InvoiceCreate payloads, itemized or with transaction_ids"),
+    atomic: bool = Query(False, description="Create nothing when any invoice is invalid"),
+    db: Session = Depends(get_db)
+):
+    """
+    Create up to 5000 invoices in one transaction. Each payload gets a result
+    in request order, with the new invoice's id, number and total or the
+    reasons it was rejected.
+    """
+    try:
+        return invoice.bulk_create_invoices(db, payloads, atomic=atomic)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/invoices/", response_model=Union[List[Invoice], CursorPage[Invoice]])
+async def list_invoices(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
     status: Optional[InvoiceStatus] = None,
     client_name: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    pagination: str = Query("offset", pattern="^(offset|cursor)$", description="cursor returns {items, next_cursor} pages ordered by a stable key"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; implies pagination=cursor"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if pagination == "cursor" or cursor:
+        try:
+            items, next_cursor = await run_sync(
+                db, invoice.get_invoices_page, limit, cursor, status, client_name, start_date, end_date,
+                response_model=Tuple[List[Invoice], Optional[str]]
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return CursorPage[Invoice](items=items, next_cursor=next_cursor)
+    return await run_sync(
+        db, invoice.get_invoices, skip, limit, status, client_name, start_date, end_date,
+        response_model=List[Invoice]
+    )
+
+@router.get("/invoices/aging", response_model=ReceivablesAging)
+def get_receivables_aging(
+    as_of: Optional[datetime] = Query(None, description="Age balances at this time instead of now"),
+    currency: Optional[Currency] = None,
     db: Session = Depends(get_db)
 ):
-    return invoice.get_invoices(db, skip, limit, status, client_name, start_date, end_date)
+    """
+    Accounts receivable aging: what each client owes on sent and overdue
+    invoices, bucketed into current, 1-30, 31-60, 61-90 and over 90 days
+    past due
+    """
+    return invoice.receivables_aging(db, as_of, currency)
 
 @router.get("/invoices/{invoice_id}", response_model=Invoice)
-def get_invoice(invoice_id: int, db: Session = Depends(get_db)):
-    db_invoice = invoice.get_invoice(db, invoice_id)
+async def get_invoice(invoice_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_invoice = await run_sync(db, invoice.get_invoice, invoice_id, response_model=Optional[Invoice])
     if not db_invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
     return db_invoice
@@ -58,32 +106,61 @@ def add_payment(invoice_id: int, payment: PaymentHistoryCreate, db: Session = De
 @router.get("/invoices/{invoice_id}/pdf", response_class=FileResponse)
 async def generate_invoice_pdf(
     invoice_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """
+    The invoice as a PDF. Renders are cached in the blob store under a hash
+    of the invoice's content, so a PDF is only rendered again after the
+    invoice changes.
+    """
+    from utils.pdf_generator import PDFGenerator, invoice_pdf_key
+
     try:
-        db_invoice = invoice.get_invoice(db, invoice_id)
+        db_invoice = await run_sync(db, invoice.get_invoice, invoice_id, response_model=Optional[Invoice])
         if not db_invoice:
             raise HTTPException(status_code=404, detail="Invoice not found")
-        
-        os.makedirs("invoices", exist_ok=True)
-        
-        pdf_generator = PDFGenerator(os.getenv("ANTHROPIC_API_KEY"))
-        output_path = f"invoices/invoice_{invoice_id}.pdf"
-        
-        pdf_path = pdf_generator.create_pdf(db_invoice, output_path)
-        
-        db_invoice.pdf_url = pdf_path
-        db.commit()
-        
-        if os.path.exists(pdf_path):
-            return FileResponse(
-                path=pdf_path,
-                filename=f"invoice_{invoice_id}.pdf",
-                media_type="application/pdf"
-            )
-        else:
-            raise HTTPException(status_code=500, detail="Failed to generate PDF")
-            
+
+        key = invoice_pdf_key(db_invoice)
+        filename = f"invoice_{invoice_id}.pdf"
+        if not blob_store.exists(key):
+            pdf_generator = PDFGenerator(settings.ANTHROPIC_API_KEY)
+            description = await pdf_generator.generate_invoice_content(db_invoice)
+            output_path = blob_store.new_temp_path(key)
+            try:
+                # reportlab rendering is CPU-bound; the pydantic invoice
+                # pickles cleanly into the process pool
+                await cpu_executor.run(pdf_generator.create_pdf, db_invoice, output_path, description)
+                if description is None:
+                    # Rendered without the model's description: serve it
+                    # once, but leave the key free for a complete render
+                    return FileResponse(
+                        path=output_path, filename=filename, media_type="application/pdf",
+                        background=BackgroundTask(os.unlink, output_path)
+                    )
+                blob_store.put_file(key, output_path)
+            except BaseException:
+                if os.path.exists(output_path):
+                    os.unlink(output_path)
+                raise
+
+        if db_invoice.pdf_url != key:
+            await run_sync(db, invoice.set_invoice_pdf_url, invoice_id, key)
+            if db_invoice.pdf_url:
+                # Keys are per invoice content, so the superseded render is
+                # no longer reachable
+                blob_store.delete(db_invoice.pdf_url)
+
+        local_path = blob_store.local_path(key)
+        if local_path is not None:
+            return FileResponse(path=local_path, filename=filename, media_type="application/pdf")
+        return Response(
+            content=blob_store.read(key),
+            media_type="application/pdf",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    except (HTTPException, ExecutorBusy):
+        raise
     except Exception as e:
         print(f"Error in generate_invoice_pdf: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from database import get_db
+from schemas.reconciliation import ReconciliationResult
+from models.invoice import Currency
+from crud import reconciliation
+from crud.reconciliation import ReconciliationConflict
+
+router = APIRouter()
+
+@router.post("/statements", response_model=ReconciliationResult)
+async def reconcile_statement(
+    request: Request,
+    currency: Currency = Query(..., description="Currency of the statement's account; only invoices in it are matched"),
+    dry_run: bool = Query(False, description="Match and report without recording payments"),
+    db: Session = Depends(get_db)
+):
+    """
+    Reconcile a bank statement CSV (columns amount and optionally
+    reference, client_name, date, bank_reference) against the open
+    invoices in its currency. Credits are matched by an invoice number
+    quoted in the reference, then by client and
+    exact balance, then spread over the client's invoices oldest first;
+    every allocation is recorded as a payment.
+    """
+    data = await request.body()
+    try:
+        return await run_in_threadpool(reconciliation.reconcile_statement, db, data, currency, dry_run)
+    except ReconciliationConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,10 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, date
 from database import get_db
 from crud import reports
 from schemas.reports import ProfitLossReport, BalanceSheet, RevenuePrediction
+from utils.cache import dashboard_cache
+from utils.executor import ExecutorBusy, cpu_executor
+from utils.llm_gateway import LLMTimeout
+import os
+import tempfile
 
 router = APIRouter()
 
@@ -12,6 +19,7 @@ router = APIRouter()
 def get_profit_loss_report(
     start_date: date = Query(..., description="Start date of the report period"),
     end_date: date = Query(..., description="End date of the report period"),
+    breakdown: str = Query("month", pattern="^(month|category)$", description="Group the breakdown by month or by account category"),
     db: Session = Depends(get_db)
 ):
     """
@@ -20,7 +28,8 @@ def get_profit_loss_report(
     return reports.generate_pnl(
         db,
         datetime.combine(start_date, datetime.min.time()),
-        datetime.combine(end_date, datetime.max.time())
+        datetime.combine(end_date, datetime.max.time()),
+        breakdown
     )
 
 @router.get("/balance-sheet", response_model=BalanceSheet)
@@ -54,7 +63,7 @@ def get_revenue_prediction(
 
 @router.get("/dashboard")
 def get_dashboard_overview(
-    period: str = Query(..., regex="^(30d|90d|year)$", description="Period for dashboard data"),
+    period: str = Query(..., pattern="^(30d|90d|year)$", description="Period for dashboard data"),
     db: Session = Depends(get_db)
 ):
     """
@@ -65,6 +74,13 @@ def get_dashboard_overview(
     """
     return reports.get_dashboard_data(db, period)
 
+@router.get("/dashboard/cache-stats")
+def get_dashboard_cache_stats():
+    """
+    Hit/miss counters of the dashboard response cache
+    """
+    return dashboard_cache.stats()
+
 @router.get("/profit-loss-ifrs", response_model=dict)
 def get_profit_loss_ifrs(
     start_date: date = Query(..., description="Start date of the report period"),
@@ -96,7 +112,7 @@ def get_balance_sheet_ifrs(
 @router.get("/export/{report_type}")
 def export_report(
     report_type: str,
-    format: str = Query("pdf", regex="^(pdf|excel)$"),
+    format: str = Query("pdf", pattern="^(pdf|excel)$"),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     as_of_date: Optional[date] = None,
@@ -123,22 +139,37 @@ def export_report(
         else:
             raise HTTPException(status_code=400, detail="Invalid report type")
 
+        # Rendering runs in the process pool so a large export does not hold
+        # the GIL while other requests are served
         if format == "pdf":
-            pdf_data = reports.generate_pdf_report(report_type, data)
+            pdf_data = cpu_executor.call(reports.generate_pdf_report, report_type, data)
             filename = f"{filename}.pdf"
             media_type = "application/pdf"
             content = pdf_data
-        else:  
-            excel_data = reports.generate_excel_report(report_type, data)
-            filename = f"{filename}.xlsx"
-            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            content = excel_data
+        else:
+            # The worker streams the workbook into a temp file, which is sent
+            # in chunks and removed once the response is done
+            fd, path = tempfile.mkstemp(suffix=".xlsx")
+            os.close(fd)
+            try:
+                cpu_executor.call(reports.write_excel_report, report_type, data, path)
+            except BaseException:
+                os.unlink(path)
+                raise
+            return FileResponse(
+                path,
+                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                filename=f"{filename}.xlsx",
+                background=BackgroundTask(os.unlink, path)
+            )
 
         return Response(
             content=content,
             media_type=media_type,
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
+    except ExecutorBusy:
+        raise
     except Exception as e:
         import traceback
         error_detail = traceback.format_exc()
@@ -192,6 +223,8 @@ def export_report_html(
             media_type="text/html",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
+    except LLMTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         print("f", e)
 
@@ -1,11 +1,32 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import extract, func
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import Column, MetaData, Table, any_, delete, exists, extract, func, insert, literal, select, text
+from sqlalchemy.dialects.postgresql import array
 from datetime import datetime
-from typing import List, Optional
-from crud import inventory
-from models.financial import Transaction, TransactionType
-from schemas.financial import TransactionCreate, TransactionUpdate
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+from crud import inventory, rollups
+from models.financial import Transaction, TransactionType, TransactionMonthlyRollup, AccountCategory, AccountCategoryClosure
+from models.inventory import InventoryItem
+from schemas.financial import TransactionCreate, TransactionUpdate, AccountCategoryCreate
+from utils.cache import invalidate_table
+from utils.ingest import copy_rows
+from utils.pagination import keyset_page
 
+TRANSACTION_ORDER = [Transaction.transaction_date, Transaction.id]
+
+# Bulk ingestion: rows are COPYed into a per-transaction staging table and
+# moved into transactions, the rollups and inventory with set-based statements
+INGEST_COLUMNS = (
+    "amount", "transaction_type", "description", "category", "transaction_date",
+    "notes", "region", "inventory_item_id", "quantity", "account_category_id"
+)
+INGEST_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+ingest_staging = Table(
+    "transactions_ingest", MetaData(),
+    *[Column(name, Transaction.__table__.c[name].type) for name in INGEST_COLUMNS]
+)
 
 def create_transaction(db: Session, transaction: TransactionCreate) -> Transaction:
     transaction_data = transaction.model_dump()
@@ -29,22 +50,153 @@ def create_transaction(db: Session, transaction: TransactionCreate) -> Transacti
         inventory.update_inventory_quantity(db, inventory_item_id, quantity_change)
     
     db.add(db_transaction)
+    rollups.add_transaction(db, db_transaction)
     db.commit()
+    invalidate_table("transactions")
     db.refresh(db_transaction)
     return db_transaction
 
+@lru_cache(maxsize=None)
+def _transaction_batch_adapter():
+    from pydantic import TypeAdapter
+    return TypeAdapter(List[TransactionCreate])
+
+def _validate_transaction_batch(batch: list) -> Tuple[list, list]:
+    """
+    Validate (line, record) pairs against TransactionCreate in one call.
+    Returns the (line, TransactionCreate) pairs that passed and the errors
+    of the rest.
+    """
+    from pydantic import ValidationError
+
+    adapter = _transaction_batch_adapter()
+    lines = [line for line, _ in batch]
+    records = [record for _, record in batch]
+    try:
+        return list(zip(lines, adapter.validate_python(records))), []
+    except ValidationError as e:
+        problems = {}
+        for error in e.errors():
+            index, *field = error["loc"]
+            problems.setdefault(index, []).append(f"{'.'.join(map(str, field)) or 'row'}: {error['msg']}")
+
+    keep = [i for i in range(len(batch)) if i not in problems]
+    valid = adapter.validate_python([records[i] for i in keep])
+    errors = [{"line": lines[i], "errors": messages} for i, messages in problems.items()]
+    return list(zip([lines[i] for i in keep], valid)), errors
+
+def _missing_ids(db: Session, model, ids: set, known: set) -> set:
+    """
+    ids that have no row in model's table; ids seen before are remembered in
+    known so each is looked up once per upload
+    """
+    unknown = ids - known
+    if not unknown:
+        return set()
+    found = {row_id for (row_id,) in db.query(model.id).filter(model.id.in_(unknown))}
+    known |= found
+    return unknown - found
+
+def _moves_stock(transaction: TransactionCreate) -> bool:
+    # As in create_transaction, an item reference only counts with a quantity
+    return bool(transaction.inventory_item_id and transaction.quantity)
+
+def _load_transaction_batch(db: Session, batch: list, known_items: set, known_categories: set) -> Tuple[int, list]:
+    valid, errors = _validate_transaction_batch(batch)
+
+    missing_items = _missing_ids(db, InventoryItem, {t.inventory_item_id for _, t in valid if _moves_stock(t)}, known_items)
+    missing_categories = _missing_ids(db, AccountCategory, {t.account_category_id for _, t in valid}, known_categories)
+
+    rows = []
+    for line, t in valid:
+        problems = []
+        if _moves_stock(t) and t.inventory_item_id in missing_items:
+            problems.append(f"Inventory item with ID {t.inventory_item_id} not found")
+        if t.account_category_id in missing_categories:
+            problems.append(f"Account category with ID {t.account_category_id} not found")
+        if problems:
+            errors.append({"line": line, "errors": problems})
+            continue
+        item_id, quantity = (t.inventory_item_id, t.quantity) if _moves_stock(t) else (None, None)
+        rows.append((
+            t.amount, t.transaction_type, t.description, t.category, t.transaction_date,
+            t.notes, t.region, item_id, quantity, t.account_category_id
+        ))
+
+    if rows:
+        copy_rows(db, ingest_staging, ingest_staging.c.keys(), rows)
+    return len(rows), errors
+
+def bulk_create_transactions(db: Session, records: Iterable[Tuple[int, object]],
+                             batch_size: int = INGEST_BATCH_SIZE, atomic: bool = False) -> dict:
+    """
+    Load transactions from (line number, record) pairs, e.g. from
+    utils.ingest.parse_records. Records are validated and COPYed batch by
+    batch; at the end the staged rows are inserted, added to the rollups and
+    applied to inventory (net per item) with one statement each, and
+    committed together. Invalid rows are skipped and reported, or with
+    atomic=True abort the whole load.
+    """
+    db.execute(text(f"DROP TABLE IF EXISTS pg_temp.{ingest_staging.name}"))
+    db.execute(text(
+        f"CREATE TEMP TABLE {ingest_staging.name} ON COMMIT DROP AS "
+        f"SELECT {', '.join(INGEST_COLUMNS)} FROM transactions WITH NO DATA"
+    ))
+
+    received = inserted = error_count = 0
+    errors = []
+    known_items, known_categories = set(), set()
+
+    def flush(batch):
+        nonlocal inserted, error_count
+        loaded, batch_errors = _load_transaction_batch(db, batch, known_items, known_categories)
+        inserted += loaded
+        error_count += len(batch_errors)
+        errors.extend(batch_errors[:MAX_REPORTED_ERRORS - len(errors)])
+
+    batch = []
+    for line, record in records:
+        received += 1
+        if isinstance(record, str):
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": line, "errors": [record]})
+            continue
+        batch.append((line, record))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    if atomic and error_count:
+        db.rollback()
+        inserted = 0
+    elif inserted:
+        db.execute(insert(Transaction).from_select(list(INGEST_COLUMNS), select(ingest_staging)))
+        rollups.add_transactions_from(db, ingest_staging)
+        inventory.apply_stock_movements(db, ingest_staging)
+        db.execute(text(f"DROP TABLE {ingest_staging.name}"))
+        db.commit()
+        invalidate_table("transactions")
+    else:
+        db.rollback()
+
+    return {
+        "received": received,
+        "inserted": inserted,
+        "error_count": error_count,
+        "errors": sorted(errors, key=lambda error: error["line"])
+    }
+
 def get_transaction(db: Session, transaction_id: int) -> Optional[Transaction]:
     return db.query(Transaction).filter(Transaction.id == transaction_id).first()
 
-def get_transactions(db: Session, 
-    skip: int = 0, 
-    limit: int = 100,
+def _filter_transactions(query,
     transaction_type: Optional[TransactionType] = None,
     category: Optional[str] = None,
     start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None) -> List[Transaction]:
-    query = db.query(Transaction)
-
+    end_date: Optional[datetime] = None):
     if transaction_type:
         query = query.filter(Transaction.transaction_type == transaction_type)
     if category:
@@ -53,37 +205,85 @@ def get_transactions(db: Session,
         query = query.filter(Transaction.transaction_date >= start_date)
     if end_date:
         query = query.filter(Transaction.transaction_date <= end_date)
+    return query
+
+def get_transactions(db: Session, 
+    skip: int = 0, 
+    limit: int = 100,
+    transaction_type: Optional[TransactionType] = None,
+    category: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None) -> List[Transaction]:
+    query = _filter_transactions(db.query(Transaction), transaction_type, category, start_date, end_date)
+    return query.order_by(*TRANSACTION_ORDER).offset(skip).limit(limit).all()
+
+EXPORT_COLUMNS = [
+    Transaction.id, Transaction.amount, Transaction.transaction_type, Transaction.description,
+    Transaction.category, Transaction.transaction_date, Transaction.notes, Transaction.region,
+    Transaction.inventory_item_id, Transaction.quantity, Transaction.account_category_id
+]
+EXPORT_BATCH_SIZE = 2000
+
+def stream_transactions(db: Session,
+    transaction_type: Optional[TransactionType] = None,
+    category: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Rows of EXPORT_COLUMNS for every matching transaction in
+    TRANSACTION_ORDER, fetched through a server-side cursor batch_size rows
+    at a time so memory does not grow with the result
+    """
+    query = _filter_transactions(db.query(*EXPORT_COLUMNS), transaction_type, category, start_date, end_date)
+    yield from query.order_by(*TRANSACTION_ORDER).yield_per(batch_size)
 
-    return query.offset(skip).limit(limit).all()
+def get_transactions_page(db: Session,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    transaction_type: Optional[TransactionType] = None,
+    category: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None) -> Tuple[List[Transaction], Optional[str]]:
+    """
+    Keyset page ordered by (transaction_date, id); raises ValueError for a bad cursor
+    """
+    query = _filter_transactions(db.query(Transaction), transaction_type, category, start_date, end_date)
+    return keyset_page(query, TRANSACTION_ORDER, limit, cursor)
 
 def update_transaction(db: Session, transaction_id: int, transaction_update: TransactionUpdate) -> Optional[Transaction]:
     db_transaction = get_transaction(db, transaction_id)
     if db_transaction:
         update_data = transaction_update.model_dump(exclude_unset=True)
+        rollups.remove_transaction(db, db_transaction)
         for field, value in update_data.items():
             setattr(db_transaction, field, value)
+        rollups.add_transaction(db, db_transaction)
         db.commit()
+        invalidate_table("transactions")
         db.refresh(db_transaction)
     return db_transaction
 
 def delete_transaction(db: Session, transaction_id: int) -> bool:
     db_transaction = get_transaction(db, transaction_id)
     if db_transaction:
+        rollups.remove_transaction(db, db_transaction)
         db.delete(db_transaction)
         db.commit()
+        invalidate_table("transactions")
         return True
     return False
 
 def get_monthly_summary(db: Session, year: int, month: int) -> dict:
-    income = db.query(Transaction).filter(
-    Transaction.transaction_type == TransactionType.INCOME,
-    extract('year', Transaction.transaction_date) == year,
-    extract('month', Transaction.transaction_date) == month).with_entities(func.sum(Transaction.amount)).scalar() or 0
+    income = db.query(TransactionMonthlyRollup).filter(
+    TransactionMonthlyRollup.transaction_type == TransactionType.INCOME,
+    extract('year', TransactionMonthlyRollup.month) == year,
+    extract('month', TransactionMonthlyRollup.month) == month).with_entities(func.sum(TransactionMonthlyRollup.total_amount)).scalar() or 0
 
-    expense = db.query(Transaction).filter(
-    Transaction.transaction_type == TransactionType.EXPENSE,
-    extract('year', Transaction.transaction_date) == year,
-    extract('month', Transaction.transaction_date) == month).with_entities(func.sum(Transaction.amount)).scalar() or 0
+    expense = db.query(TransactionMonthlyRollup).filter(
+    TransactionMonthlyRollup.transaction_type == TransactionType.EXPENSE,
+    extract('year', TransactionMonthlyRollup.month) == year,
+    extract('month', TransactionMonthlyRollup.month) == month).with_entities(func.sum(TransactionMonthlyRollup.total_amount)).scalar() or 0
 
     return {
         "year": year,
@@ -94,4 +294,204 @@ def get_monthly_summary(db: Session, year: int, month: int) -> dict:
     }
 
 def get_financial_report(db: Session ):
-    pass
\ No newline at end of file
+    pass
+
+def get_account_category(db: Session, category_id: int) -> Optional[AccountCategory]:
+    return db.query(AccountCategory).filter(AccountCategory.id == category_id).first()
+
+def get_account_categories(db: Session, type: Optional[TransactionType] = None, ancestor_id: Optional[int] = None) -> List[AccountCategory]:
+    query = db.query(AccountCategory)
+    if type:
+        query = query.filter(AccountCategory.type == type)
+    if ancestor_id is not None:
+        query = query.join(
+            AccountCategoryClosure, AccountCategoryClosure.descendant_id == AccountCategory.id
+        ).filter(
+            AccountCategoryClosure.ancestor_id == ancestor_id,
+            AccountCategoryClosure.depth > 0
+        )
+    return query.order_by(AccountCategory.code).all()
+
+def _validate_parent(db: Session, parent_id: Optional[int], category_id: Optional[int] = None) -> None:
+    if parent_id is None:
+        return
+    if category_id is not None and parent_id == category_id:
+        raise ValueError("Category cannot be its own parent")
+    if not db.query(exists().where(AccountCategory.id == parent_id)).scalar():
+        raise ValueError(f"Parent category with ID {parent_id} not found")
+    if category_id is not None:
+        # The new parent must not sit inside the category's own subtree
+        in_subtree = db.query(exists().where(
+            AccountCategoryClosure.ancestor_id == category_id,
+            AccountCategoryClosure.descendant_id == parent_id
+        )).scalar()
+        if in_subtree:
+            raise ValueError("Category cannot be moved under one of its own descendants")
+
+def _attach_subtree(db: Session, category_id: int, parent_id: Optional[int]) -> None:
+    """
+    Link every node of category_id's subtree to parent_id and its ancestors
+    """
+    if parent_id is None:
+        return
+    ancestors = aliased(AccountCategoryClosure)
+    subtree = aliased(AccountCategoryClosure)
+    db.execute(insert(AccountCategoryClosure).from_select(
+        ["ancestor_id", "descendant_id", "depth"],
+        select(
+            ancestors.ancestor_id,
+            subtree.descendant_id,
+            ancestors.depth + subtree.depth + 1
+        ).select_from(ancestors).join(subtree, literal(True)).where(
+            ancestors.descendant_id == parent_id,
+            subtree.ancestor_id == category_id
+        )
+    ))
+
+def _detach_subtree(db: Session, category_id: int) -> None:
+    """
+    Remove the links between category_id's subtree and its current ancestors
+    """
+    subtree = select(AccountCategoryClosure.descendant_id).where(AccountCategoryClosure.ancestor_id == category_id)
+    ancestors = select(AccountCategoryClosure.ancestor_id).where(
+        AccountCategoryClosure.descendant_id == category_id,
+        AccountCategoryClosure.ancestor_id != category_id
+    )
+    db.execute(delete(AccountCategoryClosure).where(
+        AccountCategoryClosure.descendant_id.in_(subtree),
+        AccountCategoryClosure.ancestor_id.in_(ancestors)
+    ))
+
+def create_account_category(db: Session, category: AccountCategoryCreate) -> AccountCategory:
+    if db.query(exists().where(AccountCategory.code == category.code)).scalar():
+        raise ValueError("Account category with this code already exists")
+    _validate_parent(db, category.parent_id)
+
+    db_category = AccountCategory(**category.model_dump())
+    db.add(db_category)
+    db.flush()
+
+    db.add(AccountCategoryClosure(ancestor_id=db_category.id, descendant_id=db_category.id, depth=0))
+    db.flush()
+    _attach_subtree(db, db_category.id, db_category.parent_id)
+
+    db.commit()
+    db.refresh(db_category)
+    return db_category
+
+def update_account_category(db: Session, category_id: int, category_update: AccountCategoryCreate) -> Optional[AccountCategory]:
+    db_category = get_account_category(db, category_id)
+    if db_category is None:
+        return None
+
+    if category_update.code != db_category.code:
+        if db.query(exists().where(AccountCategory.code == category_update.code)).scalar():
+            raise ValueError("Account code already exists")
+
+    parent_changed = category_update.parent_id != db_category.parent_id
+    if parent_changed:
+        _validate_parent(db, category_update.parent_id, category_id)
+
+    for key, value in category_update.model_dump().items():
+        setattr(db_category, key, value)
+
+    if parent_changed:
+        _detach_subtree(db, category_id)
+        _attach_subtree(db, category_id, category_update.parent_id)
+
+    db.commit()
+    db.refresh(db_category)
+    return db_category
+
+def delete_account_category(db: Session, category_id: int) -> bool:
+    usage = db.query(
+        AccountCategory.id,
+        exists().where(
+            AccountCategoryClosure.ancestor_id == AccountCategory.id,
+            AccountCategoryClosure.depth == 1
+        ).label('has_children'),
+        exists().where(Transaction.account_category_id == AccountCategory.id).label('has_transactions')
+    ).filter(AccountCategory.id == category_id).first()
+
+    if usage is None:
+        return False
+    if usage.has_children:
+        raise ValueError("Cannot delete category with child categories")
+    if usage.has_transactions:
+        raise ValueError("Cannot delete category with transactions")
+
+    db.execute(delete(AccountCategoryClosure).where(
+        (AccountCategoryClosure.ancestor_id == category_id) | (AccountCategoryClosure.descendant_id == category_id)
+    ))
+    db.execute(delete(AccountCategory).where(AccountCategory.id == category_id))
+    db.commit()
+    return True
+
+def get_account_category_balance(db: Session, category_id: int, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> dict:
+    """
+    Balance of a category and its whole subtree, as one join of the closure
+    table against the monthly rollups
+    """
+    monthly = rollups.monthly_source(start_date, end_date)
+    totals = db.query(
+        func.sum(monthly.c.total_amount).label('amount'),
+        func.sum(monthly.c.transaction_count).label('transaction_count')
+    ).select_from(AccountCategoryClosure).join(
+        monthly, monthly.c.account_category_id == AccountCategoryClosure.descendant_id
+    ).filter(
+        AccountCategoryClosure.ancestor_id == category_id
+    ).one()
+
+    return {
+        "account_category_id": category_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "amount": float(totals.amount or 0),
+        "transaction_count": int(totals.transaction_count or 0)
+    }
+
+def _category_paths():
+    """
+    Recursive CTE of every (ancestor, descendant, depth) pair reachable
+    through parent_id, carrying the path walked so far. A step that would
+    revisit a category on its own path is emitted once with cycle set and
+    not followed, so legacy cyclic parent links terminate at any depth.
+    """
+    tree = select(
+        AccountCategory.id.label("ancestor_id"),
+        AccountCategory.id.label("descendant_id"),
+        literal(0).label("depth"),
+        array([AccountCategory.id]).label("path"),
+        literal(False).label("cycle")
+    ).cte("tree", recursive=True)
+    child = aliased(AccountCategory)
+    return tree.union_all(
+        select(
+            tree.c.ancestor_id,
+            child.id,
+            tree.c.depth + 1,
+            func.array_append(tree.c.path, child.id),
+            child.id == any_(tree.c.path)
+        ).where(child.parent_id == tree.c.descendant_id, ~tree.c.cycle)
+    )
+
+def rebuild_account_category_closure(db: Session) -> int:
+    """
+    Recompute the closure table from AccountCategory.parent_id; raises
+    ValueError, leaving the table as it was, when parent links form a cycle
+    """
+    tree = _category_paths()
+    cyclic = sorted(db.execute(select(tree.c.descendant_id).where(tree.c.cycle).distinct()).scalars())
+    if cyclic:
+        raise ValueError(
+            f"Account categories {', '.join(map(str, cyclic))} are in a parent_id cycle; "
+            "fix their parent_id before rebuilding"
+        )
+
+    db.execute(delete(AccountCategoryClosure))
+    db.execute(insert(AccountCategoryClosure).from_select(
+        ["ancestor_id", "descendant_id", "depth"],
+        select(tree.c.ancestor_id, tree.c.descendant_id, tree.c.depth)
+    ))
+    db.commit()
+    return db.query(func.count()).select_from(AccountCategoryClosure).scalar()
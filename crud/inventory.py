@@ -1,15 +1,12 @@
-from datetime import timedelta
-import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LinearRegression
-from sqlalchemy import func
+from sqlalchemy import case, func, select, update
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from config import settings
 from models.financial import Transaction, TransactionType
 from models.inventory import InventoryItem
 from models.invoice import Invoice, InvoiceItem, InvoiceStatus
 from schemas.inventory import InventoryItemCreate, InventoryItemUpdate
+from utils.pagination import keyset_page
 
 def create_inventory_item(db: Session, item: InventoryItemCreate) -> InventoryItem:
     db_item = InventoryItem(**item.dict())
@@ -27,7 +24,18 @@ def get_inventory_items(db: Session, skip: int = 0, limit: int = 100, search: Op
     if search:
         query = query.filter(InventoryItem.name.ilike(f'%{search}%'))
 
-    return query.offset(skip).limit(limit).all()
+    return query.order_by(InventoryItem.id).offset(skip).limit(limit).all()
+
+def get_inventory_items_page(db: Session, limit: int = 100, cursor: Optional[str] = None, search: Optional[str] = None) -> Tuple[List[InventoryItem], Optional[str]]:
+    """
+    Keyset page ordered by id; raises ValueError for a bad cursor
+    """
+    query = db.query(InventoryItem)
+
+    if search:
+        query = query.filter(InventoryItem.name.ilike(f'%{search}%'))
+
+    return keyset_page(query, [InventoryItem.id], limit, cursor)
 
 def update_inventory_item(db: Session, item_id: int, item_update: InventoryItemUpdate) -> Optional[InventoryItem]:
     db_item = get_inventory_item(db, item_id)
@@ -60,148 +68,190 @@ def update_inventory_quantity(db: Session, item_id: int, quantity_change: int) -
         db.refresh(db_item)
     return db_item
 
-def analyze_inventory_sales(db: Session) -> dict:
-    
-    items = db.query(InventoryItem).all()
-    items_analysis = []
+def apply_stock_movements(db: Session, source) -> int:
+    """
+    Apply the net quantity change of every transaction row in source (a
+    table shaped like transactions) to inventory with one set-based UPDATE;
+    sales reduce stock, other types add to it, and stock never drops below
+    zero. Returns the number of items updated.
+    """
+    delta = func.sum(case(
+        (source.c.transaction_type == TransactionType.INCOME, -source.c.quantity),
+        else_=source.c.quantity
+    ))
+    movements = select(
+        source.c.inventory_item_id.label("item_id"),
+        delta.label("delta")
+    ).where(
+        source.c.inventory_item_id.isnot(None),
+        source.c.quantity.isnot(None)
+    ).group_by(source.c.inventory_item_id).subquery("movements")
 
-    for item in items:
-        transactions = db.query(Transaction).filter(
-            Transaction.inventory_item_id == item.id,
-            Transaction.transaction_type == TransactionType.INCOME
-        ).all()
+    result = db.execute(
+        update(InventoryItem)
+        .where(InventoryItem.id == movements.c.item_id)
+        .values(quantity=func.greatest(InventoryItem.quantity + movements.c.delta, 0))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
 
-        invoice_items = db.query(InvoiceItem).filter(
-            InvoiceItem.inventory_item_id == item.id
-        ).join(Invoice).filter(
-            Invoice.status.in_([InvoiceStatus.PAID, InvoiceStatus.SENT])
-        ).all()
-
-        total_quantity_sold = sum(t.quantity for t in transactions if t.quantity) + \
-                            sum(float(i.quantity) for i in invoice_items)
-        
-        total_revenue = sum(t.amount for t in transactions) + \
-                       sum(i.amount for i in invoice_items)
-        
-        # Regional analysis
-        regional_data = db.query(
-            Transaction.region, 
+def get_inventory_sales_frames(db: Session) -> dict:
+    """
+    Load per-item sales aggregates with a fixed number of grouped queries,
+    independent of the catalogue size
+    """
+    import pandas as pd
+
+    items = pd.DataFrame(
+        db.query(InventoryItem.id, InventoryItem.name, InventoryItem.quantity).order_by(InventoryItem.id).all(),
+        columns=['id', 'name', 'quantity']
+    )
+
+    regional = pd.DataFrame(
+        db.query(
+            Transaction.inventory_item_id,
+            Transaction.region,
             func.sum(Transaction.quantity).label('quantity_sold'),
-            func.sum(Transaction.amount).label('revenue')
+            func.sum(Transaction.amount).label('revenue'),
+            func.count(Transaction.id).label('transaction_count')
         ).filter(
-            Transaction.inventory_item_id == item.id,
+            Transaction.inventory_item_id.isnot(None),
             Transaction.transaction_type == TransactionType.INCOME
-        ).group_by(Transaction.region).all()
-        
-        # Correctly format regional data
-        regional_sales = [
-            {
-                "region": region.region,  # Use region.region to get the string value
-                "quantity_sold": float(region.quantity_sold) if region.quantity_sold else 0,
-                "revenue": float(region.revenue) if region.revenue else 0,
-            }
-            for region in regional_data
-        ]
-
-        regional_sales.sort(key=lambda x: x["revenue"], reverse=True)
-        
-        sales_by_month = db.query(
-            func.date_trunc('month', Transaction.transaction_date).label('month'),
+        ).group_by(Transaction.inventory_item_id, Transaction.region).all(),
+        columns=['item_id', 'region', 'quantity_sold', 'revenue', 'transaction_count']
+    )
+
+    invoiced = pd.DataFrame(
+        db.query(
+            InvoiceItem.inventory_item_id,
+            func.sum(InvoiceItem.quantity).label('quantity_sold'),
+            func.sum(InvoiceItem.amount).label('revenue')
+        ).join(Invoice).filter(
+            InvoiceItem.inventory_item_id.isnot(None),
+            Invoice.status.in_([InvoiceStatus.PAID, InvoiceStatus.SENT])
+        ).group_by(InvoiceItem.inventory_item_id).all(),
+        columns=['item_id', 'quantity_sold', 'revenue']
+    )
+
+    month = func.date_trunc('month', Transaction.transaction_date).label('month')
+    monthly = pd.DataFrame(
+        db.query(
+            Transaction.inventory_item_id,
+            month,
             func.sum(Transaction.quantity).label('quantity')
         ).filter(
-            Transaction.inventory_item_id == item.id,
+            Transaction.inventory_item_id.isnot(None),
             Transaction.transaction_type == TransactionType.INCOME
-        ).group_by('month').order_by('month').all()
-        
-        if len(sales_by_month) >= 3:  
-            X = np.array([
-                [i, m.month.month, m.month.isocalendar()[1]]  
-                for i, m in enumerate(sales_by_month)
-            ])
-            y = np.array([m.quantity for m in sales_by_month])
-            
-            model = RandomForestRegressor(n_estimators=100, random_state=42)
-            model.fit(X, y)
-            
-            next_month = sales_by_month[-1].month + timedelta(days=32)
-            next_month = next_month.replace(day=1) 
-            next_month_features = [
-                len(sales_by_month), 
-                next_month.month, 
-                next_month.isocalendar()[1]
-            ]
-            
-            predicted_quantity = float(model.predict([next_month_features])[0])
-            
-            # Add safety check for division by zero
-            if sales_by_month[-1].quantity > 0:
-                growth_rate = (predicted_quantity - sales_by_month[-1].quantity) / sales_by_month[-1].quantity
-            else:
-                growth_rate = 0
-            
-            feature_importance = {
-                "time_trend": model.feature_importances_[0],
-                "month_of_year": model.feature_importances_[1],
-                "week_of_year": model.feature_importances_[2]
-            }
-            prediction_confidence = 0.7 + (len(sales_by_month) / 20)  
-        else:
-            predicted_quantity = 0
-            growth_rate = 0
-            prediction_confidence = 0
-        
-        if item.quantity > 0 and total_quantity_sold > 0:
-            turnover_rate = total_quantity_sold / item.quantity
-        else:
-            turnover_rate = 0
-        
-        item_analysis = {
-            "id": item.id,
-            "name": item.name,
-            "current_stock": item.quantity,
-            "total_sold": total_quantity_sold,
-            "total_revenue": float(total_revenue),
-            "predicted_monthly_sales": max(0, predicted_quantity),
-            "growth_rate": growth_rate,
-            "turnover_rate": turnover_rate,
-            "prediction_confidence": prediction_confidence,
-            "revenue_impact": float(total_revenue) / (1 + item.quantity) if item.quantity > 0 else 0,
-            "restock_recommendation": "High" if (item.quantity < predicted_quantity * 2) else 
-                                     "Medium" if (item.quantity < predicted_quantity * 4) else "Low",
-            "regional_sales": regional_sales[:5]
+        ).group_by(Transaction.inventory_item_id, month).order_by(Transaction.inventory_item_id, month).all(),
+        columns=['item_id', 'month', 'quantity']
+    )
+
+    for frame, columns in ((regional, ['quantity_sold', 'revenue']), (invoiced, ['quantity_sold', 'revenue']), (monthly, ['quantity'])):
+        for column in columns:
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').astype(float).fillna(0.0)
+
+    return {
+        "items": items,
+        "regional": regional,
+        "invoiced": invoiced,
+        "monthly": monthly
+    }
+
+def analyze_inventory_sales(db: Session, forecast_mode: Optional[str] = None) -> dict:
+    import numpy as np
+    from utils import forecasting
+    from utils.model_store import model_store
+
+    frames = get_inventory_sales_frames(db)
+    items = frames["items"]
+    regional = frames["regional"]
+    monthly = frames["monthly"]
+
+    if items.empty:
+        return {
+            "top_selling_items": [],
+            "items_to_restock": [],
+            "growth_items": [],
+            "top_regions": [],
+            "all_items_analysis": []
         }
-        
-        items_analysis.append(item_analysis)
-    
-    # Properly indented - outside the loop
+
+    # Per-item totals: transactions (summed over regions) plus paid/sent invoice lines
+    sold = regional.groupby('item_id')[['quantity_sold', 'revenue']].sum()
+    invoiced = frames["invoiced"].set_index('item_id')[['quantity_sold', 'revenue']]
+    totals = sold.add(invoiced, fill_value=0).reindex(items['id'], fill_value=0.0)
+
+    stock = items['quantity'].to_numpy(dtype=float)
+    total_sold = totals['quantity_sold'].to_numpy()
+    total_revenue = totals['revenue'].to_numpy()
+
+    # Only items with 3+ months of sales get a forecast; the fits run in the
+    # shared process pool
+    predictions = forecasting.forecast_item_sales(
+        monthly,
+        forecast_mode or settings.FORECAST_MODE,
+        store=model_store
+    )
+
+    no_prediction = {
+        "predicted_monthly_sales": 0.0,
+        "growth_rate": 0,
+        "prediction_confidence": 0,
+        "feature_importance": {}
+    }
+    item_predictions = [predictions.get(item_id, no_prediction) for item_id in items['id']]
+    predicted = np.array([p["predicted_monthly_sales"] for p in item_predictions])
+
+    in_stock = stock > 0
+    turnover_rate = np.where(in_stock & (total_sold > 0), total_sold / np.where(in_stock, stock, 1), 0.0)
+    revenue_impact = np.where(in_stock, total_revenue / (1 + stock), 0.0)
+    restock = np.where(stock < predicted * 2, "High", np.where(stock < predicted * 4, "Medium", "Low"))
+
+    top_regions_by_item = {
+        item_id: group[['region', 'quantity_sold', 'revenue']].head(5).to_dict('records')
+        for item_id, group in regional.sort_values('revenue', ascending=False, kind='stable').groupby('item_id', sort=False)
+    }
+
+    items_analysis = []
+    for idx, item in enumerate(items.itertuples(index=False)):
+        prediction = item_predictions[idx]
+        items_analysis.append({
+            "id": int(item.id),
+            "name": item.name,
+            "current_stock": int(item.quantity),
+            "total_sold": float(total_sold[idx]),
+            "total_revenue": float(total_revenue[idx]),
+            "predicted_monthly_sales": max(0.0, prediction["predicted_monthly_sales"]),
+            "growth_rate": prediction["growth_rate"],
+            "turnover_rate": float(turnover_rate[idx]),
+            "prediction_confidence": prediction["prediction_confidence"],
+            "feature_importance": prediction["feature_importance"],
+            "revenue_impact": float(revenue_impact[idx]),
+            "restock_recommendation": str(restock[idx]),
+            "regional_sales": top_regions_by_item.get(item.id, [])
+        })
+
     items_analysis.sort(key=lambda x: x["revenue_impact"], reverse=True)
-    
-    # Calculate overall top regions
-    overall_top_regions = db.query(
-        Transaction.region,
-        func.sum(Transaction.quantity).label('quantity_sold'),
-        func.sum(Transaction.amount).label('revenue'),
-        func.count(Transaction.id.distinct()).label('transaction_count')
-    ).filter(
-        Transaction.transaction_type == TransactionType.INCOME,
-        Transaction.inventory_item_id.isnot(None)
-    ).group_by(Transaction.region).order_by(func.sum(Transaction.amount).desc()).limit(5).all()
-    
+
+    # Overall top regions, derived from the per-item regional aggregate
+    overall_top_regions = regional.groupby('region', as_index=False)[
+        ['quantity_sold', 'revenue', 'transaction_count']
+    ].sum().sort_values('revenue', ascending=False).head(5)
+
     formatted_top_regions = [
         {
             "region": region.region,
-            "quantity_sold": float(region.quantity_sold) if region.quantity_sold else 0,
-            "revenue": float(region.revenue) if region.revenue else 0,
-            "transaction_count": region.transaction_count
+            "quantity_sold": float(region.quantity_sold),
+            "revenue": float(region.revenue),
+            "transaction_count": int(region.transaction_count)
         }
-        for region in overall_top_regions
+        for region in overall_top_regions.itertuples(index=False)
     ]
-    
-    # Return statement outside the loop
+
     return {
         "top_selling_items": items_analysis[:5],
         "items_to_restock": [item for item in items_analysis if item["restock_recommendation"] == "High"],
         "growth_items": sorted(items_analysis, key=lambda x: x["growth_rate"], reverse=True)[:5],
-        "top_regions": formatted_top_regions,  # Added top regions overall
+        "top_regions": formatted_top_regions,
         "all_items_analysis": items_analysis
     }
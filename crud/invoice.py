@@ -1,10 +1,38 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
-from crud import inventory
+from sqlalchemy import and_, case, func, insert, literal, select, update
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from functools import lru_cache
 from models.financial import Transaction
-from models.invoice import Invoice, InvoiceItem, PaymentHistory, InvoiceStatus
+from models.inventory import InventoryItem
+from models.invoice import Currency, Invoice, InvoiceItem, PaymentHistory, InvoiceStatus
 from schemas.invoice import InvoiceCreate, InvoiceUpdate, PaymentHistoryCreate
+from utils.pagination import keyset_page
+
+INVOICE_ORDER = [Invoice.issue_date, Invoice.id]
+MAX_BATCH_INVOICES = 5000
+# numeric(10, 2) limit of the amount columns
+MAX_AMOUNT_CENTS = 9999999999
+# Issued invoices that can still be owed money
+RECEIVABLE_STATUSES = (InvoiceStatus.SENT, InvoiceStatus.OVERDUE)
+# Aging buckets by days past due: (name, first day, last day)
+AGING_BUCKETS = (
+    ("current", None, 0),
+    ("days_1_30", 1, 30),
+    ("days_31_60", 31, 60),
+    ("days_61_90", 61, 90),
+    ("days_over_90", 91, None),
+)
+
+def _require_ids(db: Session, model, ids: set, label: str) -> None:
+    ids.discard(None)
+    if not ids:
+        return
+    found = {row_id for (row_id,) in db.query(model.id).filter(model.id.in_(ids))}
+    missing = sorted(ids - found)
+    if missing:
+        raise ValueError(f"{label} not found: {', '.join(map(str, missing))}")
 
 def create_invoice(db: Session, invoice: InvoiceCreate) -> Invoice:
     if invoice.transaction_ids and len(invoice.transaction_ids) > 0:
@@ -21,32 +49,23 @@ def create_invoice(db: Session, invoice: InvoiceCreate) -> Invoice:
         tax_amount=tax_amount,
         total=total
     )
+    # Every referenced inventory item and transaction is checked with one
+    # query per table, however many lines the invoice has
+    _require_ids(db, InventoryItem, {item.inventory_item_id for item in invoice.items}, "Inventory items")
+    _require_ids(db, Transaction, {item.transaction_id for item in invoice.items}, "Transactions")
+
     db.add(db_invoice)
-    db.flush()  
+    db.flush()
 
-    for item in invoice.items:
-        item_data = item.dict(exclude={'inventory_item_id', 'transaction_id'})
-        
-        db_item = InvoiceItem(
-            invoice_id=db_invoice.id,
-            **item_data
-        )
-        
-        if item.inventory_item_id:
-            inventory_item = inventory.get_inventory_item(db, item.inventory_item_id)
-            if inventory_item:
-                db_item.inventory_item_id = item.inventory_item_id
-        
-        if item.transaction_id:
-            transaction = db.query(Transaction).get(item.transaction_id)
-            if transaction:
-                db_item.transaction_id = item.transaction_id
-        
-        db.add(db_item)
+    if invoice.items:
+        # A Core insert keeps this one executemany; the ORM bulk path splits
+        # it wherever the optional reference columns switch between NULL and set
+        db.execute(insert(InvoiceItem.__table__), [
+            {**item.dict(), "invoice_id": db_invoice.id} for item in invoice.items
+        ])
 
     db.commit()
-    db.refresh(db_invoice)
-    return db_invoice
+    return get_invoice(db, db_invoice.id)
 
 def create_invoice_from_transaction(db: Session, invoice: InvoiceCreate) -> Invoice:
     transactions = db.query(Transaction).filter(Transaction.id.in_(invoice.transaction_ids)).all()
@@ -85,25 +104,194 @@ def create_invoice_from_transaction(db: Session, invoice: InvoiceCreate) -> Invo
     
     db.commit()
     db.refresh(db_invoice)
-    return db_invoice
+    return get_invoice(db, db_invoice.id)
+
+@lru_cache(maxsize=None)
+def _invoice_batch_adapter():
+    from pydantic import TypeAdapter
+    return TypeAdapter(List[InvoiceCreate])
+
+def _validate_invoice_batch(payloads: list) -> Tuple[list, dict]:
+    """
+    Validate payloads against InvoiceCreate in one call. Returns the
+    (index, InvoiceCreate) pairs that passed and index -> messages for the
+    rest.
+    """
+    from pydantic import ValidationError
+
+    adapter = _invoice_batch_adapter()
+    try:
+        return list(enumerate(adapter.validate_python(payloads))), {}
+    except ValidationError as e:
+        problems = {}
+        for error in e.errors():
+            index, *field = error["loc"]
+            problems.setdefault(index, []).append(f"{'.'.join(map(str, field)) or 'invoice'}: {error['msg']}")
+
+    keep = [i for i in range(len(payloads)) if i not in problems]
+    return list(zip(keep, adapter.validate_python([payloads[i] for i in keep]))), problems
+
+def _scaled(value: Decimal, places: int) -> Optional[int]:
+    """
+    value * 10**places as an int, or None when value has more decimal places
+    """
+    scaled = value.scaleb(places)
+    return int(scaled) if scaled == scaled.to_integral_value() else None
+
+def _batch_totals(line_values: list, rates: list) -> Tuple[list, list, list]:
+    """
+    Subtotal, tax and total in cents for each invoice. line_values holds one
+    list per invoice of line values in 1/10000 units (quantity x unit price,
+    both in cents) and rates the tax rates in 1/100 percent. Integer
+    arithmetic rounds half up, as the numeric(10, 2) columns do with the
+    exact Decimal totals create_invoice computes. Callers keep each
+    invoice's summed line values within MAX_AMOUNT_CENTS * 100, which keeps
+    every intermediate below 2**63.
+    """
+    import numpy as np
+
+    counts = np.fromiter((len(values) for values in line_values), dtype=np.int64, count=len(line_values))
+    values = np.fromiter((value for values in line_values for value in values), dtype=np.int64, count=int(counts.sum()))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    exact = np.add.reduceat(values, starts)
+    rate = np.asarray(rates, dtype=np.int64)
+
+    subtotal = (exact + 50) // 100
+    tax = (exact * rate + 500000) // 1000000
+    total = (exact * 10000 + exact * rate + 500000) // 1000000
+    return subtotal.tolist(), tax.tolist(), total.tolist()
+
+def bulk_create_invoices(db: Session, payloads: list, atomic: bool = False) -> dict:
+    """
+    Create many invoices, itemized or from transaction_ids, in one
+    transaction: payloads are validated together, every referenced
+    inventory item and transaction is fetched with one query, totals are
+    computed for the whole batch at once and invoices and lines are
+    inserted with one bulk INSERT each. Invalid invoices are skipped and
+    reported, or with atomic=True nothing is created.
+    """
+    if len(payloads) > MAX_BATCH_INVOICES:
+        raise ValueError(f"At most {MAX_BATCH_INVOICES} invoices per batch, got {len(payloads)}")
+
+    valid, problems = _validate_invoice_batch(payloads)
+
+    item_ids = {item.inventory_item_id for _, data in valid if not data.transaction_ids for item in data.items}
+    transaction_ids = {item.transaction_id for _, data in valid if not data.transaction_ids for item in data.items}
+    transaction_ids.update(t for _, data in valid for t in data.transaction_ids or ())
+    item_ids.discard(None)
+    transaction_ids.discard(None)
+    known_items = {row_id for (row_id,) in db.query(InventoryItem.id).filter(InventoryItem.id.in_(item_ids))} if item_ids else set()
+    transactions = {
+        t.id: t for t in db.query(
+            Transaction.id, Transaction.amount, Transaction.quantity, Transaction.description
+        ).filter(Transaction.id.in_(transaction_ids))
+    } if transaction_ids else {}
+
+    # Lines and their values for every invoice that passed validation
+    pending = []
+    for index, data in valid:
+        errors = []
+        rate = _scaled(data.tax_rate, 2)
+        if rate is None:
+            errors.append("tax_rate: at most 2 decimal places")
+
+        lines, values = [], []
+        if data.transaction_ids:
+            found = [transactions[t] for t in dict.fromkeys(data.transaction_ids) if t in transactions]
+            if not found:
+                errors.append("No transactions found")
+            for t in found:
+                quantity = t.quantity if t.quantity else 1
+                lines.append({
+                    "description": t.description or f"Transaction #{t.id}",
+                    "quantity": quantity,
+                    "unit_price": t.amount / quantity,
+                    "amount": t.amount,
+                    "inventory_item_id": None,
+                    "transaction_id": t.id
+                })
+                values.append(_scaled(t.amount, 4))
+        else:
+            missing_items = sorted({item.inventory_item_id for item in data.items} - known_items - {None})
+            missing_transactions = sorted({item.transaction_id for item in data.items} - transactions.keys() - {None})
+            if missing_items:
+                errors.append(f"Inventory items not found: {', '.join(map(str, missing_items))}")
+            if missing_transactions:
+                errors.append(f"Transactions not found: {', '.join(map(str, missing_transactions))}")
+            for item in data.items:
+                lines.append(item.dict())
+                values.append(_scaled(item.quantity, 2) * _scaled(item.unit_price, 2))
+
+        if any(value > MAX_AMOUNT_CENTS * 100 for value in values):
+            errors.append(f"Line amounts must not exceed {MAX_AMOUNT_CENTS / 100:,.2f}")
+        elif sum(values) > MAX_AMOUNT_CENTS * 100:
+            errors.append(f"Invoice subtotal must not exceed {MAX_AMOUNT_CENTS / 100:,.2f}")
+        if errors:
+            problems[index] = errors
+        else:
+            pending.append((index, data, lines, values, rate))
+
+    results = {}
+    if pending:
+        subtotals, taxes, totals = _batch_totals([values for _, _, _, values, _ in pending],
+                                                 [rate for _, _, _, _, rate in pending])
+        accepted = []
+        for (index, data, lines, _, _), subtotal, tax, total in zip(pending, subtotals, taxes, totals):
+            if subtotal > MAX_AMOUNT_CENTS or total > MAX_AMOUNT_CENTS:
+                problems[index] = [f"Invoice total must not exceed {MAX_AMOUNT_CENTS / 100:,.2f}"]
+                continue
+            row = data.dict(exclude={'items', 'transaction_ids'})
+            row.update(subtotal=Decimal(subtotal).scaleb(-2), tax_amount=Decimal(tax).scaleb(-2),
+                       total=Decimal(total).scaleb(-2))
+            accepted.append((index, row, lines))
+        pending = accepted
+
+    created = []
+    if pending and not (atomic and problems):
+        created = db.execute(
+            insert(Invoice).returning(Invoice.id, Invoice.invoice_number, Invoice.total, sort_by_parameter_order=True),
+            [row for _, row, _ in pending]
+        ).all()
+        db.execute(insert(InvoiceItem.__table__), [
+            {**line, "invoice_id": invoice_id}
+            for (_, _, lines), (invoice_id, _, _) in zip(pending, created)
+            for line in lines
+        ])
+        db.commit()
+        for (index, _, _), (invoice_id, invoice_number, total) in zip(pending, created):
+            results[index] = {"index": index, "invoice_id": invoice_id, "invoice_number": invoice_number, "total": total}
+    else:
+        for index, _, _ in pending:
+            results[index] = {"index": index, "errors": ["Not created: atomic batch with rejected invoices"]}
+
+    for index, errors in problems.items():
+        results[index] = {"index": index, "errors": errors}
+    return {
+        "received": len(payloads),
+        "created": len(created),
+        "error_count": len(problems),
+        "results": [results[index] for index in range(len(payloads))]
+    }
+
+def _listing_query(db: Session):
+    # Invoices are serialized with their lines and payments; loading them
+    # up front keeps lazy loads (and, on the async engine, greenlet switches)
+    # out of pydantic validation
+    return db.query(Invoice).options(selectinload(Invoice.items), selectinload(Invoice.payment_history))
 
 def get_invoice(db: Session, invoice_id: int) -> Optional[Invoice]:
-    return db.query(Invoice).filter(Invoice.id == invoice_id).first()
+    return _listing_query(db).filter(Invoice.id == invoice_id).first()
 
 def get_invoice_by_number(db: Session, invoice_number: str) -> Optional[Invoice]:
     return db.query(Invoice).filter(Invoice.invoice_number == invoice_number).first()
 
-def get_invoices(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
+def _filter_invoices(
+    query,
     status: Optional[InvoiceStatus] = None,
     client_name: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None
-) -> List[Invoice]:
-    query = db.query(Invoice)
-    
+):
     if status:
         query = query.filter(Invoice.status == status)
     if client_name:
@@ -112,8 +300,38 @@ def get_invoices(
         query = query.filter(Invoice.issue_date >= start_date)
     if end_date:
         query = query.filter(Invoice.issue_date <= end_date)
-    
-    return query.offset(skip).limit(limit).all()
+    return query
+
+def get_invoices(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[InvoiceStatus] = None,
+    client_name: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> List[Invoice]:
+    query = _filter_invoices(_listing_query(db), status, client_name, start_date, end_date)
+    return query.order_by(*INVOICE_ORDER).offset(skip).limit(limit).all()
+
+def get_invoices_page(
+    db: Session,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    status: Optional[InvoiceStatus] = None,
+    client_name: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Tuple[List[Invoice], Optional[str]]:
+    """
+    Keyset page ordered by (issue_date, id); raises ValueError for a bad cursor
+    """
+    query = _filter_invoices(_listing_query(db), status, client_name, start_date, end_date)
+    return keyset_page(query, INVOICE_ORDER, limit, cursor)
+
+def set_invoice_pdf_url(db: Session, invoice_id: int, pdf_url: str) -> None:
+    db.query(Invoice).filter(Invoice.id == invoice_id).update({Invoice.pdf_url: pdf_url}, synchronize_session=False)
+    db.commit()
 
 def update_invoice(
     db: Session,
@@ -126,23 +344,91 @@ def update_invoice(
         for field, value in update_data.items():
             setattr(db_invoice, field, value)
         db.commit()
-        db.refresh(db_invoice)
-    return db_invoice
+        return get_invoice(db, db_invoice.id)
+    return None
 
 def add_payment(db: Session, invoice_id: int, payment: PaymentHistoryCreate) -> Optional[Invoice]:
-    db_invoice = get_invoice(db, invoice_id)
-    if not db_invoice:
+    """
+    Record a payment and add it to the invoice's amount_paid in one UPDATE.
+    The UPDATE row-locks the invoice, so concurrent payments are applied
+    one after another and whichever brings the balance to zero marks the
+    invoice PAID.
+    """
+    amount_paid = Invoice.amount_paid + payment.amount_paid
+    updated = db.execute(
+        update(Invoice)
+        .where(Invoice.id == invoice_id)
+        .values(
+            amount_paid=amount_paid,
+            status=case((amount_paid >= Invoice.total, literal(InvoiceStatus.PAID, Invoice.status.type)), else_=Invoice.status)
+        )
+        .returning(Invoice.id)
+    ).scalar()
+    if updated is None:
         return None
-    db_paymet = PaymentHistory(
-        invoice_id=invoice_id,
-        **payment.dict()
-    )
-    db.add(db_paymet)
 
-    total_paid = sum(i.amount_paid for i in db_invoice.payment_history) + payment.amount_paid
-    if total_paid >= db_invoice.total:
-        db_invoice.status = InvoiceStatus.PAID
+    db.add(PaymentHistory(invoice_id=invoice_id, **payment.dict()))
     db.commit()
-    db.refresh(db_invoice)
-    return db_invoice
+    return get_invoice(db, invoice_id)
+
+def mark_overdue_invoices(db: Session, as_of: Optional[datetime] = None) -> int:
+    """
+    Move every SENT invoice still owed money and due before as_of (default
+    now) to OVERDUE in one UPDATE; returns how many changed
+    """
+    as_of = as_of or datetime.now(timezone.utc)
+    count = db.execute(
+        update(Invoice)
+        .where(Invoice.status == InvoiceStatus.SENT, Invoice.due_date < as_of, Invoice.balance_due > 0)
+        .values(status=InvoiceStatus.OVERDUE)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return count
+
+def _aging_bucket(as_of: datetime, first_day: Optional[int], last_day: Optional[int]):
+    """
+    Condition on due_date for invoices first_day..last_day days past due at
+    as_of; an open end is unbounded
+    """
+    criteria = []
+    if first_day is not None:
+        criteria.append(Invoice.due_date < as_of - timedelta(days=first_day - 1))
+    if last_day is not None:
+        criteria.append(Invoice.due_date >= as_of - timedelta(days=last_day))
+    return and_(*criteria)
+
+def receivables_aging(db: Session, as_of: Optional[datetime] = None, currency: Optional[Currency] = None) -> dict:
+    """
+    Outstanding balances of issued invoices per client and currency, split
+    by days past due at as_of (default now), plus totals per currency.
+    Summed by the database in one grouped query.
+    """
+    as_of = as_of or datetime.now(timezone.utc)
+    buckets = [
+        func.coalesce(func.sum(Invoice.balance_due).filter(_aging_bucket(as_of, first_day, last_day)), 0).label(name)
+        for name, first_day, last_day in AGING_BUCKETS
+    ]
+    total = func.sum(Invoice.balance_due)
+    query = (
+        select(Invoice.client_name, Invoice.currency, *buckets, total.label("total"), func.count().label("invoice_count"))
+        .where(Invoice.status.in_(RECEIVABLE_STATUSES), Invoice.balance_due > 0)
+        .group_by(Invoice.client_name, Invoice.currency)
+        .order_by(Invoice.currency, total.desc(), Invoice.client_name)
+    )
+    if currency:
+        query = query.where(Invoice.currency == currency)
 
+    clients = [dict(row._mapping) for row in db.execute(query)]
+    totals = {}
+    for row in clients:
+        currency_total = totals.setdefault(row["currency"], dict.fromkeys(
+            [name for name, _, _ in AGING_BUCKETS] + ["total", "invoice_count"], 0
+        ))
+        for key in currency_total:
+            currency_total[key] += row[key]
+    return {
+        "as_of": as_of,
+        "clients": clients,
+        "totals": [{"currency": key, **values} for key, values in totals.items()]
+    }
@@ -0,0 +1,302 @@
+from sqlalchemy import BigInteger, Integer, Numeric, String, any_, bindparam, case, cast, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from decimal import Decimal
+from models.invoice import Currency, Invoice, InvoiceStatus, PaymentHistory
+from utils.ingest import copy_rows
+
+# Bank statement reconciliation: statement credits are matched to open
+# invoices with hash joins in pandas, then paid with one bulk insert into
+# payment_history and one set-based update of the invoices.
+STATEMENT_COLUMNS = ("amount", "reference", "client_name", "date", "bank_reference")
+MAX_STATEMENT_LINES = 200000
+MAX_REPORTED = 1000
+OPEN_STATUSES = (InvoiceStatus.DRAFT, InvoiceStatus.SENT, InvoiceStatus.OVERDUE)
+# In the order they are applied; a line is only offered to later rules
+# when earlier ones left it unmatched
+MATCH_RULES = ("reference", "client_amount", "client_oldest_first")
+PAYMENT_METHOD = "bank_transfer"
+# Invoice numbers are UUIDs; a reference may quote one among other text
+INVOICE_NUMBER_PATTERN = r"([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})"
+
+# (invoice id, amount) pairs passed as two arrays, for the set-based update
+_applied = select(
+    func.unnest(bindparam("ids", type_=ARRAY(Integer))).label("invoice_id"),
+    func.unnest(bindparam("amounts", type_=ARRAY(Numeric(10, 2)))).label("amount")
+).subquery("applied")
+
+
+class ReconciliationConflict(Exception):
+    pass
+
+
+def _invoice_numbers(column):
+    """
+    The first invoice number quoted in each reference, lower-cased, or NaN
+    """
+    return column.str.casefold().str.extract(INVOICE_NUMBER_PATTERN, expand=False)
+
+def _normalize_client(column):
+    # Client names repeat across lines and invoices; normalize each once
+    import pandas as pd
+
+    names = column.unique()
+    normalized = pd.Series(names).str.strip().str.casefold().str.replace(r"\s+", " ", regex=True)
+    return column.map(dict(zip(names, normalized)))
+
+def read_statement(data: bytes):
+    """
+    Parse a statement CSV (header row required, only amount is mandatory)
+    into a frame of credit lines with line, cents, reference (as written),
+    the invoice_number quoted in it, client, date and bank_reference. Returns the frame and the (line, message) pairs of
+    lines that could not be read; debits and zero amounts are dropped.
+    """
+    import io
+    import pandas as pd
+
+    try:
+        raw = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, skipinitialspace=True)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Unreadable statement: {e}")
+    raw.columns = [str(column).strip().lower() for column in raw.columns]
+    if "amount" not in raw.columns:
+        raise ValueError("Statement has no amount column")
+    if len(raw) > MAX_STATEMENT_LINES:
+        raise ValueError(f"At most {MAX_STATEMENT_LINES} statement lines, got {len(raw)}")
+    for column in STATEMENT_COLUMNS:
+        if column not in raw.columns:
+            raw[column] = ""
+
+    # Line numbers as in the file, after the header
+    raw.index = pd.RangeIndex(2, len(raw) + 2, name="line")
+    amount = raw["amount"].str.strip().str.replace(",", "", regex=False)
+    valid = amount.str.fullmatch(r"-?\d+(\.\d{1,2})?")
+    dates = pd.to_datetime(raw["date"].where(raw["date"].str.strip() != ""), errors="coerce", utc=True)
+    bad_date = dates.isna() & (raw["date"].str.strip() != "")
+
+    errors = [(line, "amount: not a valid amount") for line in raw.index[~valid]]
+    errors += [(line, "date: not a valid date") for line in raw.index[valid & bad_date]]
+    keep = valid & ~bad_date
+    cents = (pd.to_numeric(amount[keep]) * 100).round().astype("int64")
+    credits = cents[cents > 0].index
+
+    lines = pd.DataFrame({
+        "line": credits,
+        "cents": cents[credits].to_numpy(),
+        "reference": raw.loc[credits, "reference"].str.strip().to_numpy(),
+        "invoice_number": _invoice_numbers(raw.loc[credits, "reference"]).to_numpy(),
+        "client": _normalize_client(raw.loc[credits, "client_name"]).to_numpy(),
+        "date": dates[credits].array,
+        "bank_reference": raw.loc[credits, "bank_reference"].str.strip().to_numpy()
+    })
+    return lines, sorted(errors)
+
+def load_open_invoices(db: Session, currency: Currency):
+    """
+    Every invoice in currency with a balance still due, oldest due date
+    first, with the balance in cents and the client name normalized as
+    read_statement normalizes clients (invoice numbers are already
+    lower-case text)
+    """
+    import pandas as pd
+
+    query = select(
+        Invoice.id,
+        cast(Invoice.invoice_number, String),
+        Invoice.client_name,
+        Invoice.due_date,
+        cast(func.round(Invoice.balance_due * 100), BigInteger)
+    ).where(
+        Invoice.status.in_(OPEN_STATUSES), Invoice.currency == currency, Invoice.balance_due > 0
+    ).order_by(Invoice.due_date, Invoice.id)
+
+    invoices = pd.DataFrame(db.execute(query).all(), columns=["invoice_id", "invoice_number", "client", "due_date", "balance"])
+    invoices["client"] = _normalize_client(invoices["client"].fillna(""))
+    invoices["balance"] = invoices["balance"].astype("int64")
+    return invoices
+
+def _match_references(lines, invoices):
+    """
+    Lines whose reference quotes an invoice number pay that invoice,
+    partially or in full; several lines for one invoice are applied in
+    statement order
+    """
+    matched = lines.loc[lines["invoice_number"].notna(), ["line", "cents", "invoice_number"]].merge(
+        invoices[["invoice_id", "invoice_number", "balance"]], on="invoice_number"
+    )
+    before = matched.groupby("invoice_id")["cents"].cumsum() - matched["cents"]
+    matched["allocated"] = (matched["balance"] - before).clip(lower=0).clip(upper=matched["cents"])
+    return matched[["line", "invoice_id", "allocated"]]
+
+def _match_client_amounts(lines, invoices):
+    """
+    A line for exactly the balance of one of the client's invoices pays it;
+    equal amounts pair up oldest invoice first
+    """
+    lines = lines[lines["client"] != ""]
+    lines = lines.assign(rank=lines.groupby(["client", "cents"]).cumcount())
+    invoices = invoices.assign(rank=invoices.groupby(["client", "balance"]).cumcount())
+    matched = lines[["line", "client", "cents", "rank"]].merge(
+        invoices[["invoice_id", "client", "balance", "rank"]],
+        left_on=["client", "cents", "rank"], right_on=["client", "balance", "rank"]
+    )
+    return matched.assign(allocated=matched["cents"])[["line", "invoice_id", "allocated"]]
+
+def _allocate_oldest_first(lines, invoices):
+    """
+    Each client's remaining lines pay that client's open invoices oldest
+    first, so one lump sum can settle several invoices and an invoice can be
+    paid over several lines. Lines and invoices are laid end to end as
+    intervals of cents per client; each overlap is one allocation.
+    """
+    import numpy as np
+    import pandas as pd
+
+    lines = lines[lines["client"].isin(invoices["client"]) & (lines["client"] != "")]
+    invoices = invoices[invoices["client"].isin(lines["client"])]
+    if lines.empty:
+        return pd.DataFrame({"line": [], "invoice_id": [], "allocated": []}, dtype="int64")
+    lines = lines.sort_values(["client", "line"], kind="stable")
+    invoices = invoices.sort_values("client", kind="stable")
+
+    # Per client, only min(credits, balances) can be allocated; offsetting
+    # each client by the capacity of the clients before it puts all
+    # intervals on one axis
+    paid = lines.groupby("client")["cents"].sum()
+    due = invoices.groupby("client")["balance"].sum()
+    capacity = np.minimum(paid, due.reindex(paid.index))
+    offset = capacity.cumsum() - capacity
+
+    def interval_ends(frame, column):
+        local = frame.groupby("client")[column].cumsum().to_numpy()
+        return (np.minimum(local, capacity.reindex(frame["client"]).to_numpy())
+                + offset.reindex(frame["client"]).to_numpy())
+
+    line_ends = interval_ends(lines, "cents")
+    invoice_ends = interval_ends(invoices, "balance")
+    bounds = np.unique(np.concatenate(([0], line_ends, invoice_ends)))
+    starts, lengths = bounds[:-1], np.diff(bounds)
+
+    allocations = pd.DataFrame({
+        "line": lines["line"].to_numpy()[np.searchsorted(line_ends, starts, side="right")],
+        "invoice_id": invoices["invoice_id"].to_numpy()[np.searchsorted(invoice_ends, starts, side="right")],
+        "allocated": lengths
+    })
+    return allocations.groupby(["line", "invoice_id"], as_index=False, sort=False)["allocated"].sum()
+
+def match_statement(lines, invoices):
+    """
+    Allocations (line, invoice_id, allocated cents, rule) of statement
+    lines to open invoices, applying MATCH_RULES in order against the
+    balances the earlier rules left
+    """
+    import pandas as pd
+
+    rules = {
+        "reference": _match_references,
+        "client_amount": _match_client_amounts,
+        "client_oldest_first": _allocate_oldest_first
+    }
+    allocations = []
+    remaining = invoices
+    for rule in MATCH_RULES:
+        if lines.empty or remaining.empty:
+            break
+        matched = rules[rule](lines, remaining)
+        allocations.append(matched.assign(rule=rule))
+        lines = lines[~lines["line"].isin(matched["line"])]
+        # Part-paid invoices stay on offer with what is left of their balance
+        applied = matched.groupby("invoice_id")["allocated"].sum().reindex(remaining["invoice_id"], fill_value=0)
+        remaining = remaining.assign(balance=remaining["balance"] - applied.to_numpy())
+        remaining = remaining[remaining["balance"] > 0]
+
+    if not allocations:
+        return pd.DataFrame({"line": [], "invoice_id": [], "allocated": [], "rule": []})
+    allocations = pd.concat(allocations, ignore_index=True)
+    return allocations[allocations["allocated"] > 0].sort_values(["line", "invoice_id"], ignore_index=True)
+
+def reconcile_statement(db: Session, data: bytes, currency: Currency, dry_run: bool = False) -> dict:
+    """
+    Match a bank statement CSV against the open invoices in the statement
+    account's currency (amounts are compared as they are, so invoices in
+    other currencies must never be offered) and, unless
+    dry_run, record every allocation as a payment and add it to the
+    invoices' amount_paid, marking those paid in full PAID, in one
+    transaction. Raises ReconciliationConflict when a matched invoice was
+    paid by someone else in the meantime.
+    """
+    lines, errors = read_statement(data)
+    invoices = load_open_invoices(db, currency)
+    allocations = match_statement(lines, invoices)
+
+    per_invoice = allocations.groupby("invoice_id")["allocated"].sum()
+    invoice_ids = per_invoice.index.astype(int).tolist()
+    paid_in_full = 0
+    if invoice_ids and not dry_run:
+        # Lock the matched invoices and make sure nothing was paid on them
+        # since they were read
+        balances = dict(db.execute(
+            select(Invoice.id, cast(func.round(Invoice.balance_due * 100), BigInteger))
+            .where(Invoice.id == any_(bindparam("ids", invoice_ids, type_=ARRAY(Integer))))
+            .order_by(Invoice.id)
+            .with_for_update()
+        ).all())
+        expected = invoices.set_index("invoice_id")["balance"].reindex(per_invoice.index)
+        if any(balances.get(invoice_id) != balance for invoice_id, balance in zip(invoice_ids, expected.tolist())):
+            db.rollback()
+            raise ReconciliationConflict("Invoices were paid while the statement was being matched; submit it again")
+
+        _record_payments(db, lines, allocations)
+        amount = Invoice.amount_paid + _applied.c.amount
+        paid_in_full = sum(status == InvoiceStatus.PAID for (status,) in db.execute(
+            update(Invoice)
+            .where(Invoice.id == _applied.c.invoice_id)
+            .values(
+                amount_paid=amount,
+                status=case((amount >= Invoice.total, literal(InvoiceStatus.PAID, Invoice.status.type)), else_=Invoice.status)
+            )
+            .returning(Invoice.status)
+            .execution_options(synchronize_session=False),
+            {"ids": invoice_ids, "amounts": [Decimal(int(cents)).scaleb(-2) for cents in per_invoice.tolist()]}
+        ))
+        db.commit()
+
+    applied = allocations.groupby("line")["allocated"].sum()
+    received = int(lines["cents"].sum())
+    unmatched = lines.loc[~lines["line"].isin(applied.index), "line"]
+    return {
+        "lines": len(lines) + len(errors),
+        "credits": len(lines),
+        "matched_lines": len(applied),
+        "unmatched_lines": len(unmatched),
+        "received": Decimal(received).scaleb(-2),
+        "allocated": Decimal(int(applied.sum())).scaleb(-2),
+        "unapplied": Decimal(received - int(applied.sum())).scaleb(-2),
+        "invoices_matched": len(invoice_ids),
+        "invoices_paid": paid_in_full,
+        "payments_created": 0 if dry_run else len(allocations),
+        "dry_run": dry_run,
+        "matches_by_rule": {rule: int((allocations["rule"] == rule).sum()) for rule in MATCH_RULES},
+        "allocations": [
+            {"line": int(line), "invoice_id": int(invoice_id), "amount": Decimal(int(cents)).scaleb(-2), "rule": rule}
+            for line, invoice_id, cents, rule in allocations.head(MAX_REPORTED).itertuples(index=False)
+        ],
+        "unmatched": unmatched.head(MAX_REPORTED).astype(int).tolist(),
+        "error_count": len(errors),
+        "errors": [{"line": int(line), "errors": [message]} for line, message in errors[:MAX_REPORTED]]
+    }
+
+def _record_payments(db: Session, lines, allocations) -> None:
+    statement = lines.set_index("line")
+    cents = allocations["allocated"].astype("int64")
+    amounts = (cents // 100).astype(str) + "." + (cents % 100).astype(str).str.zfill(2)
+    dates = statement["date"].reindex(allocations["line"]).fillna(datetime.now(timezone.utc)).astype(str)
+    references = statement["bank_reference"].where(statement["bank_reference"] != "", statement["reference"])
+    references = references.reindex(allocations["line"]).replace("", None)
+
+    columns = ("invoice_id", "amount_paid", "payment_date", "payment_method", "transaction_reference")
+    copy_rows(db, PaymentHistory.__table__, columns, zip(
+        allocations["invoice_id"].astype("int64").tolist(), amounts.tolist(), dates.tolist(),
+        [PAYMENT_METHOD] * len(allocations), references.tolist()
+    ))
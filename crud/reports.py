@@ -1,70 +1,78 @@
 from decimal import Decimal
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, extract
+from sqlalchemy import and_, func, extract, tuple_
 from datetime import datetime, timedelta
 from typing import List, Optional
-from models.financial import Transaction, TransactionType
-from schemas.financial import AccountCategory
+from models.financial import Transaction, TransactionType, TransactionMonthlyRollup, AccountCategory
 from models.invoice import Invoice, InvoiceStatus
 from schemas.reports import ProfitLossReport, BalanceSheet, RevenuePrediction
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-import numpy as np
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
 from io import BytesIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+from crud import rollups
+from utils.cache import dashboard_cache
+from utils.executor import cpu_executor
+from utils.model_store import fingerprint, model_store
 import datetime
 
 
 
 
-def generate_pnl(db: Session, start_date: datetime, end_date: datetime) -> ProfitLossReport:
-    income = db.query(func.sum(Transaction.amount)).filter(
-        Transaction.transaction_type == TransactionType.INCOME,
-        Transaction.transaction_date >= start_date,
-        Transaction.transaction_date <= end_date
-    ).scalar() or 0
-
-    expenses = db.query(func.sum(Transaction.amount)).filter(
-        Transaction.transaction_type == TransactionType.EXPENSE,
-        Transaction.transaction_date >= start_date,
-        Transaction.transaction_date <= end_date
-    ).scalar() or 0
-
-    revenue_breakdown = db.query(
-        func.date_trunc('month', Transaction.transaction_date).label('month'),
-        func.sum(Transaction.amount).label('amount')
-    ).filter(
-        Transaction.transaction_type == TransactionType.INCOME,
-        Transaction.transaction_date >= start_date,
-        Transaction.transaction_date <= end_date
-    ).group_by(
-        func.date_trunc('month', Transaction.transaction_date)
-    ).order_by(
-        func.date_trunc('month', Transaction.transaction_date)
-    ).all()
+PNL_BREAKDOWNS = ("month", "category")
 
-    expense_breakdown = db.query(
-        func.date_trunc('month', Transaction.transaction_date).label('month'),
-        func.sum(Transaction.amount).label('amount')
-    ).filter(
-        Transaction.transaction_type == TransactionType.EXPENSE,
-        Transaction.transaction_date >= start_date,
-        Transaction.transaction_date <= end_date
+def generate_pnl(db: Session, start_date: datetime, end_date: datetime, breakdown: str = "month") -> ProfitLossReport:
+    """
+    Profit & Loss from a single grouped scan: conditional sums give income and
+    expenses per bucket (month or account category), and an extra empty
+    grouping set yields the period totals in the same round trip
+    """
+    if breakdown not in PNL_BREAKDOWNS:
+        raise ValueError(f"Unknown breakdown '{breakdown}', expected one of {', '.join(PNL_BREAKDOWNS)}")
+
+    monthly = rollups.monthly_source(start_date, end_date)
+    income = func.sum(monthly.c.total_amount).filter(monthly.c.transaction_type == TransactionType.INCOME)
+    expenses = func.sum(monthly.c.total_amount).filter(monthly.c.transaction_type == TransactionType.EXPENSE)
+
+    if breakdown == "category":
+        buckets = [AccountCategory.id, AccountCategory.code, AccountCategory.name]
+        query = db.query(
+            *buckets,
+            func.grouping(AccountCategory.id).label('is_total'),
+            income.label('income'),
+            expenses.label('expenses')
+        ).select_from(monthly).join(
+            AccountCategory, AccountCategory.id == monthly.c.account_category_id
+        ).order_by(AccountCategory.code)
+    else:
+        buckets = [monthly.c.month]
+        query = db.query(
+            monthly.c.month,
+            func.grouping(monthly.c.month).label('is_total'),
+            income.label('income'),
+            expenses.label('expenses')
+        ).order_by(monthly.c.month)
+
+    rows = query.filter(
+        monthly.c.transaction_type.in_([TransactionType.INCOME, TransactionType.EXPENSE])
     ).group_by(
-        func.date_trunc('month', Transaction.transaction_date)
-    ).order_by(
-        func.date_trunc('month', Transaction.transaction_date)
+        func.grouping_sets(tuple_(*buckets), tuple_())
     ).all()
 
-    total_revenue = sum(r.amount for r in revenue_breakdown)
-    total_expenses = sum(e.amount for e in expense_breakdown)
+    totals = next(r for r in rows if r.is_total)
+    buckets = [r for r in rows if not r.is_total]
+    total_revenue = totals.income or 0
+    total_expenses = totals.expenses or 0
+
+    def bucket_entry(row, amount):
+        if breakdown == "category":
+            return {
+                "category": row.name,
+                "code": row.code,
+                "account_category_id": row.id,
+                "amount": float(amount)
+            }
+        return {
+            "category": row.month.strftime("%Y-%m-%d"),
+            "amount": float(amount)
+        }
 
     return ProfitLossReport(
         period_start=start_date,
@@ -72,14 +80,8 @@ def generate_pnl(db: Session, start_date: datetime, end_date: datetime) -> Profi
         total_revenue=total_revenue,
         total_expenses=total_expenses,
         net_profit=total_revenue - total_expenses,
-        revenue_breakdown=[{
-            "category": r.month.strftime("%Y-%m-%d"),
-            "amount": float(r.amount)
-        } for r in revenue_breakdown],
-        expenses_breakdown=[{
-            "category": e.month.strftime("%Y-%m-%d"),
-            "amount": float(e.amount)
-        } for e in expense_breakdown]
+        revenue_breakdown=[bucket_entry(r, r.income) for r in buckets if r.income is not None],
+        expenses_breakdown=[bucket_entry(r, r.expenses) for r in buckets if r.expenses is not None]
     )
 
 def generate_balance_sheet(db: Session, as_of_date: datetime) -> BalanceSheet:
@@ -116,39 +118,70 @@ def generate_balance_sheet(db: Session, as_of_date: datetime) -> BalanceSheet:
     )
 
 def predict_revenue(db: Session, months_ahead: int = 3) -> List[RevenuePrediction]:
+    """
+    Load monthly revenue here and fit / extrapolate it in the process pool
+    """
     monthly_revenue = db.query(
-        func.date_trunc('month', Transaction.transaction_date).label('month'),
-        func.sum(Transaction.amount).label('revenue')
+        TransactionMonthlyRollup.month,
+        func.sum(TransactionMonthlyRollup.total_amount).label('revenue')
     ).filter(
-        Transaction.transaction_type == TransactionType.INCOME
+        TransactionMonthlyRollup.transaction_type == TransactionType.INCOME
     ).group_by(
-        func.date_trunc('month', Transaction.transaction_date)
-    ).order_by('month').all()
+        TransactionMonthlyRollup.month
+    ).order_by(TransactionMonthlyRollup.month).all()
 
     if not monthly_revenue:
         return []
 
-    df = pd.DataFrame(monthly_revenue, columns=['month', 'revenue'])
+    return cpu_executor.call(
+        forecast_revenue,
+        [row.month for row in monthly_revenue],
+        [float(row.revenue) for row in monthly_revenue],
+        months_ahead
+    )
+
+def forecast_revenue(months: list, revenues: list, months_ahead: int = 3) -> List[RevenuePrediction]:
+    """
+    Linear trend over the monthly revenue history, extrapolated months_ahead.
+    Pure function of its (picklable) inputs so it can run in a pool worker.
+    """
+    import numpy as np
+    import pandas as pd
+    from sklearn.linear_model import LinearRegression
+
+    df = pd.DataFrame({'month': months, 'revenue': revenues})
     df['revenue'] = df['revenue'].astype(float)
     
     last_month = df['month'].max()
 
     X = np.arange(len(df)).reshape(-1, 1)
-    y = df['revenue'].values  
+    y = df['revenue'].values
 
-    model = LinearRegression()
-    model.fit(X, y)
+    # Reuse the fitted model until the monthly history it was trained on changes
+    month_keys = pd.to_datetime(df['month']).dt.strftime('%Y-%m').to_numpy(dtype=str)
+    training_fingerprint = fingerprint(month_keys, y)
+    cached = model_store.get("revenue_forecast", "total", training_fingerprint)
+    if cached:
+        model, r2, std_error = cached["model"], cached["r2"], cached["std_error"]
+    else:
+        model = LinearRegression()
+        model.fit(X, y)
+
+        y_pred = model.predict(X)
+
+        mse = np.mean((y - y_pred) ** 2)
+
+        r2 = model.score(X, y)
+        print(f"Model R²: {r2:.2f}")
+
+        n = len(X)
+        std_error = np.sqrt(mse / (n - 2)) if n > 2 else 0
+        model_store.put("revenue_forecast", "total", training_fingerprint, {
+            "model": model,
+            "r2": r2,
+            "std_error": std_error
+        })
 
-    y_pred = model.predict(X)
-    
-    mse = np.mean((y - y_pred) ** 2)
-    
-    r2 = model.score(X, y)
-    print(f"Model R²: {r2:.2f}")
-    
-    n = len(X)
-    std_error = np.sqrt(mse / (n - 2)) if n > 2 else 0
-    
     predictions = []
     for i in range(1, months_ahead + 1):
         next_month = (last_month + pd.DateOffset(months=i)).replace(day=1)
@@ -181,9 +214,82 @@ def predict_revenue(db: Session, months_ahead: int = 3) -> List[RevenuePredictio
 
     return predictions
 
+DASHBOARD_PERIODS = ("30d", "90d", "year")
+
+def _dashboard_bounds(db: Session, period: str):
+    """
+    Reference date (latest transaction) and the current / previous period
+    starts, computed in SQL so they fold into the dashboard query
+    """
+    reference_date = db.query(
+        func.max(Transaction.transaction_date).label('reference_date')
+    ).cte('reference')
+
+    ref = reference_date.c.reference_date
+    if period == '30d':
+        start_date = func.date_trunc('month', ref)
+        previous_start = func.date_trunc('month', start_date - timedelta(days=1))
+    elif period == '90d':
+        start_date = func.date_trunc('month', ref - timedelta(days=90))
+        previous_start = func.date_trunc('month', start_date - timedelta(days=90))
+    else:
+        start_date = func.date_trunc('year', ref)
+        previous_start = func.date_trunc('year', start_date - timedelta(days=1))
+
+    return db.query(
+        ref.label('reference_date'),
+        start_date.label('start_date'),
+        previous_start.label('previous_start')
+    ).cte('bounds')
+
 def get_dashboard_data(db: Session, period: str) -> dict:
-    latest_transaction = db.query(func.max(Transaction.transaction_date)).scalar()
-    if not latest_transaction:
+    """
+    Dashboard data for period, served from the short-lived dashboard cache
+    between transaction writes
+    """
+    return dashboard_cache.get_or_compute(
+        period,
+        lambda: _compute_dashboard_data(db, period),
+        tags=("transactions",)
+    )
+
+def _compute_dashboard_data(db: Session, period: str) -> dict:
+    """
+    Current-period totals, previous-period totals and the monthly series in a
+    single aggregate query over the monthly rollups
+    """
+    if period not in DASHBOARD_PERIODS:
+        raise ValueError(f"Unknown period '{period}', expected one of {', '.join(DASHBOARD_PERIODS)}")
+
+    bounds = _dashboard_bounds(db, period)
+    rollup = TransactionMonthlyRollup
+    is_income = rollup.transaction_type == TransactionType.INCOME
+    is_expense = rollup.transaction_type == TransactionType.EXPENSE
+    is_current = rollup.month >= bounds.c.start_date
+    is_previous = rollup.month < bounds.c.start_date
+    bounds_columns = [bounds.c.reference_date, bounds.c.start_date, bounds.c.previous_start]
+
+    rows = db.query(
+        *bounds_columns,
+        rollup.month,
+        func.grouping(rollup.month).label('is_total'),
+        func.sum(rollup.total_amount).filter(is_income, is_current).label('income'),
+        func.sum(rollup.total_amount).filter(is_expense, is_current).label('expenses'),
+        func.sum(rollup.total_amount).filter(is_income, is_previous).label('previous_income'),
+        func.sum(rollup.total_amount).filter(is_expense, is_previous).label('previous_expenses')
+    ).select_from(bounds).outerjoin(
+        rollup,
+        and_(
+            rollup.month >= bounds.c.previous_start,
+            rollup.month <= bounds.c.reference_date,
+            rollup.transaction_type.in_([TransactionType.INCOME, TransactionType.EXPENSE])
+        )
+    ).group_by(
+        func.grouping_sets(tuple_(*bounds_columns, rollup.month), tuple_(*bounds_columns))
+    ).order_by(rollup.month).all()
+
+    totals = next(r for r in rows if r.is_total)
+    if totals.reference_date is None:
         return {
             "total_income": 0,
             "total_expenses": 0,
@@ -194,81 +300,65 @@ def get_dashboard_data(db: Session, period: str) -> dict:
             "monthly_data": []
         }
 
-    reference_date = latest_transaction
+    print(f"Period selected: {period}, reference date: {totals.reference_date}, start date: {totals.start_date}")
 
-    if period == '30d':
-        end_date = reference_date
-        start_date = reference_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        previous_start = (start_date - timedelta(days=1)).replace(day=1)
-    elif period == '90d':
-        end_date = reference_date
-        start_date = (reference_date - timedelta(days=90)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        previous_start = (start_date - timedelta(days=90)).replace(day=1)
-    else:  
-        end_date = reference_date
-        start_date = datetime(reference_date.year, 1, 1, 0, 0, 0)
-        previous_start = datetime(reference_date.year - 1, 1, 1, 0, 0, 0)
-
-    print(f"Period selected: {period}")
-    print(f"Reference date: {reference_date}")
-    print(f"Start date: {start_date}")
-    print(f"End date: {end_date}")
-
-    current_data = get_period_data(db, start_date, end_date)
-    previous_data = get_period_data(db, previous_start, start_date)
-    monthly_data = get_monthly_breakdown(db, start_date, end_date)
+    income = float(totals.income or 0)
+    expenses = float(totals.expenses or 0)
+    previous_income = float(totals.previous_income or 0)
+    previous_expenses = float(totals.previous_expenses or 0)
 
     return {
-        "total_income": current_data["income"],
-        "total_expenses": current_data["expenses"],
-        "net_profit": current_data["income"] - current_data["expenses"],
-        "previous_income": previous_data["income"],
-        "previous_expenses": previous_data["expenses"],
-        "previous_profit": previous_data["income"] - previous_data["expenses"],
-        "monthly_data": monthly_data
+        "total_income": income,
+        "total_expenses": expenses,
+        "net_profit": income - expenses,
+        "previous_income": previous_income,
+        "previous_expenses": previous_expenses,
+        "previous_profit": previous_income - previous_expenses,
+        "monthly_data": [
+            {
+                "month": r.month.strftime("%b %Y"),
+                "income": float(r.income or 0),
+                "expenses": float(r.expenses or 0)
+            }
+            for r in rows
+            if not r.is_total and r.month is not None and r.month >= r.start_date
+        ]
     }
 
 def get_period_data(db: Session, start_date: datetime, end_date: datetime) -> dict:
-    print(f"Querying transactions from {start_date} to {end_date}")
-
-    transactions = db.query(Transaction).filter(
+    totals = db.query(
+        func.sum(Transaction.amount).filter(Transaction.transaction_type == TransactionType.INCOME).label('income'),
+        func.sum(Transaction.amount).filter(Transaction.transaction_type == TransactionType.EXPENSE).label('expenses')
+    ).filter(
         Transaction.transaction_date >= start_date,
         Transaction.transaction_date <= end_date
-    ).all()
-
-    income = sum(t.amount for t in transactions if t.transaction_type == TransactionType.INCOME)
-    expenses = sum(t.amount for t in transactions if t.transaction_type == TransactionType.EXPENSE)
-
-    print(f"Found {len(transactions)} transactions")
-    print(f"Total income: {income}")
-    print(f"Total expenses: {expenses}")
+    ).one()
 
     return {
-        "income": float(income),
-        "expenses": float(expenses)
+        "income": float(totals.income or 0),
+        "expenses": float(totals.expenses or 0)
     }
+
 def get_monthly_breakdown(db: Session, start_date: datetime, end_date: datetime) -> List[dict]:
 
     start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
     end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=999999)
 
+    monthly = rollups.monthly_source(start_date, end_date)
+
     income_by_month = db.query(
-        func.date_trunc('month', Transaction.transaction_date).label('month'),
-        func.sum(Transaction.amount).label('income')
+        monthly.c.month,
+        func.sum(monthly.c.total_amount).label('income')
     ).filter(
-        Transaction.transaction_type == TransactionType.INCOME,
-        Transaction.transaction_date >= start_date,
-        Transaction.transaction_date <= end_date
-    ).group_by('month').all()
+        monthly.c.transaction_type == TransactionType.INCOME
+    ).group_by(monthly.c.month).order_by(monthly.c.month).all()
 
     expenses_by_month = db.query(
-        func.date_trunc('month', Transaction.transaction_date).label('month'),
-        func.sum(Transaction.amount).label('expenses')
+        monthly.c.month,
+        func.sum(monthly.c.total_amount).label('expenses')
     ).filter(
-        Transaction.transaction_type == TransactionType.EXPENSE,
-        Transaction.transaction_date >= start_date,
-        Transaction.transaction_date <= end_date
-    ).group_by('month').all()
+        monthly.c.transaction_type == TransactionType.EXPENSE
+    ).group_by(monthly.c.month).order_by(monthly.c.month).all()
 
     monthly_data = {}
     for income in income_by_month:
@@ -293,220 +383,163 @@ def get_monthly_breakdown(db: Session, start_date: datetime, end_date: datetime)
     return list(monthly_data.values())
 
 
-def generate_balance_sheet_ifrs(db: Session, as_of_date: datetime) -> dict:
+def get_account_balances(db: Session, types: List[TransactionType], start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> dict:
     """
-    Generate a balance sheet in IFRS format
+    Balance of every account category of the given types over the period, in
+    one grouped query, returned as flat account lists keyed by type
     """
-    # Get asset accounts and their balances
-    assets_query = db.query(
-        AccountCategory.name.label('category'),
-        AccountCategory.code.label('code'),
-        AccountCategory.parent_id.label('parent_id'),
-        func.sum(Transaction.amount).label('amount')
-    ).outerjoin(
-        Transaction, 
-        and_(
-            Transaction.account_category_id == AccountCategory.id,
-            Transaction.transaction_date <= as_of_date
-        )
-    ).filter(
-        AccountCategory.type == TransactionType.ASSET
-    ).group_by(
-        AccountCategory.id,
-        AccountCategory.name,
-        AccountCategory.code,
-        AccountCategory.parent_id
-    ).order_by(AccountCategory.code)
-    
-    assets = [{
-        'category': row.category,
-        'code': row.code,
-        'parent_id': row.parent_id,
-        'amount': float(row.amount) if row.amount else 0
-    } for row in assets_query.all()]
-    
-    # Similar queries for liabilities and equity
-    liabilities_query = db.query(
-        AccountCategory.name.label('category'),
-        AccountCategory.code.label('code'),
-        AccountCategory.parent_id.label('parent_id'),
-        func.sum(Transaction.amount).label('amount')
-    ).outerjoin(
-        Transaction, 
-        and_(
-            Transaction.account_category_id == AccountCategory.id,
-            Transaction.transaction_date <= as_of_date
-        )
-    ).filter(
-        AccountCategory.type == TransactionType.LIABILITY
-    ).group_by(
+    monthly = rollups.monthly_source(start_date, end_date)
+
+    rows = db.query(
         AccountCategory.id,
         AccountCategory.name,
         AccountCategory.code,
-        AccountCategory.parent_id
-    ).order_by(AccountCategory.code)
-    
-    liabilities = [{
-        'category': row.category,
-        'code': row.code,
-        'parent_id': row.parent_id,
-        'amount': float(row.amount) if row.amount else 0
-    } for row in liabilities_query.all()]
-    
-    equity_query = db.query(
-        AccountCategory.name.label('category'),
-        AccountCategory.code.label('code'),
-        AccountCategory.parent_id.label('parent_id'),
-        func.sum(Transaction.amount).label('amount')
+        AccountCategory.parent_id,
+        AccountCategory.type,
+        func.sum(monthly.c.total_amount).label('amount')
     ).outerjoin(
-        Transaction, 
-        and_(
-            Transaction.account_category_id == AccountCategory.id,
-            Transaction.transaction_date <= as_of_date
-        )
+        monthly, monthly.c.account_category_id == AccountCategory.id
     ).filter(
-        AccountCategory.type == TransactionType.EQUITY
+        AccountCategory.type.in_(types)
     ).group_by(
-        AccountCategory.id,
-        AccountCategory.name,
-        AccountCategory.code,
-        AccountCategory.parent_id
-    ).order_by(AccountCategory.code)
-    
-    equity = [{
-        'category': row.category,
-        'code': row.code,
-        'parent_id': row.parent_id,
-        'amount': float(row.amount) if row.amount else 0
-    } for row in equity_query.all()]
-    
+        AccountCategory.id
+    ).order_by(AccountCategory.code).all()
+
+    accounts = {account_type: [] for account_type in types}
+    for row in rows:
+        accounts[row.type].append({
+            'id': row.id,
+            'category': row.name,
+            'code': row.code,
+            'parent_id': row.parent_id,
+            'amount': float(row.amount) if row.amount else 0
+        })
+    return accounts
+
+def generate_balance_sheet_ifrs(db: Session, as_of_date: datetime) -> dict:
+    """
+    Generate a balance sheet in IFRS format
+    """
+    accounts = get_account_balances(
+        db,
+        [TransactionType.ASSET, TransactionType.LIABILITY, TransactionType.EQUITY],
+        end_date=as_of_date
+    )
+    assets = accounts[TransactionType.ASSET]
+    liabilities = accounts[TransactionType.LIABILITY]
+    equity = accounts[TransactionType.EQUITY]
+
     # Calculate totals
     total_assets = sum(item['amount'] for item in assets)
     total_liabilities = sum(item['amount'] for item in liabilities)
     total_equity = sum(item['amount'] for item in equity)
-    
-    # Build hierarchical structure for assets, liabilities, and equity
-    assets_tree = build_account_tree(assets)
-    liabilities_tree = build_account_tree(liabilities)
-    equity_tree = build_account_tree(equity)
-    
+    cyclic = []
+
     return {
         'as_of_date': as_of_date.isoformat(),
         'total_assets': total_assets,
         'total_liabilities': total_liabilities,
         'total_equity': total_equity,
-        'assets': assets_tree,
-        'liabilities': liabilities_tree,
-        'equity': equity_tree
+        'assets': build_account_tree(assets, cyclic),
+        'liabilities': build_account_tree(liabilities, cyclic),
+        'equity': build_account_tree(equity, cyclic),
+        'cyclic_accounts': sorted(cyclic)
     }
 
 def generate_pnl_ifrs(db: Session, start_date: datetime, end_date: datetime) -> dict:
     """
     Generate a profit and loss statement in IFRS format
     """
-    # Get revenue accounts and their balances
-    revenue_query = db.query(
-        AccountCategory.name.label('category'),
-        AccountCategory.code.label('code'),
-        AccountCategory.parent_id.label('parent_id'),
-        func.sum(Transaction.amount).label('amount')
-    ).outerjoin(
-        Transaction, 
-        and_(
-            Transaction.account_category_id == AccountCategory.id,
-            Transaction.transaction_date >= start_date,
-            Transaction.transaction_date <= end_date
-        )
-    ).filter(
-        AccountCategory.type == TransactionType.REVENUE
-    ).group_by(
-        AccountCategory.id,
-        AccountCategory.name,
-        AccountCategory.code,
-        AccountCategory.parent_id
-    ).order_by(AccountCategory.code)
-    
-    revenue = [{
-        'category': row.category,
-        'code': row.code,
-        'parent_id': row.parent_id,
-        'amount': float(row.amount) if row.amount else 0
-    } for row in revenue_query.all()]
-    
-    # Get expense accounts and their balances
-    expense_query = db.query(
-        AccountCategory.name.label('category'),
-        AccountCategory.code.label('code'),
-        AccountCategory.parent_id.label('parent_id'),
-        func.sum(Transaction.amount).label('amount')
-    ).outerjoin(
-        Transaction, 
-        and_(
-            Transaction.account_category_id == AccountCategory.id,
-            Transaction.transaction_date >= start_date,
-            Transaction.transaction_date <= end_date
-        )
-    ).filter(
-        AccountCategory.type == TransactionType.EXPENSE
-    ).group_by(
-        AccountCategory.id,
-        AccountCategory.name,
-        AccountCategory.code,
-        AccountCategory.parent_id
-    ).order_by(AccountCategory.code)
-    
-    expenses = [{
-        'category': row.category,
-        'code': row.code,
-        'parent_id': row.parent_id,
-        'amount': float(row.amount) if row.amount else 0
-    } for row in expense_query.all()]
-    
+    accounts = get_account_balances(
+        db,
+        [TransactionType.INCOME, TransactionType.EXPENSE],
+        start_date=start_date,
+        end_date=end_date
+    )
+    revenue = accounts[TransactionType.INCOME]
+    expenses = accounts[TransactionType.EXPENSE]
+
     total_revenue = sum(item['amount'] for item in revenue)
     total_expenses = sum(item['amount'] for item in expenses)
     net_profit = total_revenue - total_expenses
-    
-    revenue_tree = build_account_tree(revenue)
-    expenses_tree = build_account_tree(expenses)
-    
+    cyclic = []
+
     return {
         'period_start': start_date.isoformat(),
         'period_end': end_date.isoformat(),
         'total_revenue': total_revenue,
         'total_expenses': total_expenses,
         'net_profit': net_profit,
-        'revenue': revenue_tree,
-        'expenses': expenses_tree
+        'revenue': build_account_tree(revenue, cyclic),
+        'expenses': build_account_tree(expenses, cyclic),
+        'cyclic_accounts': sorted(cyclic)
     }
 
-def build_account_tree(accounts):
+def build_account_tree(accounts, cyclic=None):
     """
-    Build a hierarchical tree structure from a flat list of accounts
+    Build a hierarchical tree from a flat list of accounts in O(n). Each
+    node keeps its own balance in 'own_amount' and its 'amount' becomes the
+    subtotal of itself and all descendants. Ids of accounts promoted to roots
+    to break a parent_id cycle are appended to `cyclic` when it is given.
     """
-    # Create a map of id to account
     id_map = {}
     for acc in accounts:
-        acc_id = acc.get('id')
-        if acc_id:
-            id_map[acc_id] = acc
-            acc['children'] = []
-    
-    # Organize into a tree
+        acc['children'] = []
+        acc['own_amount'] = acc['amount']
+        id_map[acc['id']] = acc
+
+    # Accounts whose parent is outside this list (another type) are roots
     root_accounts = []
     for acc in accounts:
-        parent_id = acc.get('parent_id')
-        if parent_id is None:
+        parent = id_map.get(acc.get('parent_id'))
+        if parent is None or parent is acc:
             root_accounts.append(acc)
-        elif parent_id in id_map:
-            parent = id_map[parent_id]
-            if 'children' not in parent:
-                parent['children'] = []
+        else:
             parent['children'].append(acc)
-    
+
+    # Roll balances up: visit parents before children, then sum in reverse
+    ordered = []
+    visited = set()
+
+    def walk(start):
+        stack = [start]
+        while stack:
+            acc = stack.pop()
+            visited.add(acc['id'])
+            ordered.append(acc)
+            stack.extend(acc['children'])
+
+    for acc in root_accounts:
+        walk(acc)
+
+    # Accounts left unvisited sit on (or below) a parent_id cycle, which no
+    # root reaches. Cut each cycle at the first of its accounts reached by
+    # following parents, so those balances still count.
+    for acc in accounts:
+        if acc['id'] in visited:
+            continue
+        seen = set()
+        while acc['id'] not in seen:
+            seen.add(acc['id'])
+            acc = id_map[acc['parent_id']]
+        if cyclic is not None:
+            cyclic.append(acc['id'])
+        id_map[acc['parent_id']]['children'].remove(acc)
+        root_accounts.append(acc)
+        walk(acc)
+
+    for acc in reversed(ordered):
+        acc['amount'] = acc['own_amount'] + sum(child['amount'] for child in acc['children'])
+
     return root_accounts
 
 def generate_pdf_report(report_type, data):
-    
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+
     buffer = BytesIO()
     doc = SimpleDocTemplate(
         buffer, 
@@ -761,267 +794,73 @@ def generate_pdf_report(report_type, data):
     buffer.close()
     return pdf_data
 
-def generate_excel_report(report_type, data):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    
-    title_font = Font(name='Arial', size=14, bold=True, color='000080')  # Navy blue
-    subtitle_font = Font(name='Arial', size=12, bold=True, color='000080')
-    header_font = Font(name='Arial', size=11, bold=True)
-    total_font = Font(name='Arial', size=11, bold=True)
-    normal_font = Font(name='Arial', size=10)
-    
-    header_fill = PatternFill(start_color='E0E0E0', end_color='E0E0E0', fill_type='solid')
-    total_fill = PatternFill(start_color='F0F0F0', end_color='F0F0F0', fill_type='solid')
-    
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Set title and subtitle
-    ws["A1"] = "PT. Jurnal by Mekari"
-    ws["A1"].font = title_font
-    
+def _excel_report_rows(report_type, data):
+    """
+    Rows of the IFRS report workbook as (value, style name) cells, produced
+    one at a time for the write-only engine in utils/excel.py
+    """
+    def account_rows(items):
+        # Depth-first, children under their parent, indented per level
+        stack = [(item, 0) for item in reversed(items)]
+        while stack:
+            item, level = stack.pop()
+            indent = '    ' * level
+            yield [(f"{indent}{item['code']} - {item['category']}", "report_label"), (item['amount'], "report_amount")]
+            stack.extend((child, level + 1) for child in reversed(item.get('children') or []))
+
+    def section(title, items, total_label, total):
+        yield [(title, "report_section")]
+        yield from account_rows(items)
+        yield [(total_label, "report_total_label"), (total, "report_total_amount")]
+        yield []
+
+    yield [("PT. Jurnal by Mekari", "report_title")]
+
     if report_type == "profit-loss-ifrs":
-        ws.title = "Laba Rugi"
-        ws["A2"] = "Laporan Neraca Laba Rugi"
         period_start = datetime.datetime.fromisoformat(data['period_start'].replace('Z', '+00:00'))
         period_end = datetime.datetime.fromisoformat(data['period_end'].replace('Z', '+00:00'))
-        ws["A3"] = f"Periode {period_start.strftime('%d %B %Y')} s/d {period_end.strftime('%d %B %Y')}"
+        yield [("Laporan Neraca Laba Rugi", "report_subtitle")]
+        yield [(f"Periode {period_start.strftime('%d %B %Y')} s/d {period_end.strftime('%d %B %Y')}", "report_subtitle")]
+        yield []
+        yield from section("PENDAPATAN PENJUALAN", data['revenue'], "Total Pendapatan", data['total_revenue'])
+        yield from section("BEBAN OPERASI", data['expenses'], "Total Beban", data['total_expenses'])
+        yield [("LABA BERSIH", "report_grand_total_label"), (data['net_profit'], "report_grand_total_amount")]
     else:  # balance-sheet-ifrs
-        ws.title = "Neraca"
-        ws["A2"] = "Laporan Neraca Keuangan"
         as_of_date = datetime.datetime.fromisoformat(data['as_of_date'].replace('Z', '+00:00'))
-        ws["A3"] = f"Per {as_of_date.strftime('%d %B %Y')}"
-    
-    ws["A2"].font = subtitle_font
-    ws["A3"].font = subtitle_font
-    
-    # Start row for data
-    current_row = 5
-    
-    if report_type == "profit-loss-ifrs":
-        # Add revenue section
-        ws[f"A{current_row}"] = "PENDAPATAN PENJUALAN"
-        ws[f"A{current_row}"].font = header_font
-        current_row += 1
-        
-        # Function to add hierarchical items
-        def add_items_to_sheet(items, start_row, level=0):
-            row = start_row
-            
-            for item in items:
-                indent = '    ' * level
-                ws[f"A{row}"] = f"{indent}{item['code']} - {item['category']}"
-                ws[f"B{row}"] = item['amount']
-                ws[f"B{row}"].number_format = '#,##0.00'
-                
-                # Apply styles
-                ws[f"A{row}"].font = normal_font
-                ws[f"B{row}"].font = normal_font
-                ws[f"A{row}"].alignment = Alignment(horizontal='left')
-                ws[f"B{row}"].alignment = Alignment(horizontal='right')
-                
-                row += 1
-                
-                if item.get('children'):
-                    row = add_items_to_sheet(item['children'], row, level + 1)
-            
-            return row
-        
-        # Add revenue items
-        current_row = add_items_to_sheet(data['revenue'], current_row)
-        
-        # Add total revenue
-        ws[f"A{current_row}"] = "Total Pendapatan"
-        ws[f"B{current_row}"] = data['total_revenue']
-        ws[f"B{current_row}"].number_format = '#,##0.00'
-        
-        # Apply styles to total
-        ws[f"A{current_row}"].font = total_font
-        ws[f"B{current_row}"].font = total_font
-        ws[f"A{current_row}"].alignment = Alignment(horizontal='left')
-        ws[f"B{current_row}"].alignment = Alignment(horizontal='right')
-        for col in ['A', 'B']:
-            ws[f"{col}{current_row}"].fill = total_fill
-            ws[f"{col}{current_row}"].border = border
-        
-        current_row += 2
-        
-        # Add expenses section
-        ws[f"A{current_row}"] = "BEBAN OPERASI"
-        ws[f"A{current_row}"].font = header_font
-        current_row += 1
-        
-        # Add expense items
-        current_row = add_items_to_sheet(data['expenses'], current_row)
-        
-        # Add total expenses
-        ws[f"A{current_row}"] = "Total Beban"
-        ws[f"B{current_row}"] = data['total_expenses']
-        ws[f"B{current_row}"].number_format = '#,##0.00'
-        
-        # Apply styles to total
-        ws[f"A{current_row}"].font = total_font
-        ws[f"B{current_row}"].font = total_font
-        ws[f"A{current_row}"].alignment = Alignment(horizontal='left')
-        ws[f"B{current_row}"].alignment = Alignment(horizontal='right')
-        for col in ['A', 'B']:
-            ws[f"{col}{current_row}"].fill = total_fill
-            ws[f"{col}{current_row}"].border = border
-        
-        current_row += 2
-        
-        # Add net profit
-        ws[f"A{current_row}"] = "LABA BERSIH"
-        ws[f"B{current_row}"] = data['net_profit']
-        ws[f"B{current_row}"].number_format = '#,##0.00'
-        
-        # Apply styles to net profit
-        ws[f"A{current_row}"].font = Font(name='Arial', size=12, bold=True)
-        ws[f"B{current_row}"].font = Font(name='Arial', size=12, bold=True)
-        ws[f"A{current_row}"].alignment = Alignment(horizontal='left')
-        ws[f"B{current_row}"].alignment = Alignment(horizontal='right')
-        for col in ['A', 'B']:
-            ws[f"{col}{current_row}"].fill = PatternFill(start_color='D0D0D0', end_color='D0D0D0', fill_type='solid')
-            ws[f"{col}{current_row}"].border = border
-    
-    else:  # balance-sheet-ifrs
-        # Add assets section
-        ws[f"A{current_row}"] = "ASET"
-        ws[f"A{current_row}"].font = header_font
-        current_row += 1
-        
-        # Function to add hierarchical items
-        def add_items_to_sheet(items, start_row, level=0):
-            row = start_row
-            
-            for item in items:
-                indent = '    ' * level
-                ws[f"A{row}"] = f"{indent}{item['code']} - {item['category']}"
-                ws[f"B{row}"] = item['amount']
-                ws[f"B{row}"].number_format = '#,##0.00'
-                
-                # Apply styles
-                ws[f"A{row}"].font = normal_font
-                ws[f"B{row}"].font = normal_font
-                ws[f"A{row}"].alignment = Alignment(horizontal='left')
-                ws[f"B{row}"].alignment = Alignment(horizontal='right')
-                
-                row += 1
-                
-                if item.get('children'):
-                    row = add_items_to_sheet(item['children'], row, level + 1)
-            
-            return row
-        
-        # Add asset items
-        current_row = add_items_to_sheet(data['assets'], current_row)
-        
-        # Add total assets
-        ws[f"A{current_row}"] = "Total Aset"
-        ws[f"B{current_row}"] = data['total_assets']
-        ws[f"B{current_row}"].number_format = '#,##0.00'
-        
-        # Apply styles to total
-        ws[f"A{current_row}"].font = total_font
-        ws[f"B{current_row}"].font = total_font
-        ws[f"A{current_row}"].alignment = Alignment(horizontal='left')
-        ws[f"B{current_row}"].alignment = Alignment(horizontal='right')
-        for col in ['A', 'B']:
-            ws[f"{col}{current_row}"].fill = total_fill
-            ws[f"{col}{current_row}"].border = border
-        
-        current_row += 2
-        
-        # Add liabilities section
-        ws[f"A{current_row}"] = "LIABILITAS"
-        ws[f"A{current_row}"].font = header_font
-        current_row += 1
-        
-        # Add liability items
-        current_row = add_items_to_sheet(data['liabilities'], current_row)
-        
-        # Add total liabilities
-        ws[f"A{current_row}"] = "Total Liabilitas"
-        ws[f"B{current_row}"] = data['total_liabilities']
-        ws[f"B{current_row}"].number_format = '#,##0.00'
-        
-        # Apply styles to total
-        ws[f"A{current_row}"].font = total_font
-        ws[f"B{current_row}"].font = total_font
-        ws[f"A{current_row}"].alignment = Alignment(horizontal='left')
-        ws[f"B{current_row}"].alignment = Alignment(horizontal='right')
-        for col in ['A', 'B']:
-            ws[f"{col}{current_row}"].fill = total_fill
-            ws[f"{col}{current_row}"].border = border
-        
-        current_row += 2
-        
-        # Add equity section
-        ws[f"A{current_row}"] = "EKUITAS"
-        ws[f"A{current_row}"].font = header_font
-        current_row += 1
-        
-        # Add equity items
-        current_row = add_items_to_sheet(data['equity'], current_row)
-        
-        # Add total equity
-        ws[f"A{current_row}"] = "Total Ekuitas"
-        ws[f"B{current_row}"] = data['total_equity']
-        ws[f"B{current_row}"].number_format = '#,##0.00'
-        
-        # Apply styles to total
-        ws[f"A{current_row}"].font = total_font
-        ws[f"B{current_row}"].font = total_font
-        ws[f"A{current_row}"].alignment = Alignment(horizontal='left')
-        ws[f"B{current_row}"].alignment = Alignment(horizontal='right')
-        for col in ['A', 'B']:
-            ws[f"{col}{current_row}"].fill = total_fill
-            ws[f"{col}{current_row}"].border = border
-        
-        current_row += 2
-        
-        # Add total liabilities and equity
-        ws[f"A{current_row}"] = "TOTAL LIABILITAS DAN EKUITAS"
-        ws[f"B{current_row}"] = data['total_liabilities'] + data['total_equity']
-        ws[f"B{current_row}"].number_format = '#,##0.00'
-        
-        # Apply styles to final total
-        ws[f"A{current_row}"].font = Font(name='Arial', size=12, bold=True)
-        ws[f"B{current_row}"].font = Font(name='Arial', size=12, bold=True)
-        ws[f"A{current_row}"].alignment = Alignment(horizontal='left')
-        ws[f"B{current_row}"].alignment = Alignment(horizontal='right')
-        for col in ['A', 'B']:
-            ws[f"{col}{current_row}"].fill = PatternFill(start_color='D0D0D0', end_color='D0D0D0', fill_type='solid')
-            ws[f"{col}{current_row}"].border = border
-    
-    # Set column widths
-    ws.column_dimensions['A'].width = 50
-    ws.column_dimensions['B'].width = 20
-    
+        yield [("Laporan Neraca Keuangan", "report_subtitle")]
+        yield [(f"Per {as_of_date.strftime('%d %B %Y')}", "report_subtitle")]
+        yield []
+        yield from section("ASET", data['assets'], "Total Aset", data['total_assets'])
+        yield from section("LIABILITAS", data['liabilities'], "Total Liabilitas", data['total_liabilities'])
+        yield from section("EKUITAS", data['equity'], "Total Ekuitas", data['total_equity'])
+        yield [
+            ("TOTAL LIABILITAS DAN EKUITAS", "report_grand_total_label"),
+            (data['total_liabilities'] + data['total_equity'], "report_grand_total_amount")
+        ]
+
+def write_excel_report(report_type, data, target):
+    """
+    Write the IFRS report workbook to target (a path or binary file) with
+    the streaming write-only engine; returns target
+    """
+    from utils.excel import write_sheet
+
+    title = "Laba Rugi" if report_type == "profit-loss-ifrs" else "Neraca"
+    write_sheet(target, title, _excel_report_rows(report_type, data), column_widths=(50, 20))
+    return target
+
+def generate_excel_report(report_type, data):
     buffer = BytesIO()
-    wb.save(buffer)
-    excel_data = buffer.getvalue()
-    buffer.close()
-    return excel_data
+    write_excel_report(report_type, data, buffer)
+    return buffer.getvalue()
 
 def generate_anthropic_report(report_type, data):
     """
     Use Anthropic API to generate an enhanced report design
     """
-    import anthropic
     import json
-    from io import BytesIO
-    import base64
-    import os
-    
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    client = anthropic.Anthropic(api_key=api_key)
-    
+    from utils.llm_gateway import llm_gateway
+
     # Convert data to JSON string for the prompt
     data_json = json.dumps(data, indent=2)
     
@@ -1066,16 +905,16 @@ def generate_anthropic_report(report_type, data):
         Return ONLY the full HTML code that I can save directly as a standalone HTML file.
         """
     
-    message = client.messages.create(
-        model="claude-3-opus-20240229",  
+    # Identical report data is served from the gateway's cache rather than
+    # generated again
+    html_content = llm_gateway.complete_sync(
+        prompt,
+        model="claude-3-opus-20240229",
         max_tokens=4000,
-        temperature=0.2,  
-        system="You are a professional financial report designer. Create beautiful, standards-compliant HTML/CSS reports that look like they were made by a professional designer.",
-        messages=[{"role": "user", "content": prompt}]
+        temperature=0.2,
+        system="You are a professional financial report designer. Create beautiful, standards-compliant HTML/CSS reports that look like they were made by a professional designer."
     )
     
-    html_content = message.content[0].text
-    
     if "```html" in html_content:
         html_content = html_content.split("```html")[1].split("```")[0].strip()
     elif "```" in html_content:
@@ -0,0 +1,224 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import DateTime, and_, cast, delete, func, insert, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from models.financial import Transaction, TransactionMonthlyRollup
+
+Rollup = TransactionMonthlyRollup
+
+ROLLUP_KEY = ("month", "transaction_type", "account_category_id", "region", "inventory_item_id")
+
+
+def _month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(value: datetime) -> datetime:
+    return _month_start(_month_start(value) + timedelta(days=32))
+
+
+def _key_filter(key: dict):
+    return and_(
+        Rollup.month == key["month"],
+        Rollup.transaction_type == key["transaction_type"],
+        Rollup.account_category_id == key["account_category_id"],
+        Rollup.region == key["region"],
+        func.coalesce(Rollup.inventory_item_id, 0) == (key["inventory_item_id"] or 0)
+    )
+
+
+def rollup_key(transaction: Transaction) -> dict:
+    return {
+        "month": func.date_trunc('month', cast(transaction.transaction_date, DateTime(timezone=True))),
+        "transaction_type": transaction.transaction_type,
+        "account_category_id": transaction.account_category_id,
+        "region": transaction.region,
+        "inventory_item_id": transaction.inventory_item_id
+    }
+
+
+def _accumulate(stmt):
+    """
+    Turn an INSERT into the rollups into one that adds to existing rows
+    """
+    return stmt.on_conflict_do_update(
+        index_elements=[
+            Rollup.month, Rollup.transaction_type, Rollup.account_category_id, Rollup.region,
+            func.coalesce(Rollup.inventory_item_id, 0)
+        ],
+        set_={
+            "total_amount": Rollup.total_amount + stmt.excluded.total_amount,
+            "total_quantity": Rollup.total_quantity + stmt.excluded.total_quantity,
+            "transaction_count": Rollup.transaction_count + stmt.excluded.transaction_count
+        }
+    )
+
+
+def apply_delta(db: Session, key: dict, amount, quantity: int, count: int) -> None:
+    """
+    Add (or, with negative values, remove) one contribution to the rollup row
+    for key, creating the row on first use and dropping it once empty
+    """
+    stmt = pg_insert(Rollup).values(
+        **key,
+        total_amount=amount,
+        total_quantity=quantity,
+        transaction_count=count
+    )
+    db.execute(_accumulate(stmt))
+
+    if count < 0:
+        db.execute(delete(Rollup).where(_key_filter(key), Rollup.transaction_count <= 0))
+
+
+def add_transaction(db: Session, transaction: Transaction) -> None:
+    apply_delta(db, rollup_key(transaction), transaction.amount, transaction.quantity or 0, 1)
+
+
+def remove_transaction(db: Session, transaction: Transaction) -> None:
+    apply_delta(db, rollup_key(transaction), -transaction.amount, -(transaction.quantity or 0), -1)
+
+
+def _aggregate(source, *criteria):
+    """
+    Rollup rows for source, the transactions table or any table with the
+    same columns
+    """
+    month = func.date_trunc('month', source.c.transaction_date)
+    return select(
+        month.label("month"),
+        source.c.transaction_type,
+        source.c.account_category_id,
+        source.c.region,
+        source.c.inventory_item_id,
+        func.sum(source.c.amount).label("total_amount"),
+        func.sum(func.coalesce(source.c.quantity, 0)).label("total_quantity"),
+        func.count().label("transaction_count")
+    ).where(*criteria).group_by(
+        month,
+        source.c.transaction_type,
+        source.c.account_category_id,
+        source.c.region,
+        source.c.inventory_item_id
+    )
+
+
+def _aggregate_transactions(*criteria):
+    return _aggregate(Transaction.__table__, *criteria)
+
+
+def add_transactions_from(db: Session, source) -> None:
+    """
+    Add every row of source (shaped like transactions, e.g. a staging
+    table) to the rollups with one grouped upsert
+    """
+    db.execute(_accumulate(pg_insert(Rollup).from_select(
+        [*ROLLUP_KEY, "total_amount", "total_quantity", "transaction_count"],
+        _aggregate(source)
+    )))
+
+
+def _rollup_rows(*criteria):
+    return select(
+        Rollup.month,
+        Rollup.transaction_type,
+        Rollup.account_category_id,
+        Rollup.region,
+        Rollup.inventory_item_id,
+        Rollup.total_amount,
+        Rollup.total_quantity,
+        Rollup.transaction_count
+    ).where(*criteria)
+
+
+def monthly_source(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    """
+    Subquery of monthly aggregates covering [start_date, end_date]. Whole
+    months are read from the rollup table; the partial months at either edge
+    of the range are aggregated from transactions.
+    """
+    first_full = None
+    if start_date is not None:
+        first_full = start_date if start_date == _month_start(start_date) else _next_month(start_date)
+
+    # end_date is inclusive: a month is whole when it ends at or before end_date
+    end_exclusive = end_date + timedelta(microseconds=1) if end_date is not None else None
+    last_full = _month_start(end_exclusive) if end_exclusive is not None else None
+
+    if first_full is not None and last_full is not None and first_full >= last_full:
+        criteria = [Transaction.transaction_date >= start_date, Transaction.transaction_date <= end_date]
+        return _aggregate_transactions(*criteria).subquery("monthly")
+
+    parts = []
+    rollup_criteria = []
+    if first_full is not None:
+        rollup_criteria.append(Rollup.month >= first_full)
+        if start_date < first_full:
+            parts.append(_aggregate_transactions(
+                Transaction.transaction_date >= start_date,
+                Transaction.transaction_date < first_full
+            ))
+    if last_full is not None:
+        rollup_criteria.append(Rollup.month < last_full)
+        if last_full <= end_date:
+            parts.append(_aggregate_transactions(
+                Transaction.transaction_date >= last_full,
+                Transaction.transaction_date <= end_date
+            ))
+    parts.insert(0, _rollup_rows(*rollup_criteria))
+
+    if len(parts) == 1:
+        return parts[0].subquery("monthly")
+    return union_all(*parts).subquery("monthly")
+
+
+def rebuild_rollups(db: Session) -> int:
+    """
+    Recompute every rollup row from transactions
+    """
+    db.execute(delete(Rollup))
+    aggregate = _aggregate_transactions()
+    db.execute(insert(Rollup).from_select(
+        [*ROLLUP_KEY, "total_amount", "total_quantity", "transaction_count"],
+        aggregate
+    ))
+    db.commit()
+    return db.query(func.count(Rollup.id)).scalar()
+
+
+def verify_rollups(db: Session) -> list:
+    """
+    Rollup keys whose stored totals disagree with the transactions table
+    """
+    expected = _aggregate_transactions().subquery("expected")
+    stored = _rollup_rows().subquery("stored")
+
+    matches = and_(
+        expected.c.month == stored.c.month,
+        expected.c.transaction_type == stored.c.transaction_type,
+        expected.c.account_category_id == stored.c.account_category_id,
+        expected.c.region == stored.c.region,
+        expected.c.inventory_item_id.is_not_distinct_from(stored.c.inventory_item_id)
+    )
+    differs = (
+        expected.c.month.is_(None) | stored.c.month.is_(None) |
+        expected.c.total_amount.is_distinct_from(stored.c.total_amount) |
+        expected.c.total_quantity.is_distinct_from(stored.c.total_quantity) |
+        expected.c.transaction_count.is_distinct_from(stored.c.transaction_count)
+    )
+
+    rows = db.execute(
+        select(
+            func.coalesce(expected.c.month, stored.c.month).label("month"),
+            func.coalesce(expected.c.transaction_type, stored.c.transaction_type).label("transaction_type"),
+            func.coalesce(expected.c.account_category_id, stored.c.account_category_id).label("account_category_id"),
+            func.coalesce(expected.c.region, stored.c.region).label("region"),
+            func.coalesce(expected.c.inventory_item_id, stored.c.inventory_item_id).label("inventory_item_id"),
+            expected.c.total_amount.label("expected_amount"),
+            stored.c.total_amount.label("stored_amount"),
+            expected.c.transaction_count.label("expected_count"),
+            stored.c.transaction_count.label("stored_count")
+        ).select_from(expected.join(stored, matches, full=True)).where(differs)
+    ).all()
+    return [dict(row._mapping) for row in rows]
@@ -1,39 +1,296 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from dotenv import load_dotenv
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 import os
+import threading
+import time
+from functools import lru_cache
+from uuid import uuid4
+from config import settings
 
-load_dotenv()
-DB_USER = os.environ.get('DB_USER')
-DB_PASSWORD = os.environ.get('DB_PASSWORD')
-DB_HOST = os.environ.get('DB_HOST')
-DB_PORT = os.environ.get('DB_PORT')
+DB_HOST = settings.DB_HOST
+DB_PORT = settings.DB_PORT
+DATABASE_URL = settings.database_url
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
 
-DATABASE_URL = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/postgres'
-connected = False
-while not connected:
-    try:
-        engine = create_engine(DATABASE_URL)
-        conn = engine.connect()
-        connected = True
-        print("databse connected")
-        print("Db URL: ", DATABASE_URL)
+# Created by init_engine(), normally from the app's lifespan hook, so that
+# importing the app (and every model / crud module) never touches the network
+engine = None
+async_engine = None
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+# expire_on_commit=False: objects returned from an async route must stay
+# readable after commit without an implicit (blocking) refresh
+AsyncSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
 
-    except Exception as e:
-        print("database not connected {e}")
-        break
+Base = declarative_base()
 
 
+class PoolStats:
+    """
+    Checkout / wait counters for the engine's pool, fed by pool events and
+    TimedQueuePool
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    def increment(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
 
-Base = declarative_base()
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": self.wait_seconds / self.waits * 1000 if self.waits else 0.0,
+                "max_wait_ms": self.max_wait_seconds * 1000
+            }
+
+
+pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+class _TimedCheckout:
+    """
+    Pool mixin that records how long checkouts block once every pooled and
+    overflow connection is in use
+    """
+    stats = pool_stats
+
+    def _do_get(self):
+        # Pools are only built by _engine_options, from these settings
+        exhausted = settings.DB_MAX_OVERFLOW > -1 and self.checkedout() >= self.size() + settings.DB_MAX_OVERFLOW
+        if not exhausted:
+            return super()._do_get()
+
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - started)
+        return connection
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    stats = pool_stats
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    stats = async_pool_stats
+
+
+def _engine_options(asyncio: bool = False) -> dict:
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+
+    if settings.pgbouncer:
+        # pgbouncer rejects the "options" startup parameter (and asyncpg's
+        # server_settings); the timeout is applied per transaction instead
+        # (see _apply_statement_timeout)
+        options["poolclass"] = NullPool
+        if asyncio:
+            # Transaction pooling hands each transaction a different server
+            # connection, so asyncpg must not rely on named prepared statements
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__"
+            }
+        return options
+
+    options.update(
+        poolclass=TimedAsyncQueuePool if asyncio else TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE
+    )
+    if timeout > 0:
+        if asyncio:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+def _track_pool(target, stats: PoolStats) -> None:
+    for name, counter in (("connect", "connects"), ("checkout", "checkouts"),
+                          ("checkin", "checkins"), ("invalidate", "invalidations")):
+        event.listen(target, name, lambda *args, counter=counter: stats.increment(counter))
+
+
+def _apply_statement_timeout(target) -> None:
+    if settings.pgbouncer and settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        @event.listens_for(target, "begin")
+        def set_statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+
+
+def init_engine():
+    """
+    Create the engine and bind SessionLocal to it; safe to call repeatedly
+    """
+    global engine
+    if engine is None:
+        engine = create_engine(DATABASE_URL, **_engine_options())
+        _track_pool(engine, pool_stats)
+        _apply_statement_timeout(engine)
+        SessionLocal.configure(bind=engine)
+    return engine
+
+
+def init_async_engine():
+    """
+    Create the asyncpg engine and bind AsyncSessionLocal to it; safe to call
+    repeatedly
+    """
+    global async_engine
+    if async_engine is None:
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(asyncio=True))
+        _track_pool(async_engine.sync_engine, async_pool_stats)
+        _apply_statement_timeout(async_engine.sync_engine)
+        AsyncSessionLocal.configure(bind=async_engine)
+    return async_engine
+
+
+def _pool_status(pool, stats: PoolStats) -> dict:
+    status = stats.snapshot()
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            timeout_seconds=settings.DB_POOL_TIMEOUT
+        )
+    return status
+
+
+def pool_status() -> dict:
+    """
+    Current occupancy plus the cumulative checkout / wait counters of the
+    sync and async pools
+    """
+    return {
+        "pgbouncer": settings.pgbouncer,
+        "sync": _pool_status(engine.pool if engine is not None else None, pool_stats),
+        "async": _pool_status(async_engine.pool if async_engine is not None else None, async_pool_stats)
+    }
+
+
+def wait_for_database(attempts: int = 5, delay: float = 1.0) -> None:
+    """
+    Block until the database accepts connections, retrying with backoff
+    """
+    init_engine()
+    for attempt in range(1, attempts + 1):
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            print(f"database connected ({DB_HOST}:{DB_PORT})")
+            return
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            print(f"database not connected (attempt {attempt}/{attempts}): {e}")
+            time.sleep(delay * attempt)
+
+
+def check_schema() -> bool:
+    """
+    Compare the database's Alembic revision with the migration head and warn
+    when they differ. Returns True when the schema is current.
+    """
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    config = Config(os.path.join(root, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(root, "migrations"))
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+
+    with init_engine().connect() as conn:
+        current = set(MigrationContext.configure(conn).get_current_heads())
+
+    if current != heads:
+        print(
+            f"WARNING: database schema is at {', '.join(sorted(current)) or 'no revision'}, "
+            f"migrations are at {', '.join(sorted(heads))}; run `alembic upgrade head`"
+        )
+        return False
+    return True
+
+
+def dispose_engine() -> None:
+    if engine is not None:
+        engine.dispose()
+
+
+async def dispose_async_engine() -> None:
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 def get_db():
+    init_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    init_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@lru_cache(maxsize=None)
+def _type_adapter(response_model):
+    from pydantic import TypeAdapter
+    return TypeAdapter(response_model)
+
+
+async def run_sync(db: AsyncSession, fn, *args, response_model=None, **kwargs):
+    """
+    Call a synchronous crud function with the Session behind db. With
+    response_model, the result is converted inside the same greenlet so lazy
+    relationship loads cannot run on the event loop afterwards.
+    """
+    def call(session):
+        result = fn(session, *args, **kwargs)
+        if response_model is None:
+            return result
+        return _type_adapter(response_model).validate_python(result, from_attributes=True)
+
+    return await db.run_sync(call)
@@ -2,14 +2,57 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import os
-from database import engine
-from crud.api.v1.endpoints import financial, invoice, reports, inventory
-from models import financial as financial_models
-from models import invoice as invoice_models
-from models import reports as reports_models
-from models import inventory as inventory_models
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from starlette.concurrency import run_in_threadpool
+import database
+from config import settings
+from crud.invoice import mark_overdue_invoices
+from crud.api.v1.endpoints import financial, invoice, reports, inventory, reconciliation
+from utils.executor import ExecutorBusy, cpu_executor
 
-app = FastAPI(title="ERP SaaS API", version="0.1.0")
+
+def sweep_overdue_invoices() -> int:
+    with database.SessionLocal() as db:
+        return mark_overdue_invoices(db)
+
+
+async def overdue_sweeper(interval: float):
+    # Every worker runs one; the UPDATE only touches SENT rows, so runs
+    # that overlap simply find nothing left to change.
+    while True:
+        try:
+            count = await run_in_threadpool(sweep_overdue_invoices)
+            if count:
+                print(f"Marked {count} invoices overdue")
+        except Exception as e:
+            print(f"Overdue invoice sweep failed: {e}")
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connecting and checking the schema happen per worker at startup rather
+    # than at import time; pandas, sklearn, reportlab, openpyxl and anthropic
+    # are imported by the endpoints that use them, on first use.
+    database.wait_for_database()
+    database.check_schema()
+    database.init_async_engine()
+    cpu_executor.start()
+    sweeper = None
+    if settings.OVERDUE_SWEEP_INTERVAL > 0:
+        sweeper = asyncio.create_task(overdue_sweeper(settings.OVERDUE_SWEEP_INTERVAL))
+    yield
+    if sweeper:
+        sweeper.cancel()
+        with suppress(asyncio.CancelledError):
+            await sweeper
+    cpu_executor.shutdown()
+    await database.dispose_async_engine()
+    database.dispose_engine()
+
+
+app = FastAPI(title="ERP SaaS API", version="0.1.0", lifespan=lifespan)
 
 origins = [
     "http://localhost:5173",
@@ -42,21 +85,20 @@ async def exception_handling(request, call_next):
             content={"detail": f"Internal server error occurred: {str(e)}"}
         )
 
-# financial_models.Base.metadata.drop_all(bind=engine)
-# invoice_models.Base.metadata.drop_all(bind=engine)
-# reports_models.Base.metadata.drop_all(bind=engine)
-# inventory_models.Base.metadata.drop_all(bind=engine)
- 
-financial_models.Base.metadata.create_all(bind=engine)
-invoice_models.Base.metadata.create_all(bind=engine)
-reports_models.Base.metadata.create_all(bind=engine)
-inventory_models.Base.metadata.create_all(bind=engine)
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request, exc):
+    from fastapi.responses import JSONResponse
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
+# The schema is owned by the migrations in migrations/; run
+# `alembic upgrade head` before starting the app (the lifespan hook warns
+# when the database is behind).
 
 app.include_router(financial.router, prefix="/api/v1/financial", tags=["financial"])
 app.include_router(invoice.router, prefix="/api/v1/invoice", tags=["invoice"])
 app.include_router(reports.router, prefix="/api/v1/reports", tags=["reports"])
 app.include_router(inventory.router, prefix="/api/v1/inventory", tags=["inventory"])
+app.include_router(reconciliation.router, prefix="/api/v1/reconciliation", tags=["reconciliation"])
 
 
 from datetime import datetime
@@ -67,13 +109,26 @@ def health_check():
 
 @app.get("/debug/env", tags=["system"], include_in_schema=False)
 async def debug_env():
-    import os
+    from config import settings
     env_vars = {}
-    for key in os.environ:
-        if key in ["DB_HOST", "DB_PORT", "DB_NAME", "DB_USER", "ANTHROPIC_API_KEY"]:
+    for key in ["DB_HOST", "DB_PORT", "DB_NAME", "DB_USER", "ANTHROPIC_API_KEY"]:
+        if getattr(settings, key):
             env_vars[key] = "***" if "PASSWORD" in key or "KEY" in key else "present"
     return {"env_vars_available": env_vars}
 
+@app.get("/debug/db-pool", tags=["system"], include_in_schema=False)
+def debug_db_pool():
+    return database.pool_status()
+
+@app.get("/debug/executor", tags=["system"], include_in_schema=False)
+def debug_executor():
+    return cpu_executor.stats()
+
+@app.get("/debug/llm", tags=["system"], include_in_schema=False)
+def debug_llm():
+    from utils.llm_gateway import llm_gateway
+    return llm_gateway.stats()
+
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 8000))
 
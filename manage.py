@@ -0,0 +1,73 @@
+import argparse
+import sys
+from database import SessionLocal, init_engine
+from crud import financial, invoice, rollups
+
+
+def rollups_command(args):
+    db = SessionLocal()
+    try:
+        if args.action == "rebuild":
+            count = rollups.rebuild_rollups(db)
+            print(f"Rebuilt {count} monthly rollup rows")
+            return 0
+
+        mismatches = rollups.verify_rollups(db)
+        for row in mismatches[:50]:
+            print(row)
+        if mismatches:
+            print(f"{len(mismatches)} rollup rows differ from transactions; run 'python manage.py rollups rebuild'")
+            return 1
+        print("Monthly rollups match transactions")
+        return 0
+    finally:
+        db.close()
+
+
+def categories_command(args):
+    db = SessionLocal()
+    try:
+        try:
+            count = financial.rebuild_account_category_closure(db)
+        except ValueError as e:
+            print(e)
+            return 1
+        print(f"Rebuilt {count} account category closure rows")
+        return 0
+    finally:
+        db.close()
+
+
+def invoices_command(args):
+    db = SessionLocal()
+    try:
+        count = invoice.mark_overdue_invoices(db)
+        print(f"Marked {count} invoices overdue")
+        return 0
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ERP maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rollups_parser = subparsers.add_parser("rollups", help="Backfill or check the monthly transaction rollups")
+    rollups_parser.add_argument("action", choices=["rebuild", "verify"])
+    rollups_parser.set_defaults(handler=rollups_command)
+
+    categories_parser = subparsers.add_parser("categories", help="Backfill the account category closure table")
+    categories_parser.add_argument("action", choices=["rebuild-closure"])
+    categories_parser.set_defaults(handler=categories_command)
+
+    invoices_parser = subparsers.add_parser("invoices", help="Invoice maintenance")
+    invoices_parser.add_argument("action", choices=["mark-overdue"])
+    invoices_parser.set_defaults(handler=invoices_command)
+
+    args = parser.parse_args(argv)
+    init_engine()
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
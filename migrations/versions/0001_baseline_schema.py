@@ -0,0 +1,225 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 01:34:46.456493
+
+The schema as it stood when main.py still created tables with
+Base.metadata.create_all. Databases created that way can be upgraded in
+place: tables that already exist are left alone, missing ones are created,
+and the rollup / closure tables are backfilled when they start out empty.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+transaction_type = postgresql.ENUM('ASSET', 'LIABILITY', 'EQUITY', 'INCOME', 'EXPENSE', name='transactiontype', create_type=False)
+invoice_status = postgresql.ENUM('DRAFT', 'SENT', 'PAID', 'OVERDUE', 'CANCELLED', name='invoicestatus', create_type=False)
+payment_terms = postgresql.ENUM('NET_7', 'NET_15', 'NET_30', 'NET_60', name='paymentterms', create_type=False)
+currency = postgresql.ENUM('USD', 'EUR', 'GBP', 'JPY', 'IDR', name='currency', create_type=False)
+ENUMS = (transaction_type, invoice_status, payment_terms, currency)
+
+
+def _create_table(existing: set, name: str, *columns, indexes=()) -> bool:
+    if name in existing:
+        return False
+    op.create_table(name, *columns)
+    for index_name, index_columns, unique in indexes:
+        op.create_index(index_name, name, index_columns, unique=unique)
+    return True
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing = set(sa.inspect(bind).get_table_names())
+    for enum in ENUMS:
+        enum.create(bind, checkfirst=True)
+
+    _create_table(existing, 'account_categories',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('code', sa.String(), nullable=False),
+        sa.Column('type', transaction_type, nullable=False),
+        sa.Column('parent_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['parent_id'], ['account_categories.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('code'),
+        indexes=[('ix_account_categories_id', ['id'], False)]
+    )
+    _create_table(existing, 'financial_reports',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('report_type', sa.String(), nullable=False),
+        sa.Column('period_start', sa.DateTime(), nullable=False),
+        sa.Column('period_end', sa.DateTime(), nullable=False),
+        sa.Column('total_revenue', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('total_expenses', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('net_profit', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('generated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('total_assets', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('total_liabilities', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('total_equity', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        indexes=[('ix_financial_reports_id', ['id'], False)]
+    )
+    _create_table(existing, 'inventory_items',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('description', sa.String(), nullable=False),
+        sa.Column('price', sa.Numeric(precision=15, scale=2), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        indexes=[('ix_inventory_items_id', ['id'], False)]
+    )
+    _create_table(existing, 'invoices',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('invoice_number', sa.UUID(), nullable=False),
+        sa.Column('client_name', sa.String(), nullable=True),
+        sa.Column('client_email', sa.String(), nullable=True),
+        sa.Column('client_address', sa.String(), nullable=True),
+        sa.Column('issue_date', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('due_date', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('status', invoice_status, nullable=True),
+        sa.Column('payment_terms', payment_terms, nullable=False),
+        sa.Column('currency', currency, nullable=False),
+        sa.Column('subtotal', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('tax_rate', sa.Numeric(precision=4, scale=2), nullable=False),
+        sa.Column('tax_amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('total', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('notes', sa.String(), nullable=True),
+        sa.Column('pdf_url', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('invoice_number'),
+        indexes=[('ix_invoices_id', ['id'], False)]
+    )
+    _create_table(existing, 'transactions',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('amount', sa.Numeric(precision=15, scale=2), nullable=False),
+        sa.Column('transaction_type', transaction_type, nullable=False),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('transaction_date', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('notes', sa.String(), nullable=True),
+        sa.Column('region', sa.String(), nullable=False),
+        sa.Column('inventory_item_id', sa.Integer(), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=True),
+        sa.Column('account_category_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['account_category_id'], ['account_categories.id'], ),
+        sa.ForeignKeyConstraint(['inventory_item_id'], ['inventory_items.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        indexes=[('ix_transactions_id', ['id'], False)]
+    )
+    _create_table(existing, 'invoice_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('invoice_id', sa.Integer(), nullable=True),
+        sa.Column('description', sa.String(), nullable=False),
+        sa.Column('quantity', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('unit_price', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('inventory_item_id', sa.Integer(), nullable=True),
+        sa.Column('transaction_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['inventory_item_id'], ['inventory_items.id'], ),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ),
+        sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        indexes=[('ix_invoice_items_id', ['id'], False)]
+    )
+    _create_table(existing, 'payment_history',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('invoice_id', sa.Integer(), nullable=True),
+        sa.Column('amount_paid', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('payment_date', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('payment_method', sa.String(), nullable=False),
+        sa.Column('transaction_reference', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        indexes=[('ix_payment_history_id', ['id'], False)]
+    )
+
+    if _create_table(existing, 'transaction_monthly_rollups',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('month', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('transaction_type', transaction_type, nullable=False),
+        sa.Column('account_category_id', sa.Integer(), nullable=False),
+        sa.Column('region', sa.String(), nullable=False),
+        sa.Column('inventory_item_id', sa.Integer(), nullable=True),
+        sa.Column('total_amount', sa.Numeric(precision=18, scale=2), nullable=False),
+        sa.Column('total_quantity', sa.BigInteger(), nullable=False),
+        sa.Column('transaction_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        indexes=[('ix_transaction_monthly_rollups_id', ['id'], False)]
+    ):
+        op.create_index(
+            'uq_transaction_monthly_rollups_key', 'transaction_monthly_rollups',
+            ['month', 'transaction_type', 'account_category_id', 'region', sa.text('coalesce(inventory_item_id, 0)')],
+            unique=True
+        )
+        op.execute("""
+            INSERT INTO transaction_monthly_rollups
+                (month, transaction_type, account_category_id, region, inventory_item_id,
+                 total_amount, total_quantity, transaction_count)
+            SELECT date_trunc('month', transaction_date), transaction_type, account_category_id, region,
+                   inventory_item_id, sum(amount), sum(coalesce(quantity, 0)), count(id)
+            FROM transactions
+            GROUP BY 1, 2, 3, 4, 5
+        """)
+
+    if _create_table(existing, 'account_category_closure',
+        sa.Column('ancestor_id', sa.Integer(), nullable=False),
+        sa.Column('descendant_id', sa.Integer(), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['account_categories.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['descendant_id'], ['account_categories.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id'),
+        indexes=[('ix_account_category_closure_descendant', ['descendant_id', 'ancestor_id', 'depth'], False)]
+    ):
+        # Paths carry the categories already visited, so cyclic parent links
+        # stop instead of recursing; cycles abort the upgrade by name rather
+        # than as a primary key violation
+        paths = """
+            WITH RECURSIVE paths (ancestor_id, descendant_id, depth, path, cycle) AS (
+                SELECT id, id, 0, ARRAY[id], false FROM account_categories
+                UNION ALL
+                SELECT paths.ancestor_id, c.id, paths.depth + 1, paths.path || c.id, c.id = ANY(paths.path)
+                FROM paths JOIN account_categories c ON c.parent_id = paths.descendant_id
+                WHERE NOT paths.cycle
+            )
+        """
+        cyclic = op.get_bind().execute(sa.text(
+            paths + "SELECT DISTINCT descendant_id FROM paths WHERE cycle ORDER BY 1"
+        )).scalars().all()
+        if cyclic:
+            raise RuntimeError(
+                f"account_categories {', '.join(map(str, cyclic))} are in a parent_id cycle; "
+                "fix their parent_id and run the upgrade again"
+            )
+        op.execute(
+            "INSERT INTO account_category_closure (ancestor_id, descendant_id, depth) "
+            + paths + "SELECT ancestor_id, descendant_id, depth FROM paths"
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('account_category_closure')
+    op.drop_table('transaction_monthly_rollups')
+    op.drop_table('payment_history')
+    op.drop_table('invoice_items')
+    op.drop_table('transactions')
+    op.drop_table('invoices')
+    op.drop_table('inventory_items')
+    op.drop_table('financial_reports')
+    op.drop_table('account_categories')
+    bind = op.get_bind()
+    for enum in ENUMS:
+        enum.drop(bind, checkfirst=True)
@@ -0,0 +1,52 @@
+"""hot path indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 01:52:10.118203
+
+Composite and covering indexes for the report, inventory analysis and
+listing queries. Built CONCURRENTLY so upgrading a live database does not
+block writes to transactions.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_transactions_type_date', 'transactions', ['transaction_type', 'transaction_date'],
+     dict(postgresql_include=['amount'])),
+    ('ix_transactions_item_type', 'transactions', ['inventory_item_id', 'transaction_type'],
+     dict(postgresql_include=['quantity', 'amount', 'region', 'transaction_date'],
+          postgresql_where=sa.text('inventory_item_id IS NOT NULL'))),
+    ('ix_transactions_category_date', 'transactions', ['account_category_id', 'transaction_date'],
+     dict(postgresql_include=['amount'])),
+    ('ix_transactions_date_id', 'transactions', ['transaction_date', 'id'], {}),
+    ('ix_invoices_issue_date_id', 'invoices', ['issue_date', 'id'], {}),
+    ('ix_invoice_items_invoice_id', 'invoice_items', ['invoice_id'], {}),
+    ('ix_invoice_items_inventory_item_id', 'invoice_items', ['inventory_item_id'], {}),
+    ('ix_payment_history_invoice_id', 'payment_history', ['invoice_id'], {}),
+    ('ix_account_categories_parent_id', 'account_categories', ['parent_id'], {}),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True, **options)
+        for table in sorted({table for _, table, _, _ in INDEXES}):
+            op.execute(f"ANALYZE {table}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
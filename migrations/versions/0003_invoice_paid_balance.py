@@ -0,0 +1,44 @@
+"""invoice paid and balance
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 02:20:41.530912
+
+invoices.amount_paid holds the sum of the invoice's payment_history and is
+maintained by add_payment; balance_due is generated from total and
+amount_paid so it stays right when an invoice's total is edited. Existing
+invoices are backfilled from their payments.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('invoices', sa.Column('amount_paid', sa.Numeric(precision=10, scale=2),
+                                        server_default=sa.text('0'), nullable=False))
+    op.execute("""
+        UPDATE invoices
+        SET amount_paid = paid.amount
+        FROM (
+            SELECT invoice_id, sum(amount_paid) AS amount
+            FROM payment_history
+            GROUP BY invoice_id
+        ) AS paid
+        WHERE paid.invoice_id = invoices.id
+    """)
+    op.add_column('invoices', sa.Column('balance_due', sa.Numeric(precision=10, scale=2),
+                                        sa.Computed('total - amount_paid', persisted=True), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('invoices', 'balance_due')
+    op.drop_column('invoices', 'amount_paid')
@@ -0,0 +1,35 @@
+"""invoice status due date index
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 03:05:12.604218
+
+Index on invoices (status, due_date) for the overdue sweeper and the
+receivables aging report. It carries the aging report's columns so the
+report can be answered from the index. Built CONCURRENTLY like the 0002
+indexes.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_invoices_status_due_date', 'invoices', ['status', 'due_date'],
+                        if_not_exists=True, postgresql_concurrently=True,
+                        postgresql_include=['client_name', 'currency', 'balance_due'])
+        op.execute("ANALYZE invoices")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_invoices_status_due_date', table_name='invoices', if_exists=True,
+                      postgresql_concurrently=True)
@@ -0,0 +1,33 @@
+"""invoice issue date not null
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 04:12:37.228140
+
+invoices.issue_date leads the keyset pagination order (issue_date, id);
+a NULL compares as unknown in the row comparison, so such invoices never
+appeared on any cursor page. Any NULLs are backfilled from due_date, the
+closest date the invoice has, before the column becomes NOT NULL.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("UPDATE invoices SET issue_date = due_date WHERE issue_date IS NULL")
+    op.alter_column('invoices', 'issue_date', existing_type=sa.DateTime(timezone=True),
+                    existing_server_default=sa.text('now()'), nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('invoices', 'issue_date', existing_type=sa.DateTime(timezone=True),
+                    existing_server_default=sa.text('now()'), nullable=True)
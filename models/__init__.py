@@ -1,4 +1,4 @@
-from .financial import Transaction, TransactionType, AccountCategory
+from .financial import Transaction, TransactionType, AccountCategory, AccountCategoryClosure, TransactionMonthlyRollup
 from .invoice import Invoice, InvoiceItem, PaymentHistory, InvoiceStatus, PaymentTerms, Currency
 from .inventory import InventoryItem
 from .reports import FinancialReports
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Numeric, DateTime, Enum, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship, backref
 from enum import Enum as PyEnum
@@ -33,6 +33,21 @@ class Transaction(Base):
     account_category_id = Column(Integer, ForeignKey("account_categories.id"), nullable=False)
     account_category = relationship("AccountCategory", back_populates="transactions")
 
+    __table_args__ = (
+        # reports: type + date range, summing amount
+        Index("ix_transactions_type_date", transaction_type, transaction_date, postgresql_include=["amount"]),
+        # inventory analysis: sales per item, answered from the index alone
+        Index(
+            "ix_transactions_item_type", inventory_item_id, transaction_type,
+            postgresql_include=["quantity", "amount", "region", "transaction_date"],
+            postgresql_where=inventory_item_id.isnot(None)
+        ),
+        # IFRS / category balances
+        Index("ix_transactions_category_date", account_category_id, transaction_date, postgresql_include=["amount"]),
+        # keyset pagination order
+        Index("ix_transactions_date_id", transaction_date, id),
+    )
+
 class AccountCategory(Base):
     __tablename__ = "account_categories"
     
@@ -40,9 +55,41 @@ class AccountCategory(Base):
     name = Column(String, nullable=False)
     code = Column(String, nullable=False, unique=True)
     type = Column(Enum(TransactionType), nullable=False)
-    parent_id = Column(Integer, ForeignKey("account_categories.id"), nullable=True)
+    parent_id = Column(Integer, ForeignKey("account_categories.id"), nullable=True, index=True)
     
     children = relationship("AccountCategory", backref=backref("parent", remote_side=[id]))
     transactions = relationship("Transaction", back_populates="account_category") 
 
-    
\ No newline at end of file
+
+class AccountCategoryClosure(Base):
+    __tablename__ = "account_category_closure"
+
+    ancestor_id = Column(Integer, ForeignKey("account_categories.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("account_categories.id", ondelete="CASCADE"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_account_category_closure_descendant", descendant_id, ancestor_id, depth),
+    )
+
+
+class TransactionMonthlyRollup(Base):
+    __tablename__ = "transaction_monthly_rollups"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    month = Column(DateTime(timezone=True), nullable=False)
+    transaction_type = Column(Enum(TransactionType), nullable=False)
+    account_category_id = Column(Integer, nullable=False)
+    region = Column(String, nullable=False)
+    inventory_item_id = Column(Integer, nullable=True)
+    total_amount = Column(Numeric(18, 2), nullable=False, default=0)
+    total_quantity = Column(BigInteger, nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index(
+            "uq_transaction_monthly_rollups_key",
+            month, transaction_type, account_category_id, region, func.coalesce(inventory_item_id, 0),
+            unique=True
+        ),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Enum, ForeignKey, UUID
+from sqlalchemy import Column, Computed, Integer, String, Numeric, DateTime, Enum, ForeignKey, UUID, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from enum import Enum as PyEnum
@@ -33,7 +33,8 @@ class Invoice(Base):
     client_name = Column(String, nullable=True)
     client_email = Column(String, nullable=True)
     client_address = Column(String, nullable=True)
-    issue_date = Column(DateTime(timezone=True), server_default=func.now())
+    # NOT NULL: part of the keyset pagination order
+    issue_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     due_date = Column(DateTime(timezone=True), nullable=False)
     status = Column(Enum(InvoiceStatus), default=InvoiceStatus.DRAFT)
     payment_terms = Column(Enum(PaymentTerms), nullable=False)
@@ -42,23 +43,36 @@ class Invoice(Base):
     tax_rate = Column(Numeric(4, 2), nullable=False) 
     tax_amount = Column(Numeric(10, 2), nullable=False)
     total = Column(Numeric(10, 2), nullable=False)
+    # Sum of payment_history, maintained by crud.invoice.add_payment
+    amount_paid = Column(Numeric(10, 2), nullable=False, default=0, server_default=text("0"))
+    balance_due = Column(Numeric(10, 2), Computed("total - amount_paid", persisted=True), nullable=False)
     notes = Column(String, nullable=True)
     pdf_url = Column(String, nullable=True)
     
     items = relationship("InvoiceItem", back_populates="invoice", cascade="all, delete-orphan")
     payment_history = relationship("PaymentHistory", back_populates="invoice", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # keyset pagination order
+        Index("ix_invoices_issue_date_id", issue_date, id),
+        # overdue sweeper and receivables aging, answered from the index alone
+        Index(
+            "ix_invoices_status_due_date", status, due_date,
+            postgresql_include=["client_name", "currency", "balance_due"]
+        ),
+    )
+
 class InvoiceItem(Base):
     __tablename__ = "invoice_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    invoice_id = Column(Integer, ForeignKey("invoices.id"))
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), index=True)
     description = Column(String, nullable=False)
     quantity = Column(Numeric(10, 2), nullable=False)
     unit_price = Column(Numeric(10, 2), nullable=False)
     amount = Column(Numeric(10, 2), nullable=False)
 
-    inventory_item_id = Column(Integer, ForeignKey("inventory_items.id"), nullable=True)
+    inventory_item_id = Column(Integer, ForeignKey("inventory_items.id"), nullable=True, index=True)
     transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=True)
 
     invoice = relationship("Invoice", back_populates="items")
@@ -70,7 +84,7 @@ class PaymentHistory(Base):
     __tablename__ = "payment_history"
 
     id = Column(Integer, primary_key=True, index=True)
-    invoice_id = Column(Integer, ForeignKey("invoices.id"))
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), index=True)
     amount_paid = Column(Numeric(10, 2), nullable=False)
     payment_date = Column(DateTime(timezone=True), server_default=func.now())
     payment_method = Column(String, nullable=False)
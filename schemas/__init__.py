@@ -4,4 +4,5 @@ from .invoice import (
     InvoiceItem, InvoiceItemCreate,
     PaymentHistory, PaymentHistoryCreate
 )
-from .reports import ProfitLossReport, BalanceSheet, RevenuePrediction
\ No newline at end of file
+from .reports import ProfitLossReport, BalanceSheet, RevenuePrediction
+from .pagination import CursorPage
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, condecimal
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from decimal import Decimal
 from models.financial import TransactionType
 
@@ -25,6 +25,17 @@ class Transaction(TransactionCreate):
     class Config:
         from_attributes = True
 
+class TransactionIngestError(BaseModel):
+    line: int
+    errors: List[str]
+
+class TransactionIngestResult(BaseModel):
+    received: int
+    inserted: int
+    error_count: int
+    # At most the first 1000 rows with errors are listed
+    errors: List[TransactionIngestError]
+
 class TransactionUpdate(BaseModel):
     amount: Optional[condecimal(max_digits=10, decimal_places=2)] = None
     description: Optional[str] = None
@@ -53,8 +53,9 @@ class InvoiceBase(BaseModel):
 
 class InvoiceCreate(InvoiceBase):
     due_date: datetime
-    items: List[InvoiceItemCreate]
+    # Declared before items so validate_items can see it
     transaction_ids: Optional[List[int]] = None
+    items: List[InvoiceItemCreate]
 
     @validator('items')
     def validate_items(cls, v, values):
@@ -73,6 +74,8 @@ class Invoice(InvoiceBase):
     subtotal: Decimal
     tax_amount: Decimal
     total: Decimal
+    amount_paid: Decimal
+    balance_due: Decimal
     pdf_url: Optional[str]
     items: List[InvoiceItem]
     payment_history: List[PaymentHistory]
@@ -88,4 +91,41 @@ class InvoiceUpdate(BaseModel):
     currency: Optional[Currency] = None
     tax_rate: Optional[Decimal] = Field(None, ge=0, le=100)
     notes: Optional[str] = None
-    status: Optional[InvoiceStatus] = None
\ No newline at end of file
+    status: Optional[InvoiceStatus] = None
+
+class InvoiceBatchResult(BaseModel):
+    # Position of the payload in the request body
+    index: int
+    invoice_id: Optional[int] = None
+    invoice_number: Optional[UUID4] = None
+    total: Optional[Decimal] = None
+    errors: List[str] = []
+
+class InvoiceBatchResponse(BaseModel):
+    received: int
+    created: int
+    # Payloads rejected as invalid; in an aborted atomic batch the valid ones
+    # also carry an error saying they were not created
+    error_count: int
+    # One entry per payload, in request order
+    results: List[InvoiceBatchResult]
+
+class ReceivablesAgingTotal(BaseModel):
+    currency: Currency
+    # Outstanding balance by days past due
+    current: Decimal
+    days_1_30: Decimal
+    days_31_60: Decimal
+    days_61_90: Decimal
+    days_over_90: Decimal
+    total: Decimal
+    invoice_count: int
+
+class ReceivablesAgingRow(ReceivablesAgingTotal):
+    client_name: Optional[str] = None
+
+class ReceivablesAging(BaseModel):
+    as_of: datetime
+    # Largest balances first within each currency
+    clients: List[ReceivablesAgingRow]
+    totals: List[ReceivablesAgingTotal]
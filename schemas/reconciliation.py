@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+from typing import Dict, List
+from decimal import Decimal
+
+class ReconciliationAllocation(BaseModel):
+    # Statement line number, counting the header as line 1
+    line: int
+    invoice_id: int
+    amount: Decimal
+    rule: str
+
+class ReconciliationError(BaseModel):
+    line: int
+    errors: List[str]
+
+class ReconciliationResult(BaseModel):
+    lines: int
+    credits: int
+    matched_lines: int
+    unmatched_lines: int
+    received: Decimal
+    allocated: Decimal
+    # Credits left over after their invoices were paid in full, or unmatched
+    unapplied: Decimal
+    invoices_matched: int
+    invoices_paid: int
+    payments_created: int
+    dry_run: bool
+    matches_by_rule: Dict[str, int]
+    # At most the first 1000 allocations, unmatched lines and errors are listed
+    allocations: List[ReconciliationAllocation]
+    unmatched: List[int]
+    error_count: int
+    errors: List[ReconciliationError]
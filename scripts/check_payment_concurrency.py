@@ -0,0 +1,132 @@
+"""
+Apply many payments to one invoice at the same moment, as concurrent
+payment-gateway callbacks would, and check that none is lost.
+
+    python -m scripts.check_payment_concurrency
+    python -m scripts.check_payment_concurrency --payments 50 --rounds 10
+
+Each round creates a throwaway invoice and pays it off with --payments
+equal payments from as many threads, each on its own connection and all
+released together. Afterwards amount_paid must equal the sum of
+payment_history, balance_due must be zero and the invoice must be PAID.
+The invoices and payments are deleted again. Exits with status 1 on any
+mismatch. tests/test_payment_concurrency.py runs the same check under
+pytest.
+"""
+import argparse
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from sqlalchemy import delete, func, select
+import database
+from crud import invoice
+from models.invoice import Invoice, InvoiceItem, InvoiceStatus, PaymentHistory
+from schemas.invoice import InvoiceCreate, PaymentHistoryCreate
+
+
+def create_invoice(session_factory, n_payments: int, payment: Decimal) -> int:
+    total = payment * n_payments
+    with session_factory() as db:
+        created = invoice.create_invoice(db, InvoiceCreate(
+            client_name="Payment concurrency check",
+            client_email="check@example.com",
+            client_address="-",
+            payment_terms="NET_7",
+            currency="IDR",
+            tax_rate=Decimal("0"),
+            due_date=datetime.now(timezone.utc) + timedelta(days=7),
+            items=[{"description": "check", "quantity": "1", "unit_price": str(total), "amount": str(total)}]
+        ))
+        return created.id
+
+
+def pay_concurrently(session_factory, invoice_id: int, n_payments: int, payment: Decimal) -> list:
+    barrier = threading.Barrier(n_payments)
+    errors = []
+
+    def pay(i):
+        try:
+            with session_factory() as db:
+                # Check the connection out before waiting so all threads
+                # start their UPDATE together
+                db.connection()
+                barrier.wait()
+                invoice.add_payment(db, invoice_id, PaymentHistoryCreate(
+                    amount_paid=payment, payment_method="gateway", transaction_reference=f"check-{i}"
+                ))
+        except Exception as e:
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=pay, args=(i,)) for i in range(n_payments)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def payment_state(session_factory, invoice_id: int):
+    """
+    The invoice's total, amount_paid, balance_due and status, and the count
+    and sum of its payment_history
+    """
+    with session_factory() as db:
+        row = db.execute(
+            select(Invoice.total, Invoice.amount_paid, Invoice.balance_due, Invoice.status)
+            .where(Invoice.id == invoice_id)
+        ).one()
+        recorded = db.execute(
+            select(func.count(), func.coalesce(func.sum(PaymentHistory.amount_paid), 0))
+            .where(PaymentHistory.invoice_id == invoice_id)
+        ).one()
+    return row, recorded
+
+
+def delete_invoices(session_factory, invoice_ids: list) -> None:
+    with session_factory() as db:
+        db.execute(delete(PaymentHistory).where(PaymentHistory.invoice_id.in_(invoice_ids)))
+        db.execute(delete(InvoiceItem).where(InvoiceItem.invoice_id.in_(invoice_ids)))
+        db.execute(delete(Invoice).where(Invoice.id.in_(invoice_ids)))
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--payments", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    database.init_engine()
+    pool_size = database.settings.DB_POOL_SIZE + database.settings.DB_MAX_OVERFLOW
+    if args.payments > pool_size:
+        sys.exit(f"--payments must be at most the pool size ({pool_size})")
+
+    payment = Decimal("12500.25")
+    failures = 0
+    invoice_ids = []
+    try:
+        for round_number in range(1, args.rounds + 1):
+            invoice_id = create_invoice(database.SessionLocal, args.payments, payment)
+            invoice_ids.append(invoice_id)
+            errors = pay_concurrently(database.SessionLocal, invoice_id, args.payments, payment)
+            row, recorded = payment_state(database.SessionLocal, invoice_id)
+
+            ok = (not errors and recorded[0] == args.payments and row.amount_paid == recorded[1] == row.total
+                  and row.balance_due == 0 and row.status == InvoiceStatus.PAID)
+            failures += not ok
+            print(f"round {round_number}: {recorded[0]} payments recorded, amount_paid {row.amount_paid} of {row.total}, "
+                  f"balance {row.balance_due}, {row.status.value} {'ok' if ok else 'MISMATCH'}")
+            for error in errors:
+                print(f"  {error}")
+    finally:
+        delete_invoices(database.SessionLocal, invoice_ids)
+
+    if failures:
+        print(f"{failures} of {args.rounds} rounds lost payments or missed the PAID transition")
+        sys.exit(1)
+    print("All payments applied")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+EXPLAIN every statement the report, analysis and listing code paths send,
+and flag sequential scans on the large tables.
+
+    python -m scripts.explain_reports
+    python -m scripts.explain_reports --seed 200000 --analyze
+    python -m scripts.explain_reports --force-index
+
+The statements are captured by running the real crud functions, so the
+plans are for exactly what the endpoints execute. Everything runs inside a
+transaction that is rolled back.
+
+On a small development database the planner rightly prefers sequential
+scans; --seed adds a synthetic ledger first, and --force-index sets
+enable_seqscan = off so any Seq Scan left in a plan means no usable index
+exists. Exits with status 1 when a checked table is sequentially scanned.
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import event, text
+import database
+from benchmarks.harness import rollback_session, seed_inventory_sales, seed_ledger
+
+CHECKED_TABLES = ("transactions", "invoices", "invoice_items", "payment_history")
+
+
+class StatementRecorder:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def report_queries(db):
+    """
+    (name, callable) for every code path whose queries are explained
+    """
+    from crud import financial, inventory, invoice, reports
+
+    end_date = datetime.now()
+    start_date = (end_date - timedelta(days=365)).replace(day=15)
+    category_id = db.execute(text("SELECT min(id) FROM account_categories")).scalar()
+
+    def second_page(get_page):
+        def run():
+            _, cursor = get_page(db, limit=50)
+            if cursor:
+                get_page(db, limit=50, cursor=cursor)
+        return run
+
+    return [
+        ("pnl", lambda: reports.generate_pnl(db, start_date, end_date)),
+        ("dashboard", lambda: reports._compute_dashboard_data(db, "90d")),
+        ("monthly_breakdown", lambda: reports.get_monthly_breakdown(db, start_date, end_date)),
+        ("balance_sheet", lambda: reports.generate_balance_sheet(db, end_date)),
+        ("balance_sheet_ifrs", lambda: reports.generate_balance_sheet_ifrs(db, end_date)),
+        ("pnl_ifrs", lambda: reports.generate_pnl_ifrs(db, start_date, end_date)),
+        ("inventory_analysis", lambda: inventory.get_inventory_sales_frames(db)),
+        ("category_balance", lambda: category_id and financial.get_account_category_balance(db, category_id, start_date, end_date)),
+        ("transactions_page", second_page(financial.get_transactions_page)),
+        ("invoices_page", second_page(invoice.get_invoices_page)),
+    ]
+
+
+def walk(plan, depth=0):
+    yield depth, plan
+    for child in plan.get("Plans", []):
+        yield from walk(child, depth + 1)
+
+
+def describe(node) -> str:
+    parts = [node["Node Type"]]
+    if "Index Name" in node:
+        parts.append(f"using {node['Index Name']}")
+    if "Relation Name" in node:
+        parts.append(f"on {node['Relation Name']}")
+    if "Actual Total Time" in node:
+        parts.append(f"({node['Actual Total Time']:.2f} ms, {node['Actual Rows']} rows)")
+    return " ".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=0, help="add this many synthetic ledger transactions first")
+    parser.add_argument("--force-index", action="store_true", help="run with enable_seqscan = off")
+    parser.add_argument("--analyze", action="store_true", help="EXPLAIN ANALYZE (executes the queries)")
+    args = parser.parse_args()
+
+    options = "ANALYZE, FORMAT JSON" if args.analyze else "FORMAT JSON"
+    failures = []
+
+    with rollback_session() as db:
+        if args.seed:
+            seed_ledger(db, args.seed)
+            seed_inventory_sales(db, max(1, args.seed // 1000))
+            db.execute(text("ANALYZE transactions"))
+            db.execute(text("ANALYZE transaction_monthly_rollups"))
+
+        for name, run in report_queries(db):
+            with StatementRecorder(database.init_engine()) as recorder:
+                run()
+
+            if args.force_index:
+                db.execute(text("SET LOCAL enable_seqscan = off"))
+            connection = db.connection()
+            for i, (statement, parameters) in enumerate(recorder.statements, 1):
+                plan = connection.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                print(f"\n{name} [{i}/{len(recorder.statements)}]")
+                for depth, node in walk(plan[0]["Plan"]):
+                    print(f"  {'  ' * depth}{describe(node)}")
+                    if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in CHECKED_TABLES:
+                        failures.append((name, node["Relation Name"]))
+            if args.force_index:
+                db.execute(text("SET LOCAL enable_seqscan = on"))
+
+    if failures:
+        print("\nSequential scans on checked tables:")
+        for name, table in failures:
+            print(f"  {name}: {table}")
+        sys.exit(1)
+    print("\nNo sequential scans on " + ", ".join(CHECKED_TABLES))
+
+
+if __name__ == "__main__":
+    main()
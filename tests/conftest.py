@@ -0,0 +1,19 @@
+import os
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture(scope="session")
+def session_factory():
+    """
+    Sessions on the database named by TEST_DATABASE_URL, migrated to head.
+    Tests that need a database are skipped without it; the app's own .env
+    settings are never used, so tests cannot write to a real database.
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(url, pool_size=20, max_overflow=0)
+    yield sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    engine.dispose()
@@ -0,0 +1,34 @@
+import pytest
+from fastapi.testclient import TestClient
+from database import get_db
+from main import app
+
+
+@pytest.fixture
+def client(session_factory):
+    # Without the context manager the lifespan (and its connection to the
+    # .env database) never runs; requests use the test database instead
+    def test_db():
+        with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = test_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+def test_update_unknown_invoice_is_404(client):
+    response = client.put("/api/v1/invoice/invoices/0", json={"notes": "missing"})
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Invoice not found"}
+
+
+def test_payment_on_unknown_invoice_is_404(client):
+    response = client.post(
+        "/api/v1/invoice/invoices/0/payments/",
+        json={"amount_paid": "10.00", "payment_method": "bank_transfer"}
+    )
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Invoice not found"}
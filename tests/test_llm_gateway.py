@@ -0,0 +1,101 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from utils import llm_gateway as gateway_module
+from utils.llm_gateway import DiskLRUCache, FakeBackend, LLMGateway, LLMTimeout
+from utils.pdf_generator import PDFGenerator
+
+
+class CountingBackend(FakeBackend):
+    """
+    FakeBackend that also records the most calls running at once
+    """
+    def __init__(self, delay: float = 0.0):
+        super().__init__(delay)
+        self.running = 0
+        self.peak = 0
+
+    async def complete(self, *args) -> str:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            return await super().complete(*args)
+        finally:
+            self.running -= 1
+
+
+def make_gateway(tmp_path, backend, **options) -> LLMGateway:
+    return LLMGateway(backend, DiskLRUCache(str(tmp_path / "llm_cache"), 16), **options)
+
+
+def complete_all(gateway: LLMGateway, prompts: list) -> list:
+    async def run():
+        return await asyncio.gather(*(gateway.complete(prompt, model="fake") for prompt in prompts))
+    return asyncio.run(run())
+
+
+def test_identical_prompts_in_flight_share_one_backend_call(tmp_path):
+    backend = FakeBackend(delay=0.2)
+    gateway = make_gateway(tmp_path, backend)
+
+    answers = complete_all(gateway, ["same prompt"] * 10)
+
+    assert len(set(answers)) == 1
+    assert backend.calls == 1
+    assert gateway.stats()["deduplicated"] == 9
+
+
+def test_responses_are_cached_on_disk_across_gateways(tmp_path):
+    first = make_gateway(tmp_path, FakeBackend())
+    answer = first.complete_sync("cached prompt", model="fake")
+
+    backend = FakeBackend()
+    second = make_gateway(tmp_path, backend)
+    assert second.complete_sync("cached prompt", model="fake") == answer
+    assert backend.calls == 0
+    assert second.stats()["cache_hits"] == 1
+
+
+def test_backend_calls_are_limited_to_max_concurrency(tmp_path):
+    backend = CountingBackend(delay=0.05)
+    gateway = make_gateway(tmp_path, backend, max_concurrency=2)
+
+    complete_all(gateway, [f"prompt {i}" for i in range(8)])
+
+    assert backend.calls == 8
+    assert backend.peak == 2
+
+
+def test_slow_backend_raises_llm_timeout(tmp_path):
+    gateway = make_gateway(tmp_path, FakeBackend(delay=1.0), timeout=0.05)
+
+    started = time.perf_counter()
+    with pytest.raises(LLMTimeout):
+        gateway.complete_sync("slow prompt", model="fake")
+    assert time.perf_counter() - started < 0.5
+    assert gateway.stats()["timeouts"] == 1
+
+
+def test_invoice_pdf_description_comes_from_the_gateway(tmp_path, monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(gateway_module, "llm_gateway", make_gateway(tmp_path, backend))
+    invoice = SimpleNamespace(
+        invoice_number="INV-1", client_name="Acme", client_email=None, client_address=None,
+        issue_date=datetime(2026, 1, 1, tzinfo=timezone.utc), due_date=datetime(2026, 1, 31, tzinfo=timezone.utc),
+        currency="IDR", items=[SimpleNamespace(description="Widget", quantity=Decimal("2"),
+                                               unit_price=Decimal("10.00"), amount=Decimal("20.00"))],
+        subtotal=Decimal("20.00"), tax_rate=Decimal("0"), tax_amount=Decimal("0"), total=Decimal("20.00"),
+        notes=None, payment_terms=SimpleNamespace(value="NET_30")
+    )
+    generator = PDFGenerator(None)
+
+    description = asyncio.run(generator.generate_invoice_content(invoice))
+    output_path = generator.create_pdf(invoice, str(tmp_path / "invoice.pdf"), description)
+
+    assert backend.calls == 1
+    assert "Generated by" in description
+    with open(output_path, "rb") as f:
+        assert f.read(5) == b"%PDF-"
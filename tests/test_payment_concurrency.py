@@ -0,0 +1,21 @@
+from decimal import Decimal
+from models.invoice import InvoiceStatus
+from scripts.check_payment_concurrency import create_invoice, delete_invoices, pay_concurrently, payment_state
+
+N_PAYMENTS = 20
+PAYMENT = Decimal("12500.25")
+
+
+def test_parallel_payments_are_all_applied(session_factory):
+    invoice_id = create_invoice(session_factory, N_PAYMENTS, PAYMENT)
+    try:
+        errors = pay_concurrently(session_factory, invoice_id, N_PAYMENTS, PAYMENT)
+        row, (payment_count, payments_sum) = payment_state(session_factory, invoice_id)
+    finally:
+        delete_invoices(session_factory, [invoice_id])
+
+    assert errors == []
+    assert payment_count == N_PAYMENTS
+    assert row.amount_paid == payments_sum == row.total == PAYMENT * N_PAYMENTS
+    assert row.balance_due == 0
+    assert row.status == InvoiceStatus.PAID
@@ -0,0 +1,92 @@
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Optional
+from config import settings
+
+
+class BlobStore(ABC):
+    """
+    Storage for rendered artifacts under opaque string keys. Writers render
+    into new_temp_path(key) and publish with put_file(); readers serve
+    local_path(key) when the store has one, or read(key).
+    """
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    def new_temp_path(self, key: str) -> str:
+        """
+        A fresh local file to render into before put_file(key, path)
+        """
+        fd, path = tempfile.mkstemp(suffix=".tmp")
+        os.close(fd)
+        return path
+
+    @abstractmethod
+    def put_file(self, key: str, path: str) -> None:
+        """
+        Publish the finished file at path under key; the file is consumed
+        """
+
+    @abstractmethod
+    def read(self, key: str) -> bytes:
+        ...
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Remove key; a missing key is not an error
+        """
+
+
+class LocalFileBlobStore(BlobStore):
+    """
+    Blobs as files under a directory. Writes land in a temp file in the
+    target directory and are published with os.replace, so readers see
+    either no file or a complete one and concurrent writers of the same key
+    cannot interleave.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.directory, key))
+        if not path.startswith(os.path.normpath(self.directory) + os.sep):
+            raise ValueError(f"Invalid blob key '{key}'")
+        return path
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def new_temp_path(self, key: str) -> str:
+        # Same directory as the final file, so os.replace stays atomic
+        directory = os.path.dirname(self._path(key))
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        return path
+
+    def put_file(self, key: str, path: str) -> None:
+        destination = self._path(key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(path, destination)
+
+    def read(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+blob_store = LocalFileBlobStore(settings.BLOB_STORE_DIR)
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from config import settings
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after ttl seconds. Entries are
+    tagged with the tables they were computed from so writers can drop just
+    the affected ones.
+    """
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, tags, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value, tags=(), generation=None):
+        with self._lock:
+            # A write landed while the value was being computed; it may be stale
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, frozenset(tags), time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute, tags=()):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return compute()
+        hit, value = self.get(key)
+        if hit:
+            return value
+        with self._lock:
+            generation = self._generation
+        value = compute()
+        self.set(key, value, tags, generation)
+        return value
+
+    def invalidate(self, tag=None):
+        with self._lock:
+            self._generation += 1
+            if tag is None:
+                stale = list(self._entries)
+            else:
+                stale = [key for key, (_, tags, _) in self._entries.items() if tag in tags]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+dashboard_cache = TTLCache(
+    ttl=settings.DASHBOARD_CACHE_TTL,
+    maxsize=settings.DASHBOARD_CACHE_SIZE
+)
+
+
+def invalidate_table(table: str) -> None:
+    """
+    Called by writers after commit; drops cached results computed from table
+    """
+    dashboard_cache.invalidate(table)
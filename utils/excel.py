@@ -0,0 +1,68 @@
+from typing import BinaryIO, Iterable, Sequence, Union
+
+NUMBER_FORMAT = '#,##0.00'
+
+
+def _named_styles() -> list:
+    """
+    The report styles, registered once per workbook and referenced by name
+    from every cell instead of giving each cell its own Font / Alignment
+    """
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    left = Alignment(horizontal='left')
+    right = Alignment(horizontal='right')
+    total_fill = PatternFill(start_color='F0F0F0', end_color='F0F0F0', fill_type='solid')
+    grand_total_fill = PatternFill(start_color='D0D0D0', end_color='D0D0D0', fill_type='solid')
+    normal = Font(name='Arial', size=10)
+    bold = Font(name='Arial', size=11, bold=True)
+    large_bold = Font(name='Arial', size=12, bold=True)
+
+    return [
+        NamedStyle("report_title", font=Font(name='Arial', size=14, bold=True, color='000080')),
+        NamedStyle("report_subtitle", font=Font(name='Arial', size=12, bold=True, color='000080')),
+        NamedStyle("report_section", font=bold),
+        NamedStyle("report_label", font=normal, alignment=left),
+        NamedStyle("report_amount", font=normal, alignment=right, number_format=NUMBER_FORMAT),
+        NamedStyle("report_total_label", font=bold, alignment=left, fill=total_fill, border=border),
+        NamedStyle("report_total_amount", font=bold, alignment=right, fill=total_fill, border=border,
+                   number_format=NUMBER_FORMAT),
+        NamedStyle("report_grand_total_label", font=large_bold, alignment=left, fill=grand_total_fill, border=border),
+        NamedStyle("report_grand_total_amount", font=large_bold, alignment=right, fill=grand_total_fill, border=border,
+                   number_format=NUMBER_FORMAT),
+    ]
+
+
+def write_sheet(target: Union[str, BinaryIO], title: str, rows: Iterable[Sequence],
+                column_widths: Sequence[float] = ()) -> None:
+    """
+    Write a single-sheet workbook with openpyxl's write-only mode. Each row is
+    a list of values or (value, style name) pairs, with style names from
+    _named_styles(). Rows are serialized as they are appended, so memory
+    does not grow with the row count. target is a path or binary file.
+    """
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    wb = openpyxl.Workbook(write_only=True)
+    for style in _named_styles():
+        wb.add_named_style(style)
+    ws = wb.create_sheet(title)
+    # Column widths must be known before the first row is written
+    for index, width in enumerate(column_widths, 1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+
+    def cell(value):
+        if not isinstance(value, tuple):
+            return value
+        value, style = value
+        styled = WriteOnlyCell(ws, value=value)
+        styled.style = style
+        return styled
+
+    for row in rows:
+        ws.append([cell(value) for value in row])
+    wb.save(target)
@@ -0,0 +1,179 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, List, Optional
+from config import settings
+
+
+class ExecutorBusy(Exception):
+    """
+    Raised when the process pool already holds as many running and queued
+    tasks as it accepts; the API answers 503
+    """
+
+
+class ProcessExecutor:
+    """
+    Shared process pool for CPU-bound work (PDF / Excel rendering, model
+    fitting), so it runs on every core instead of holding the GIL in the
+    request threads.
+
+    At most max_workers tasks run and queue_limit more wait; anything beyond
+    that is rejected with ExecutorBusy rather than queued without bound.
+    Functions and arguments must be picklable. Until start() is called (or
+    with max_workers=0) tasks run inline in the caller, which is what
+    scripts, manage.py and benchmarks get.
+    """
+    def __init__(self, max_workers: Optional[int] = None, queue_limit: int = 16):
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.queue_limit = queue_limit
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.submitted = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.queue_limit
+
+    @property
+    def running(self) -> bool:
+        return self._pool is not None
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        # spawn: forked children would inherit the parent's pooled database
+        # connections and event loop state
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def start(self) -> None:
+        with self._lock:
+            if self._pool is None and self.max_workers > 0:
+                self._pool = self._create_pool()
+                print(f"process pool started ({self.max_workers} workers, queue limit {self.queue_limit})")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _reserve(self, count: int) -> ProcessPoolExecutor:
+        """
+        Admit count tasks and return the pool to submit them to. The pool is
+        read under the lock, so a concurrent shutdown() is seen as
+        ExecutorBusy rather than a missing pool.
+        """
+        with self._lock:
+            if self._pool is None:
+                self.rejected += 1
+                raise ExecutorBusy("Process pool is shut down; retry shortly")
+            if self._pending + count > self.capacity:
+                self.rejected += 1
+                raise ExecutorBusy(
+                    f"Process pool is at capacity ({self._pending} running or queued tasks); retry shortly"
+                )
+            self._pending += count
+            self.submitted += count
+            return self._pool
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _replace_broken_pool(self, broken: ProcessPoolExecutor) -> Optional[ProcessPoolExecutor]:
+        # A worker that dies (OOM kill, segfault) breaks the whole pool;
+        # replace it so later requests are not failed along with it
+        with self._lock:
+            if self._pool is broken:
+                print("process pool broken by a worker exit; starting a new one")
+                self._pool = self._create_pool()
+            pool = self._pool
+        broken.shutdown(wait=False, cancel_futures=True)
+        return pool
+
+    def _submit(self, pool: ProcessPoolExecutor, fn: Callable, *args) -> Future:
+        try:
+            try:
+                future = pool.submit(fn, *args)
+            except BrokenProcessPool:
+                pool = self._replace_broken_pool(pool)
+                if pool is None:
+                    raise ExecutorBusy("Process pool is shut down; retry shortly")
+                future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._release()
+            raise
+        except RuntimeError as e:
+            # shutdown() ran between _reserve and pool.submit
+            self._release()
+            raise ExecutorBusy("Process pool is shutting down; retry shortly") from e
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def submit(self, fn: Callable, *args) -> Future:
+        if not self.running:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        pool = self._reserve(1)
+        return self._submit(pool, fn, *args)
+
+    def call(self, fn: Callable, *args):
+        """
+        Run fn(*args) in the pool and block the calling thread for the result
+        """
+        return self.submit(fn, *args).result()
+
+    async def run(self, fn: Callable, *args):
+        """
+        Run fn(*args) in the pool without blocking the event loop
+        """
+        if not self.running:
+            return await asyncio.to_thread(fn, *args)
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def map(self, fn: Callable, items: Iterable) -> List:
+        """
+        fn over items across the pool; capacity for the whole batch is
+        reserved up front so it is either admitted or rejected as one
+        """
+        items = list(items)
+        if not self.running:
+            return [fn(item) for item in items]
+        pool = self._reserve(len(items))
+        futures = []
+        for i, item in enumerate(items):
+            try:
+                futures.append(self._submit(pool, fn, item))
+            except BaseException:
+                for _ in items[i + 1:]:
+                    self._release()
+                raise
+        return [future.result() for future in futures]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "max_workers": self.max_workers,
+                "queue_limit": self.queue_limit,
+                "pending": self._pending,
+                "submitted": self.submitted,
+                "rejected": self.rejected
+            }
+
+
+cpu_executor = ProcessExecutor(settings.EXECUTOR_WORKERS, settings.EXECUTOR_QUEUE_LIMIT)
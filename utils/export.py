@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Iterable, Iterator, Sequence
+
+# format -> media type
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+ROWS_PER_CHUNK = 1000
+
+
+def _identity(value):
+    return value
+
+
+def _converter(kind: type):
+    if issubclass(kind, Enum):
+        return lambda value: value.value
+    if issubclass(kind, (datetime, date)):
+        return kind.isoformat
+    if issubclass(kind, Decimal):
+        return str
+    return _identity
+
+
+# value type -> function making it CSV / JSON friendly, filled on first use
+_converters = {}
+
+
+def _plain(row: Sequence) -> list:
+    values = []
+    for value in row:
+        convert = _converters.get(value.__class__)
+        if convert is None:
+            convert = _converters[value.__class__] = _converter(value.__class__)
+        values.append(convert(value))
+    return values
+
+
+def encode_rows(rows: Iterable[Sequence], columns: Sequence[str], format: str,
+                rows_per_chunk: int = ROWS_PER_CHUNK) -> Iterator[bytes]:
+    """
+    Encode rows as CSV (with a header row) or NDJSON, yielding one chunk per
+    rows_per_chunk rows so a response can be written while rows are still
+    being fetched. Decimals are written as strings to keep their precision.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format '{format}', expected one of {', '.join(EXPORT_FORMATS)}")
+
+    buffer = io.StringIO()
+    if format == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        write = lambda row: writer.writerow(_plain(row))
+    else:
+        encode = json.JSONEncoder().encode
+        write = lambda row: buffer.write(encode(dict(zip(columns, _plain(row)))) + "\n")
+
+    pending = 0
+    for row in rows:
+        write(row)
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode()
@@ -0,0 +1,123 @@
+import codecs
+import csv
+import io
+import json
+import re
+from datetime import date, datetime
+from enum import Enum
+from typing import AsyncIterator, Iterable, Iterator, Sequence, Tuple
+
+INGEST_FORMATS = ("csv", "ndjson")
+
+
+def iterate_in_thread(chunks: AsyncIterator[bytes]) -> Iterator[bytes]:
+    """
+    Pull an async byte stream (e.g. Request.stream()) from a threadpool
+    worker, one chunk at a time, so a synchronous consumer reads the upload
+    as it arrives instead of after it has been buffered
+    """
+    from anyio.from_thread import run
+
+    while True:
+        try:
+            yield run(chunks.__anext__)
+        except StopAsyncIteration:
+            return
+
+
+def iter_lines(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Decode a byte stream and split it into lines, without the line endings
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+def parse_records(lines: Iterable[str], format: str) -> Iterator[Tuple[int, object]]:
+    """
+    (line number, record) for every non-empty line. A record is a dict, or
+    an error message when the line cannot be parsed. CSV needs a header row;
+    empty CSV fields become None.
+    """
+    if format not in INGEST_FORMATS:
+        raise ValueError(f"Unknown format '{format}', expected one of {', '.join(INGEST_FORMATS)}")
+
+    if format == "ndjson":
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, f"Invalid JSON: {e}"
+                continue
+            yield number, record if isinstance(record, dict) else "Expected a JSON object"
+        return
+
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip() for name in header]
+    for row in reader:
+        if not row:
+            continue
+        if len(row) != len(header):
+            yield reader.line_num, f"Expected {len(header)} fields, got {len(row)}"
+            continue
+        yield reader.line_num, {name: value if value != "" else None for name, value in zip(header, row)}
+
+
+_COPY_SPECIAL = re.compile(r"[\\\t\n\r]")
+_COPY_ESCAPES = {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        if _COPY_SPECIAL.search(value):
+            return _COPY_SPECIAL.sub(lambda match: _COPY_ESCAPES[match.group()], value)
+        return value
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def copy_text(rows: Iterable[Sequence]) -> io.StringIO:
+    """
+    Rows encoded in COPY's text format (tab separated, \\N for NULL)
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def copy_rows(db, table, columns: Sequence[str], rows: Sequence[Sequence]) -> None:
+    """
+    Load rows (values in columns order) into table with COPY through the
+    session's connection, or a multi-row INSERT on drivers without COPY
+    """
+    cursor = db.connection().connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN", copy_text(rows))
+            return
+    finally:
+        cursor.close()
+    from sqlalchemy import insert
+    db.execute(insert(table), [dict(zip(columns, row)) for row in rows])
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+from config import settings
+
+LLM_BACKENDS = ("anthropic", "fake")
+
+
+class LLMTimeout(Exception):
+    pass
+
+
+class AnthropicBackend:
+    def __init__(self, api_key: Optional[str], timeout: float):
+        self.api_key = api_key
+        self.timeout = timeout
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import anthropic
+            self._client = anthropic.AsyncAnthropic(api_key=self.api_key, timeout=self.timeout, max_retries=1)
+        return self._client
+
+    async def complete(self, model: str, system: str, prompt: str, max_tokens: int, temperature: float) -> str:
+        # The pinned SDK still exposes the Messages API under beta
+        messages = getattr(self.client, "messages", None) or self.client.beta.messages
+        message = await messages.create(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            system=system,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return "".join(block.text for block in message.content if getattr(block, "text", None))
+
+
+class FakeBackend:
+    """
+    Offline stand-in for local development and tests: answers after delay
+    seconds with text derived from the prompt, and counts its calls
+    """
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def complete(self, model: str, system: str, prompt: str, max_tokens: int, temperature: float) -> str:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        return f"<html><body><p>Generated by {model} for prompt {digest} ({len(prompt)} chars)</p></body></html>"
+
+
+class DiskLRUCache:
+    """
+    Responses as one JSON file per key under a directory, evicting the least
+    recently used once more than maxsize are stored. Recency is the file's
+    mtime, so the order survives restarts and is shared by workers.
+    """
+    def __init__(self, directory: str, maxsize: int):
+        self.directory = directory
+        self.maxsize = maxsize
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self) -> OrderedDict:
+        if self._index is None:
+            entries = []
+            if os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    if name.endswith(".json"):
+                        path = os.path.join(self.directory, name)
+                        try:
+                            entries.append((os.stat(path).st_mtime_ns, name[:-5]))
+                        except FileNotFoundError:
+                            pass
+            self._index = OrderedDict((key, None) for _, key in sorted(entries))
+        return self._index
+
+    def get(self, key: str) -> Optional[str]:
+        if self.maxsize <= 0:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                text = json.load(f)["text"]
+            os.utime(path)
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        with self._lock:
+            index = self._load_index()
+            index[key] = None
+            index.move_to_end(key)
+        return text
+
+    def set(self, key: str, text: str) -> None:
+        if self.maxsize <= 0:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"text": text}, f)
+        os.replace(temp_path, self._path(key))
+        with self._lock:
+            index = self._load_index()
+            index[key] = None
+            index.move_to_end(key)
+            while len(index) > self.maxsize:
+                stale, _ = index.popitem(last=False)
+                try:
+                    os.remove(self._path(stale))
+                except FileNotFoundError:
+                    pass
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load_index())
+
+
+class LLMGateway:
+    """
+    The one way the app talks to a language model. Responses are cached on
+    disk by a hash of the model and prompt, identical prompts already in
+    flight share a single backend call, at most max_concurrency calls run at
+    once and each is abandoned after timeout seconds.
+
+    Calls run on a private event loop in a daemon thread, so the semaphore,
+    the in-flight table and the HTTP client are shared by async routes,
+    threadpool routes and scripts alike.
+    """
+    def __init__(self, backend, cache: DiskLRUCache, max_concurrency: int = 4, timeout: float = 60.0):
+        self.backend = backend
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._loop = None
+        self._semaphore = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.deduplicated = 0
+        self.backend_calls = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    @staticmethod
+    def cache_key(model: str, system: str, prompt: str, max_tokens: int, temperature: float) -> str:
+        payload = json.dumps([model, system, prompt, max_tokens, temperature], separators=(",", ":"))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def _call_backend(self, key: str, request: tuple) -> str:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.backend_calls += 1
+            try:
+                text = await asyncio.wait_for(self.backend.complete(*request), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise LLMTimeout(f"Language model did not answer within {self.timeout:g}s")
+            except Exception:
+                self.errors += 1
+                raise
+        await asyncio.to_thread(self.cache.set, key, text)
+        return text
+
+    async def _complete(self, request: tuple) -> str:
+        # Runs on the gateway loop
+        key = self.cache_key(*request)
+        shared = self._inflight.get(key)
+        if shared is not None:
+            self.deduplicated += 1
+            return await asyncio.shield(shared)
+
+        text = await asyncio.to_thread(self.cache.get, key)
+        if text is not None:
+            self.cache_hits += 1
+            return text
+        # A concurrent caller may have started the call while the cache was read
+        shared = self._inflight.get(key)
+        if shared is not None:
+            self.deduplicated += 1
+            return await asyncio.shield(shared)
+
+        task = asyncio.ensure_future(self._call_backend(key, request))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def _submit(self, model, system, prompt, max_tokens, temperature):
+        request = (model, system, prompt, max_tokens, temperature)
+        return asyncio.run_coroutine_threadsafe(self._complete(request), self._ensure_loop())
+
+    async def complete(self, prompt: str, model: str, system: str = "", max_tokens: int = 1000,
+                       temperature: float = 0.0) -> str:
+        return await asyncio.wrap_future(self._submit(model, system, prompt, max_tokens, temperature))
+
+    def complete_sync(self, prompt: str, model: str, system: str = "", max_tokens: int = 1000,
+                      temperature: float = 0.0) -> str:
+        """
+        Blocking complete() for threadpool routes and scripts; never call it
+        from a coroutine
+        """
+        return self._submit(model, system, prompt, max_tokens, temperature).result()
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout,
+            "in_flight": len(self._inflight),
+            "cached_responses": len(self.cache),
+            "cache_hits": self.cache_hits,
+            "deduplicated": self.deduplicated,
+            "backend_calls": self.backend_calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors
+        }
+
+
+def _backend():
+    if settings.LLM_BACKEND == "fake":
+        return FakeBackend(settings.LLM_FAKE_DELAY)
+    if settings.LLM_BACKEND == "anthropic":
+        return AnthropicBackend(settings.ANTHROPIC_API_KEY, settings.LLM_TIMEOUT)
+    raise ValueError(f"Unknown LLM_BACKEND '{settings.LLM_BACKEND}', expected one of {', '.join(LLM_BACKENDS)}")
+
+
+llm_gateway = LLMGateway(
+    _backend(),
+    DiskLRUCache(settings.LLM_CACHE_DIR, settings.LLM_CACHE_SIZE),
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    timeout=settings.LLM_TIMEOUT
+)
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import tempfile
+import threading
+from config import settings
+
+
+def fingerprint(*parts) -> str:
+    """
+    Stable digest of a model's training window (arrays, scalars or strings)
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if hasattr(part, 'tobytes'):
+            digest.update(str(part.dtype).encode())
+            digest.update(part.tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b'|')
+    return digest.hexdigest()
+
+
+class ModelStore:
+    """
+    Fitted models persisted as one joblib bundle per namespace, each entry
+    keyed by id and tagged with the fingerprint of the data it was trained
+    on. An entry is only returned while its fingerprint still matches.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._bundles = {}
+        self._lock = threading.Lock()
+
+    def _path(self, namespace: str) -> str:
+        return os.path.join(self.directory, f"{namespace}.joblib")
+
+    def _load(self, namespace: str) -> dict:
+        path = self._path(namespace)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+
+        cached = self._bundles.get(namespace)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        import joblib
+        try:
+            bundle = joblib.load(path)
+        except Exception as e:
+            print(f"Discarding unreadable model bundle {path}: {e}")
+            bundle = {}
+        self._bundles[namespace] = (mtime, bundle)
+        return bundle
+
+    def get_many(self, namespace: str, fingerprints: dict) -> dict:
+        with self._lock:
+            bundle = self._load(namespace)
+        return {
+            key: bundle[key][1]
+            for key, expected in fingerprints.items()
+            if key in bundle and bundle[key][0] == expected
+        }
+
+    def get(self, namespace: str, key, expected: str):
+        return self.get_many(namespace, {key: expected}).get(key)
+
+    def put_many(self, namespace: str, entries: dict) -> None:
+        """
+        entries maps key -> (fingerprint, model)
+        """
+        if not entries:
+            return
+        with self._lock:
+            import joblib
+            bundle = dict(self._load(namespace))
+            bundle.update(entries)
+
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    joblib.dump(bundle, f)
+                os.replace(tmp_path, self._path(namespace))
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+            self._bundles[namespace] = (os.stat(self._path(namespace)).st_mtime_ns, bundle)
+
+    def put(self, namespace: str, key, fingerprint: str, model) -> None:
+        self.put_many(namespace, {key: (fingerprint, model)})
+
+    def clear(self, namespace: str) -> None:
+        with self._lock:
+            self._bundles.pop(namespace, None)
+            try:
+                os.remove(self._path(namespace))
+            except FileNotFoundError:
+                pass
+
+
+model_store = ModelStore(settings.MODEL_STORE_DIR)
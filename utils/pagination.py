@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import tuple_
+
+PAGINATION_MODES = ("offset", "cursor")
+
+
+def encode_cursor(values) -> str:
+    """
+    Opaque token for the sort key of the last row on a page
+    """
+    payload = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, columns) -> list:
+    """
+    Sort key values from a token, converted back to the columns' types
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid pagination cursor")
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise ValueError("Invalid pagination cursor")
+
+    values = []
+    for column, value in zip(columns, payload):
+        python_type = column.type.python_type
+        try:
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            else:
+                value = python_type(value)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid pagination cursor")
+        values.append(value)
+    return values
+
+
+def keyset_page(query, columns: list, limit: int, cursor: Optional[str] = None):
+    """
+    One page of query ordered by columns (ascending, last one unique),
+    starting after cursor. Seeks with a row comparison so an index on
+    columns serves any page at the cost of the first.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    if cursor:
+        query = query.filter(tuple_(*columns) > tuple_(*decode_cursor(cursor, columns)))
+
+    rows = query.order_by(*columns).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column in columns])
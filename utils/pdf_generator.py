@@ -2,15 +2,37 @@ from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from xml.sax.saxutils import escape
+import hashlib
+import json
 import os
-import anthropic
 from datetime import datetime
 
+# Bump when create_pdf's layout changes so cached PDFs are re-rendered
+PDF_LAYOUT_VERSION = 2
+
+def invoice_pdf_key(invoice) -> str:
+    """
+    Blob key of an invoice's rendered PDF: a SHA-256 of everything about the
+    invoice (items, totals, status, payments, client details) except the
+    stored pdf_url itself
+    """
+    content = invoice.model_dump(mode="json", exclude={"pdf_url"})
+    digest = hashlib.sha256(
+        json.dumps([PDF_LAYOUT_VERSION, content], sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+    return f"invoices/{digest[:2]}/{digest}.pdf"
+
 class PDFGenerator:
     def __init__(self, anthropic_api_key):
-        self.client = anthropic.Anthropic(api_key=anthropic_api_key)
+        self.anthropic_api_key = anthropic_api_key
         
-    def generate_invoice_content(self, invoice):
+    async def generate_invoice_content(self, invoice):
+        """
+        Description paragraph for the PDF, or None when the model could not
+        provide one. Awaited by the route, so the model call goes through
+        the app's shared gateway rather than one per process-pool worker.
+        """
         items_list = []
         for item in invoice.items:
             items_list.append(f"{item.description}: {item.quantity} x {invoice.currency} {item.unit_price}")
@@ -28,30 +50,20 @@ class PDFGenerator:
         Format it as a formal business document."""
 
         try:
-            message = self.client.messages.create(
+            from utils.llm_gateway import llm_gateway
+            return await llm_gateway.complete(
+                prompt,
                 model="claude-3-opus-20240229",
                 max_tokens=1000,
                 temperature=0,
-                system="You are a professional invoice writer. Generate formal, concise invoice descriptions.",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
-            
-            if hasattr(message, 'content'):
-                if isinstance(message.content, list):
-                    return message.content[0].text if message.content else "Invoice Description"
-                return str(message.content)
-            return "Invoice Description"
+                system="You are a professional invoice writer. Generate formal, concise invoice descriptions."
+            ) or None
 
         except Exception as e:
             print(f"Error generating content: {str(e)}")
-            return "Invoice Description" 
+            return None
 
-    def create_pdf(self, invoice, output_path):
+    def create_pdf(self, invoice, output_path, description=None):
         try:
             doc = SimpleDocTemplate(
                 output_path,
@@ -81,6 +93,11 @@ class PDFGenerator:
             elements.append(Paragraph(f"Date: {invoice.issue_date.strftime('%Y-%m-%d')}", styles['Normal']))
             elements.append(Paragraph(f"Due Date: {invoice.due_date.strftime('%Y-%m-%d')}", styles['Normal']))
             elements.append(Spacer(1, 20))
+
+            if description:
+                # Model output is plain text; Paragraph parses markup
+                elements.append(Paragraph(escape(description).replace("\n", "<br/>"), styles['Normal']))
+                elements.append(Spacer(1, 20))
             
             items_data = [['Description', 'Quantity', 'Unit Price', 'Amount']]
             for item in invoice.items: